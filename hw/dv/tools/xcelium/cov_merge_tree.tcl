@@ -0,0 +1,41 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+# Merge coverage with IMC as one node of a tree of merges (see --cov-merge-fanin in dvsim).
+# Unlike cov_merge.tcl, the input directories are the coverage databases of individual
+# tests or the outputs of other merges, which are merged as they are.
+
+# Set the input coverage directories using the env var 'cov_db_dirs' (which is a space
+# separated list of directories). Directories that do not exist are skipped: the coverage
+# data of a failing test is deleted, and a merge is skipped if all of its inputs failed.
+set cov_db_dirs_env [string trim $::env(cov_db_dirs) " \"'"]
+set cov_db_dirs ""
+set runs ""
+foreach i $cov_db_dirs_env {
+  set i [string trim $i]
+  if {![file exists $i]} { continue }
+  append cov_db_dirs "$i "
+  # Carry the list of test runs up the tree, for grading in cov_report.tcl.
+  if {[file exists "$i/runs.txt"]} {
+    set filepointer [open "$i/runs.txt" r]
+    append runs "[string trim [read $filepointer]] "
+    close $filepointer
+  } else {
+    append runs "$i "
+  }
+}
+puts "Input coverage directories:\n$cov_db_dirs"
+
+# Set the output directory for the merged database using the env var 'cov_merge_db_dir'.
+# The supplied env var may have quotes or spaces that needs to be trimmed.
+puts "Output directory for merged coverage:"
+set cov_merge_db_dir [string trim $::env(cov_merge_db_dir) " \"'"]
+
+# Run the merge command.
+merge $cov_db_dirs -out $cov_merge_db_dir -overwrite -initial_model union_all
+
+# Create a file with the path to the cover dirs
+set filepointer [open "$cov_merge_db_dir/runs.txt" w]
+puts $filepointer "$runs"
+close $filepointer
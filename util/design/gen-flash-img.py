@@ -19,13 +19,13 @@ from enum import Enum
 from pathlib import Path
 from typing import List
 
-import hjson
 from pyfinite import ffield
 from util.design.lib.common import (inverse_permute_bits,
                                     validate_data_perm_option,
                                     vmem_permutation_string)
 from util.design.lib.OtpMemMap import OtpMemMap
 from util.design.lib.Present import Present
+from util.reggen import hjson_loader
 
 import prince
 import secded_gen
@@ -145,7 +145,7 @@ def _get_otp_ctrl_netlist_consts(otp_mmap_file: str, otp_seed: int,
                                  scrambling_configs: FlashScramblingConfigs):
     # Read in the OTP memory map file to a dictionary.
     with open(otp_mmap_file, 'r') as infile:
-        otp_mmap_config = hjson.load(infile)
+        otp_mmap_config = hjson_loader.loads(infile.read())
         # If a OTP memory map seed is provided, we use it.
         if otp_seed is not None:
             otp_mmap_config["seed"] = otp_seed
@@ -10,11 +10,11 @@ import argparse
 import logging as log
 from pathlib import Path
 
-import hjson
 from mako.template import Template
 
 from lib.common import wrapped_docstring
 from lib.LcStEnc import LcStEnc
+from reggen import hjson_loader
 
 # State encoding definition
 LC_STATE_DEFINITION_FILE = "hw/ip/lc_ctrl/data/lc_ctrl_state.hjson"
@@ -67,7 +67,7 @@ def main():
     args = parser.parse_args()
 
     with open(args.lc_state_def_file, 'r') as infile:
-        config = hjson.load(infile)
+        config = hjson_loader.loads(infile.read())
 
         # If specified, override the seed for random netlist constant computation.
         if args.seed:
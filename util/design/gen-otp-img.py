@@ -11,10 +11,9 @@ import logging as log
 import random
 from pathlib import Path
 
-import hjson
-
 from lib.common import vmem_permutation_string, wrapped_docstring
 from lib.OtpMemImg import OtpMemImg
+from reggen import hjson_loader
 
 # Get the memory map definition.
 MMAP_DEFINITION_FILE = 'hw/ip/otp_ctrl/data/otp_ctrl_mmap.hjson'
@@ -203,13 +202,13 @@ def main():
 
     log.info('Loading LC state definition file {}'.format(args.lc_state_def))
     with open(args.lc_state_def, 'r') as infile:
-        lc_state_cfg = hjson.load(infile)
+        lc_state_cfg = hjson_loader.loads(infile.read())
     log.info('Loading OTP memory map definition file {}'.format(args.mmap_def))
     with open(args.mmap_def, 'r') as infile:
-        otp_mmap_cfg = hjson.load(infile)
+        otp_mmap_cfg = hjson_loader.loads(infile.read())
     log.info('Loading main image configuration file {}'.format(args.img_cfg))
     with open(args.img_cfg, 'r') as infile:
-        img_cfg = hjson.load(infile)
+        img_cfg = hjson_loader.loads(infile.read())
 
     # Set the initial random seed so that the generated image is
     # deterministically randomized.
@@ -229,7 +228,7 @@ def main():
                 'Processing additional image configuration file {}'.format(f))
             log.info('')
             with open(f, 'r') as infile:
-                cfg = hjson.load(infile)
+                cfg = hjson_loader.loads(infile.read())
                 otp_mem_img.override_data(cfg)
             log.info('')
 
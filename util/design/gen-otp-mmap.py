@@ -9,11 +9,11 @@ import argparse
 import logging as log
 from pathlib import Path
 
-import hjson
 from mako.template import Template
 
 from lib.common import wrapped_docstring
 from lib.OtpMemMap import OtpMemMap
+from reggen import hjson_loader
 
 TABLE_HEADER_COMMENT = '''<!--
 DO NOT EDIT THIS FILE DIRECTLY.
@@ -52,7 +52,7 @@ def main():
     args = parser.parse_args()
 
     with open(MMAP_DEFINITION_FILE, 'r') as infile:
-        config = hjson.load(infile)
+        config = hjson_loader.loads(infile.read())
 
         # If specified, override the seed for random netlist constant computation.
         if args.seed:
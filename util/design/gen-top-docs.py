@@ -8,8 +8,8 @@ import sys
 import argparse
 import logging as log
 
-import hjson
 from lib import common
+from reggen import hjson_loader
 from tabulate import tabulate
 
 
@@ -91,7 +91,7 @@ def main():
         "pinout": generate_pinout_table,
     }
     with open(args.topcfg, 'r') as infile:
-        top_level = hjson.load(infile)
+        top_level = hjson_loader.loads(infile.read())
         if gen not in doc_generators:
             sys.exit(f"Unknown generator {gen}")
 
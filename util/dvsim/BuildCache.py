@@ -0,0 +1,254 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+A content-addressed cache of compiled simulation executables.
+"""
+
+import hashlib
+import json
+import logging as log
+import os
+import shlex
+import shutil
+import subprocess
+from pathlib import Path
+
+from utils import VERBOSE, mk_path, rm_path
+
+
+class BuildCache:
+    '''A content-addressed cache of simulation build outputs.
+
+    Each entry is keyed by a hash of everything that determines the outcome of
+    a CompileSim job: the fully resolved build command, its exports, the
+    filelist generated by fusesoc and the contents of every source file listed
+    in it. An entry holds a copy of each of the job's output directories.
+
+    The cache is opt-in (--build-cache). On a hit, the cached outputs are
+    restored in place and the build is marked as passed without being run.
+    Note that the outputs of a build are only valid at the path where they
+    were produced (simulators bake absolute paths into the executable), which
+    is why the build directory is part of the key by way of the build command.
+    '''
+
+    # Name of the file written to the build directory, holding the key of the
+    # build that produced its contents.
+    stamp_name = ".dvsim_build_key"
+
+    # Name of the file in each cache entry that describes it.
+    manifest_name = "manifest.json"
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def __str__(self):
+        return str(self.cache_dir)
+
+    def _entry_dir(self, key):
+        return self.cache_dir / key[:2] / key
+
+    @staticmethod
+    def _hash_file(h, path):
+        '''Updates hash 'h' with the name and content of the file at 'path'.'''
+        h.update(str(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+
+    @staticmethod
+    def _hash_dir(h, path):
+        '''Updates hash 'h' with the names and contents of all the files
+        below the directory at 'path', if there is one.'''
+        if not path.is_dir():
+            return
+        for sub_path in sorted(path.rglob("*")):
+            if sub_path.is_file():
+                BuildCache._hash_file(h, sub_path)
+
+    # Options of a filelist that take a path as their argument: nested
+    # filelists (whose relative paths are resolved as those of the filelist
+    # that lists them with -f, or against their own directory with -F),
+    # library files and library directories.
+    _path_opts = ("-f", "-F", "-v", "-y")
+
+    @staticmethod
+    def _hash_flist(h, flist, base=None, seen=None):
+        '''Updates hash 'h' with the filelist and the sources it refers to.
+
+        Include and library directories are hashed in full, subdirectories
+        included (headers included from them are not listed individually).
+        Nested filelists are hashed along with the sources they list. Other
+        options are hashed as text. Relative paths are resolved against the
+        directory of the filelist, which is how fusesoc writes them.
+        '''
+        flist = Path(flist)
+        if base is None:
+            base = flist.parent
+        if seen is None:
+            seen = set()
+        if flist.resolve() in seen:
+            return
+        seen.add(flist.resolve())
+
+        BuildCache._hash_file(h, flist)
+        with open(flist, "r", encoding="UTF-8") as f:
+            tokens = shlex.split(f.read(), comments=True)
+
+        opt = None
+        for token in tokens:
+            h.update(token.encode("utf-8"))
+            if opt is not None:
+                path = base / token
+                if opt == "-f" and path.is_file():
+                    BuildCache._hash_flist(h, path, base, seen)
+                elif opt == "-F" and path.is_file():
+                    BuildCache._hash_flist(h, path, None, seen)
+                elif opt == "-v" and path.is_file():
+                    BuildCache._hash_file(h, path)
+                elif opt == "-y":
+                    BuildCache._hash_dir(h, path)
+                opt = None
+            elif token in BuildCache._path_opts:
+                opt = token
+            elif token.startswith("+incdir+"):
+                for incdir in token[len("+incdir+"):].split("+"):
+                    BuildCache._hash_dir(h, base / incdir)
+            elif not token.startswith(("-", "+")):
+                path = base / token
+                if path.is_file():
+                    BuildCache._hash_file(h, path)
+
+    @staticmethod
+    def is_cacheable(build):
+        '''Returns True if the outputs of 'build' can be cached.
+
+        pre_build_cmds are run before the filelist is generated and typically
+        modify in-tree sources (with a different outcome per build seed, for
+        example), so builds using them are never cached.
+        '''
+        if build.dry_run or build.pre_build_cmds:
+            return False
+        return bool(build.sv_flist_gen_cmd and build.sv_flist)
+
+    @staticmethod
+    def compute_key(build):
+        '''Computes the cache key for the CompileSim job 'build'.
+
+        This generates the filelist in the build directory (in the same way the
+        flow's Makefile does) so that the key reflects the current state of
+        the sources. Returns the key as a hex string, or None if the filelist
+        could not be generated.
+        '''
+        mk_path(build.build_dir)
+
+        exports = os.environ.copy()
+        exports.update(build.exports)
+        exports.pop('MAKEFLAGS', None)
+
+        opts = build.sv_flist_gen_opts
+        if type(opts) is list:
+            opts = " ".join(opts)
+        cmd = "{} {}".format(build.sv_flist_gen_cmd, opts)
+        log.log(VERBOSE, "[build_cache]: [%s]: generating filelist:\n%s",
+                build.full_name, cmd)
+        p = subprocess.run(cmd,
+                           shell=True,
+                           cwd=build.build_dir,
+                           env=exports,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.STDOUT)
+        if p.returncode != 0 or not os.path.isfile(build.sv_flist):
+            log.warning("[build_cache]: [%s]: failed to generate the filelist "
+                        "(not using the build cache):\n%s", build.full_name,
+                        p.stdout.decode("utf-8", errors="replace"))
+            return None
+
+        h = hashlib.sha256()
+        h.update(build.cmd.encode("utf-8"))
+        for k in sorted(build.exports):
+            h.update("{}={}".format(k, build.exports[k]).encode("utf-8"))
+        try:
+            BuildCache._hash_flist(h, build.sv_flist)
+        except OSError as e:
+            log.warning("[build_cache]: [%s]: failed to hash the sources (not "
+                        "using the build cache):\n%s", build.full_name, e)
+            return None
+        return h.hexdigest()
+
+    def restore(self, build, key):
+        '''Restores the outputs of 'build' from the cache entry 'key'.
+
+        The build directory is only copied over if it does not already hold
+        the outputs of the same build (which is the common case when iterating
+        on a test). Returns True on a hit.
+        '''
+        entry = self._entry_dir(key)
+        try:
+            with open(entry / self.manifest_name, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if manifest.get("output_dirs") != [str(d) for d in build.output_dirs]:
+            return False
+
+        stamp = Path(build.odir, self.stamp_name)
+        for i, odir in enumerate(build.output_dirs):
+            if odir == build.odir and self._read_stamp(stamp) == key:
+                continue
+            rm_path(odir)
+            shutil.copytree(entry / str(i), odir, symlinks=True)
+
+        log.info("[build_cache]: [%s]: restored from %s", build.full_name,
+                 entry)
+        return True
+
+    def store(self, build, key):
+        '''Copies the outputs of 'build' into the cache entry 'key'.
+
+        The entry is first populated in a temporary directory which is then
+        renamed into place, so that concurrent dvsim invocations sharing a
+        cache never see a partially written entry.
+        '''
+        entry = self._entry_dir(key)
+        if (entry / self.manifest_name).exists():
+            return
+
+        self._write_stamp(Path(build.odir, self.stamp_name), key)
+        mk_path(entry.parent)
+        tmp = entry.with_name("{}.tmp.{}".format(key, os.getpid()))
+        rm_path(tmp, ignore_error=True)
+        try:
+            for i, odir in enumerate(build.output_dirs):
+                shutil.copytree(odir, tmp / str(i), symlinks=True)
+            with open(tmp / self.manifest_name, "w") as f:
+                json.dump({"name": build.full_name,
+                           "output_dirs": [str(d) for d in build.output_dirs]},
+                          f)
+            os.rename(tmp, entry)
+        except OSError as e:
+            log.warning("[build_cache]: [%s]: failed to store the build "
+                        "outputs:\n%s", build.full_name, e)
+            rm_path(tmp, ignore_error=True)
+            return
+
+        log.log(VERBOSE, "[build_cache]: [%s]: stored in %s", build.full_name,
+                entry)
+
+    def invalidate(self, build):
+        '''Marks the build directory of 'build' as not matching any entry.'''
+        rm_path(Path(build.odir, self.stamp_name), ignore_error=True)
+
+    @staticmethod
+    def _read_stamp(path):
+        try:
+            with open(path, "r") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write_stamp(path, key):
+        with open(path, "w") as f:
+            f.write(key + "\n")
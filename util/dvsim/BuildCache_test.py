@@ -0,0 +1,77 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''pytest-based testing for the keys of the build cache'''
+
+import hashlib
+import sys
+from pathlib import Path
+
+import pytest
+
+# The dvsim modules import each other as top-level modules.
+sys.path.insert(0, str(Path(__file__).parent))
+
+from BuildCache import BuildCache  # noqa: E402
+
+
+def flist_key(flist):
+    h = hashlib.sha256()
+    BuildCache._hash_flist(h, flist)
+    return h.hexdigest()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    '''A filelist using every kind of path option, and its sources.'''
+    files = {
+        'top.sv': 'module top; endmodule',
+        'inc/a.svh': '`define A',
+        'inc/sub/x.svh': '`define X',
+        'nested.f': 'nested.sv\n',
+        'nested.sv': 'module nested; endmodule',
+        'other/own.f': 'own.sv\n',
+        'other/own.sv': 'module own; endmodule',
+        'lib/cell.v': 'module cell; endmodule',
+        'libdir/prim.v': 'module prim; endmodule',
+    }
+    for name, text in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    (tmp_path / 'sim.f').write_text(
+        '// sources\n'
+        '+incdir+inc\n'
+        '-f nested.f\n'
+        '-F other/own.f\n'
+        '-v lib/cell.v\n'
+        '-y libdir +libext+.v\n'
+        'top.sv\n')
+    return tmp_path
+
+
+@pytest.mark.parametrize('name', [
+    'top.sv', 'inc/a.svh', 'inc/sub/x.svh', 'nested.f', 'nested.sv',
+    'other/own.f', 'other/own.sv', 'lib/cell.v', 'libdir/prim.v', 'sim.f'
+])
+def test_key_covers(tree, name):
+    key = flist_key(tree / 'sim.f')
+    assert flist_key(tree / 'sim.f') == key
+
+    with open(tree / name, 'a') as f:
+        f.write('\n// changed\n')
+    assert flist_key(tree / 'sim.f') != key
+
+
+def test_new_header(tree):
+    key = flist_key(tree / 'sim.f')
+    (tree / 'inc' / 'sub' / 'new.svh').write_text('`define NEW')
+    assert flist_key(tree / 'sim.f') != key
+
+
+def test_nested_cycle(tmp_path):
+    (tmp_path / 'a.f').write_text('-f b.f\na.sv\n')
+    (tmp_path / 'b.f').write_text('-f a.f\n')
+    (tmp_path / 'a.sv').write_text('')
+    flist_key(tmp_path / 'a.f')
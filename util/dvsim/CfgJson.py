@@ -4,7 +4,8 @@
 
 '''A wrapper for loading hjson files as used by dvsim's FlowCfg'''
 
-from utils import parse_hjson, subst_wildcards
+from HjsonCache import HjsonCache
+from utils import subst_wildcards
 
 
 # A set of fields that can be overridden on the command line and shouldn't be
@@ -55,7 +56,7 @@ def _load_single_file(target, path, is_first, arg_keys):
     Returns a list of further includes that should be loaded.
 
     '''
-    hjson = parse_hjson(path)
+    hjson = HjsonCache.parse(path)
     if not isinstance(hjson, dict):
         raise RuntimeError('{!r}: Top-level hjson object is not a dictionary.'
                            .format(path))
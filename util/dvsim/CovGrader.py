@@ -0,0 +1,139 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+Grading of regression runs by their contribution to coverage.
+"""
+
+import heapq
+import logging as log
+import statistics
+
+
+# Returns the number of bits set in an int (int.bit_count() needs Python 3.10).
+_popcount = getattr(int, "bit_count", lambda bits: bin(bits).count("1"))
+
+
+def read_cov_items(path):
+    '''Reads a tool-neutral coverage summary of a run.
+
+    The summary is a text file listing the coverage items (for example, the
+    bins, statements or toggles, named in whichever way the tool exporting it
+    likes) hit by the run, one per line. Blank lines and lines starting with
+    '#' are ignored.
+
+    Returns the set of items.
+    '''
+    with open(path, "r", encoding="UTF-8", errors="surrogateescape") as f:
+        return {
+            line.strip()
+            for line in f
+            if line.strip() and not line.startswith("#")
+        }
+
+
+class CovGrader:
+    '''Grades the runs of a regression by their contribution to coverage.
+
+    Each run is added with the set of coverage items it hit and its cost (its
+    runtime, for example). grade() then picks runs greedily, at each step
+    the one that hits the most items not yet covered per unit of cost, until
+    the target fraction of all the items hit is covered. This is the
+    classic greedy approximation of weighted set cover. Ties go to the run
+    added first.
+
+    The cost of a run may be unknown (None), in which case it is taken to be
+    the median of the known costs, so that all the costs are in the same
+    unit. If no cost is known, all the runs cost 1.
+
+    The coverage of each run is held as a bitmap (a Python int), so that the
+    gain of a run is a couple of big-integer operations. Gains only ever
+    decrease as runs are picked, so they are re-evaluated lazily: a run is
+    picked if its up-to-date gain is still the best.
+    '''
+
+    def __init__(self):
+        # Map of coverage item to its index in the bitmaps.
+        self._item_index = {}
+
+        # List of (key, bitmap, cost) of the runs added, where cost is None if
+        # unknown.
+        self._runs = []
+
+        # Bitmap of all the items hit by any run.
+        self._union = 0
+
+    @property
+    def num_items(self):
+        '''Returns the number of distinct items hit by all the runs.'''
+        return _popcount(self._union)
+
+    def add_run(self, key, items, cost=None):
+        '''Adds a run, identified by key, that hit the given items.
+
+        cost is the cost of the run, or None if it is unknown.
+        '''
+        indices = [
+            self._item_index.setdefault(item, len(self._item_index))
+            for item in items
+        ]
+        buf = bytearray((len(self._item_index) + 7) // 8)
+        for index in indices:
+            buf[index >> 3] |= 1 << (index & 7)
+        bits = int.from_bytes(buf, "little")
+        self._runs.append((key, bits, cost))
+        self._union |= bits
+
+    def costs(self):
+        '''Returns a list of (key, cost) of the runs, in the order they were
+        added, with unknown costs replaced as described above.'''
+        known = [cost for _, _, cost in self._runs if cost is not None]
+        default = statistics.median(known) if known else 1.0
+        return [(key, default if cost is None else cost)
+                for key, _, cost in self._runs]
+
+    def grade(self, target=1.0):
+        '''Picks the runs that cover the target fraction of the items.
+
+        Returns a list of (key, gain, covered) tuples for the runs picked, in
+        the order they were picked, where gain is the number of items the run
+        adds to the coverage of the runs before it and covered is the total
+        number of items covered once it is added.
+        '''
+        total = self.num_items
+        needed = total * target
+
+        # Heap of (-gain / cost, index of the run, gain when last evaluated).
+        # The index breaks ties in favour of the earlier run.
+        costs = [max(cost, 1e-9) for _, cost in self.costs()]
+        heap = []
+        for i, (_, bits, _) in enumerate(self._runs):
+            gain = _popcount(bits)
+            if gain:
+                heap.append((-gain / costs[i], i, gain))
+        heapq.heapify(heap)
+
+        covered_bits = 0
+        covered = 0
+        picked = []
+        while heap and covered < needed:
+            _, i, stale_gain = heapq.heappop(heap)
+            key, bits, _ = self._runs[i]
+            cost = costs[i]
+            gain = _popcount(bits & ~covered_bits)
+            if gain == 0:
+                continue
+
+            # If the gain went down since it was last evaluated, another run
+            # may now be better: put it back with its up-to-date gain.
+            if gain < stale_gain and heap and -gain / cost > heap[0][0]:
+                heapq.heappush(heap, (-gain / cost, i, gain))
+                continue
+
+            covered_bits |= bits
+            covered += gain
+            picked.append((key, gain, covered))
+
+        log.debug("Graded %d runs: picked %d, covering %d of %d items",
+                  len(self._runs), len(picked), covered, total)
+        return picked
@@ -0,0 +1,96 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''pytest-based testing for the coverage grader'''
+
+from .CovGrader import CovGrader, read_cov_items
+
+
+def test_read_cov_items(tmp_path):
+    path = tmp_path / 'cov_items.txt'
+    path.write_text('# comment\nfoo.a\n\n  foo.b  \nfoo.a\n')
+    assert read_cov_items(path) == {'foo.a', 'foo.b'}
+
+
+def test_greedy():
+    grader = CovGrader()
+    grader.add_run('small', {'a'}, 1)
+    grader.add_run('big', {'a', 'b', 'c'}, 1)
+    grader.add_run('rest', {'c', 'd'}, 1)
+    assert grader.num_items == 4
+
+    # 'big' first, then 'rest' for the one item left, 'small' adds nothing.
+    assert grader.grade() == [('big', 3, 3), ('rest', 1, 4)]
+
+
+def test_cost():
+    grader = CovGrader()
+    grader.add_run('slow', {'a', 'b', 'c', 'd'}, 100)
+    grader.add_run('fast1', {'a', 'b'}, 1)
+    grader.add_run('fast2', {'c', 'd'}, 1)
+    assert grader.grade() == [('fast1', 2, 2), ('fast2', 2, 4)]
+
+
+def test_ties():
+    # Runs with the same gain per cost are picked in the order they were
+    # added.
+    grader = CovGrader()
+    grader.add_run('first', {'a', 'b'}, 2)
+    grader.add_run('second', {'c'}, 1)
+    grader.add_run('third', {'d', 'e'}, 2)
+    assert [key for key, _, _ in grader.grade()] == ['first', 'second',
+                                                     'third']
+
+
+def test_unknown_costs():
+    # An unknown cost is the median of the known ones, here 10 seconds.
+    grader = CovGrader()
+    grader.add_run('known', {'a', 'b', 'c'}, 10)
+    grader.add_run('unknown', {'d', 'e'})
+    grader.add_run('cheap', {'f'}, 1)
+    grader.add_run('costly', {'g'}, 100)
+    assert grader.costs() == [('known', 10), ('unknown', 10), ('cheap', 1),
+                              ('costly', 100)]
+    assert [key for key, _, _ in grader.grade()] == ['cheap', 'known',
+                                                     'unknown', 'costly']
+
+    # If no cost is known, every run costs the same.
+    grader = CovGrader()
+    grader.add_run('x', {'a'})
+    grader.add_run('y', {'a', 'b'})
+    assert grader.costs() == [('x', 1.0), ('y', 1.0)]
+    assert grader.grade() == [('y', 2, 2)]
+
+
+def test_target():
+    grader = CovGrader()
+    for i in range(10):
+        grader.add_run(i, {i}, 1)
+
+    # Picking stops as soon as the target is reached.
+    assert len(grader.grade(0.5)) == 5
+    assert len(grader.grade(0.55)) == 6
+    assert grader.grade(0.0) == []
+
+    # A target beyond what the runs hit covers all they hit.
+    picked = grader.grade(2.0)
+    assert len(picked) == 10
+    assert picked[-1][2] == 10
+
+
+def test_empty():
+    grader = CovGrader()
+    assert grader.grade() == []
+    grader.add_run('nothing', set(), 1)
+    assert grader.num_items == 0
+    assert grader.grade() == []
+
+
+def test_lazy_gain():
+    # The gain of 'b' goes down once 'a' is picked, so 'c' goes next.
+    grader = CovGrader()
+    grader.add_run('a', {1, 2, 3, 4}, 1)
+    grader.add_run('b', {1, 2, 3, 5}, 1)
+    grader.add_run('c', {6, 7}, 1)
+    assert grader.grade() == [('a', 4, 4), ('c', 2, 6), ('b', 1, 7)]
@@ -40,6 +40,10 @@ class Deploy():
     # TODO: Allow these to be set in the HJson.
     weight = 1
 
+    # The Reaper that old output directories and data are handed to, to be
+    # deleted in the background, if any. Set from dvsim.py.
+    reaper = None
+
     def __str__(self):
         return (pprint.pformat(self.__dict__)
                 if log.getLogger().isEnabledFor(VERBOSE) else self.full_name)
@@ -79,6 +83,18 @@ class Deploy():
         # Launcher instance created later using create_launcher() method.
         self.launcher = None
 
+        # Set by pre_launch() if the job's outputs have been restored from a
+        # cache, in which case the launcher does not need to run it.
+        self.restored_from_cache = False
+
+        # Key identifying this job in the cfg's journal across invocations of
+        # dvsim (see Journal).
+        self.journal_key = self.full_name
+
+        # Set if the job passed in a previous invocation of dvsim which is
+        # being resumed, in which case the launcher does not run it again.
+        self.resumed = False
+
         # Job's wall clock time (a.k.a CPU time, or runtime).
         self.job_runtime = JobTime()
 
@@ -232,36 +248,40 @@ class Deploy():
             cmd += " {}={}".format(attr, value)
         return cmd
 
+    # Stands for the name of a job in its equivalence key.
+    _name_placeholder = "\0name\0"
+
+    def get_equivalence_key(self, ignore_name=False):
+        """Returns a hashable key that identifies what this job would do.
+
+        The key is made of the type of the job, the final resolved 'cmd' and
+        the exports. Jobs with the same key behave exactly the same way when
+        deployed. If ignore_name is set, the 'name' of the job is taken out of
+        the key, so that jobs that only differ by their names (such as build
+        modes resolving to the same build) have the same key.
+        """
+        def _subst(val):
+            if ignore_name and type(val) is str:
+                return val.replace(self.name, self._name_placeholder)
+            return val
+
+        return (type(self), _subst(self.cmd),
+                tuple(sorted((k, _subst(v)) for k, v in self.exports.items())))
+
     def is_equivalent_job(self, item):
         """Checks if job that would be dispatched with 'item' is equivalent to
         'self'.
 
         Determines if 'item' and 'self' would behave exactly the same way when
         deployed. If so, then there is no point in keeping both. The caller can
-        choose to discard 'item' and pick 'self' instead. To do so, we check
-        the final resolved 'cmd' & the exports. The 'name' field will be unique
-        to 'item' and 'self', so we take that out of the comparison.
+        choose to discard 'item' and pick 'self' instead. The 'name' field will
+        be unique to 'item' and 'self', so we take that out of the comparison
+        (see get_equivalence_key()).
         """
-        if type(self) != type(item):
-            return False
-
-        # Check if the cmd field is identical.
-        item_cmd = item.cmd.replace(item.name, self.name)
-        if self.cmd != item_cmd:
+        if (self.get_equivalence_key(ignore_name=True) !=
+                item.get_equivalence_key(ignore_name=True)):
             return False
 
-        # Check if exports have identical set of keys.
-        if self.exports.keys() != item.exports.keys():
-            return False
-
-        # Check if exports have identical values.
-        for key, val in self.exports.items():
-            item_val = item.exports[key]
-            if type(item_val) is str:
-                item_val = item_val.replace(item.name, self.name)
-            if val != item_val:
-                return False
-
         log.log(VERBOSE, "Deploy job \"%s\" is equivalent to \"%s\"",
                 item.name, self.name)
         return True
@@ -329,9 +349,16 @@ class CompileSim(Deploy):
     cmds_list_vars = ["pre_build_cmds", "post_build_cmds"]
     weight = 5
 
+    # The BuildCache instance used to skip builds whose outputs are already
+    # available, if enabled with --build-cache.
+    build_cache = None
+
     def __init__(self, build_mode, sim_cfg):
         self.build_mode_obj = build_mode
         self.seed = sim_cfg.build_seed
+
+        # Key of this build in the build cache, if the cache is in use.
+        self.build_cache_key = None
         super().__init__(sim_cfg)
 
     def _define_attrs(self):
@@ -375,6 +402,10 @@ class CompileSim(Deploy):
         self.pass_patterns = self.build_pass_patterns
         self.fail_patterns = self.build_fail_patterns
 
+        # The generated filelist is only needed to compute the build cache
+        # key. It is substituted along with the rest of the attributes.
+        self.sv_flist = getattr(self.sim_cfg, "sv_flist", "")
+
         if self.sim_cfg.args.build_timeout_mins is not None:
             self.build_timeout_mins = self.sim_cfg.args.build_timeout_mins
 
@@ -387,6 +418,30 @@ class CompileSim(Deploy):
         # need to do this because the build directory is not 'renewed'.
         rm_path(self.cov_db_dir)
 
+        cache = CompileSim.build_cache
+        if cache is None or not cache.is_cacheable(self):
+            return
+
+        self.build_cache_key = cache.compute_key(self)
+        if self.build_cache_key is None:
+            return
+
+        if cache.restore(self, self.build_cache_key):
+            self.restored_from_cache = True
+            with open(self.get_log_path(), "a", encoding="UTF-8") as f:
+                f.write("\n[build_cache]: Restored from build cache {} (key "
+                        "{}).\n".format(cache, self.build_cache_key))
+        else:
+            # The build directory is about to be rebuilt, so it no longer
+            # holds the outputs of any cached build.
+            cache.invalidate(self)
+
+    def post_finish(self, status):
+        # Populate the build cache with the outputs of a successful build.
+        if (status == 'P' and self.build_cache_key is not None and
+                not self.restored_from_cache):
+            CompileSim.build_cache.store(self, self.build_cache_key)
+
     def get_timeout_mins(self):
         """Returns the timeout in minutes.
 
@@ -472,9 +527,18 @@ class RunTest(Deploy):
         self.test_obj = test
         self.index = index
         self.build_seed = sim_cfg.build_seed
-        self.seed = RunTest.get_seed()
+
+        # The full name of a test includes its seed, so it is journaled by
+        # its index instead. When resuming, it is run with the same seed as
+        # before.
+        journal_key = "{}:{}.{}".format(sim_cfg.name, index, test.name)
+        seed = None
+        if sim_cfg.journal is not None:
+            seed = sim_cfg.journal.get_seed(journal_key)
+        self.seed = RunTest.get_seed() if seed is None else seed
         self.simulated_time = JobTime()
         super().__init__(sim_cfg)
+        self.journal_key = journal_key
 
         if build_job is not None:
             self.dependencies.append(build_job)
@@ -556,7 +620,12 @@ class RunTest(Deploy):
     def post_finish(self, status):
         if status != 'P':
             # Delete the coverage data if available.
-            rm_path(self.cov_db_test_dir)
+            if self.reaper is not None:
+                self.reaper.remove(self.cov_db_test_dir)
+            else:
+                rm_path(self.cov_db_test_dir)
+        elif self.reaper is not None:
+            self.reaper.compress(self.get_log_path())
 
     @staticmethod
     def get_seed():
@@ -635,17 +704,25 @@ class CovMerge(Deploy):
     target = "cov_merge"
     weight = 10
 
-    def __init__(self, run_items, sim_cfg):
+    def __init__(self, run_items, sim_cfg, partial_merges=None):
+        # If the coverage of the run_items has already been merged by a tree
+        # of CovMergePartial jobs, then we only need to merge the databases
+        # at the top of the tree, which are listed in partial_merges.
+        self.partial_merges = partial_merges or []
+
         # Construct the cov_db_dirs right away from the run_items. This is a
         # special variable used in the HJson. The coverage associated with
         # the primary build mode needs to be first in the list.
         self.cov_db_dirs = []
-        for run in run_items:
-            if run.cov_db_dir not in self.cov_db_dirs:
-                if sim_cfg.primary_build_mode == run.build_mode:
-                    self.cov_db_dirs.insert(0, run.cov_db_dir)
-                else:
-                    self.cov_db_dirs.append(run.cov_db_dir)
+        if self.partial_merges:
+            self.cov_db_dirs = [p.cov_merge_db_dir for p in self.partial_merges]
+        else:
+            for run in run_items:
+                if run.cov_db_dir not in self.cov_db_dirs:
+                    if sim_cfg.primary_build_mode == run.build_mode:
+                        self.cov_db_dirs.insert(0, run.cov_db_dir)
+                    else:
+                        self.cov_db_dirs.append(run.cov_db_dir)
 
         # Early lookup the cov_merge_db_dir, which is a mandatory misc
         # attribute anyway. We need it to compute additional cov db dirs.
@@ -653,20 +730,26 @@ class CovMerge(Deploy):
                                                 sim_cfg.__dict__)
 
         # Prune previous merged cov directories, keeping past 7 dbs.
-        prev_cov_db_dirs = clean_odirs(odir=self.cov_merge_db_dir, max_odirs=7)
+        prev_cov_db_dirs = clean_odirs(odir=self.cov_merge_db_dir,
+                                       max_odirs=7,
+                                       reaper=self.reaper)
 
         # If the --cov-merge-previous command line switch is passed, then
         # merge coverage with the previous runs.
         if sim_cfg.cov_merge_previous:
             self.cov_db_dirs += [str(item) for item in prev_cov_db_dirs]
+            if self.reaper is not None:
+                self.reaper.protect(prev_cov_db_dirs)
 
         super().__init__(sim_cfg)
-        self.dependencies += run_items
+        self.dependencies += self.partial_merges or run_items
         # Run coverage merge even if one test passes.
         self.needs_all_dependencies_passing = False
 
         # Append cov_db_dirs to the list of exports.
         self.exports["cov_db_dirs"] = shlex.quote(" ".join(self.cov_db_dirs))
+        if self.partial_merges:
+            self.exports["cov_merge_db_dir"] = self.cov_merge_db_dir
 
     def _define_attrs(self):
         super()._define_attrs()
@@ -675,6 +758,12 @@ class CovMerge(Deploy):
             "cov_merge_opts": False
         })
 
+        # Merging the outputs of partial merges (as opposed to the databases
+        # written by the tests) takes different options.
+        if self.partial_merges:
+            self.cov_merge_opts = self.sim_cfg.cov_merge_tree_opts
+            self.mandatory_cmd_attrs["cov_merge_opts"] = True
+
         self.mandatory_misc_attrs.update({
             "cov_merge_dir": False,
             "cov_merge_db_dir": False
@@ -691,6 +780,74 @@ class CovMerge(Deploy):
         self.output_dirs = [self.odir]
 
 
+class CovMergePartial(Deploy):
+    """Abstraction for merging the coverage of a subset of tests.
+
+    A tree of these jobs is built when --cov-merge-fanin is set. Each leaf
+    merges the databases of a few tests and each node above merges the outputs
+    of the nodes below it, so that most of the merging is done in parallel
+    while the tests are still running. The outputs of the nodes at the top of
+    the tree are merged by the CovMerge job.
+
+    The merges are done with the cov_merge_cmd and cov_merge_tree_opts from
+    the HJson. Since the latter are expanded along with the rest of the sim
+    cfg, they need to pick up the input databases from {cov_db_dirs} (or the
+    environment variable of the same name) and the output database from the
+    cov_merge_db_dir environment variable, which are both set per job.
+    """
+
+    target = "cov_merge"
+    weight = 10
+
+    def __init__(self, level, index, inputs, sim_cfg):
+        '''Creates the partial merge 'index' in the given level of the tree.
+
+        'inputs' are the jobs whose coverage is to be merged: RunTest jobs on
+        the first level and CovMergePartial jobs above it.
+        '''
+        self.level = level
+        self.index = index
+        if level == 0:
+            self.cov_db_dirs = [item.cov_db_test_dir for item in inputs]
+        else:
+            self.cov_db_dirs = [item.cov_merge_db_dir for item in inputs]
+
+        # Name the merged database as the final one, in a directory of its
+        # own, since some tools infer the type of database from its name.
+        merge_dir = subst_wildcards("{cov_merge_dir}", sim_cfg.__dict__)
+        merge_db_dir = subst_wildcards("{cov_merge_db_dir}", sim_cfg.__dict__)
+        self.cov_merge_dir = "{}/partial/{}.{}".format(merge_dir, level, index)
+        self.cov_merge_db_dir = "{}/{}".format(self.cov_merge_dir,
+                                               Path(merge_db_dir).name)
+        self.cov_merge_opts = sim_cfg.cov_merge_tree_opts
+
+        super().__init__(sim_cfg)
+        self.dependencies += inputs
+        # Merge whatever coverage is available, even if some inputs failed.
+        self.needs_all_dependencies_passing = False
+
+        # The tool may pick these up from the environment.
+        self.exports["cov_db_dirs"] = shlex.quote(" ".join(self.cov_db_dirs))
+        self.exports["cov_merge_db_dir"] = self.cov_merge_db_dir
+
+    def _define_attrs(self):
+        super()._define_attrs()
+        self.mandatory_cmd_attrs.update({
+            "cov_merge_cmd": False,
+            "cov_merge_opts": True
+        })
+
+    def _set_attrs(self):
+        super()._set_attrs()
+        self.qual_name = "{}.{}.{}".format(self.target, self.level,
+                                           self.index)
+        self.full_name = self.sim_cfg.name + ":" + self.qual_name
+
+        self.odir = self.cov_merge_db_dir
+        self.input_dirs += self.cov_db_dirs
+        self.output_dirs = [self.odir]
+
+
 class CovReport(Deploy):
     """Abstraction for coverage report generation. """
 
@@ -14,6 +14,8 @@ from shutil import which
 import hjson
 from results_server import NoGCPError, ResultsServer
 from CfgJson import set_target_attribute
+from HjsonCache import HjsonCache
+from Journal import Journal
 from LauncherFactory import get_launcher_cls
 from Scheduler import Scheduler
 from utils import (VERBOSE, clean_odirs, find_and_substitute_wildcards,
@@ -80,6 +82,10 @@ class FlowCfg():
         # slated for dispatch.
         self.deploy = []
 
+        # The Journal recording the status of the jobs of this cfg, set when
+        # the deploy objects are created.
+        self.journal = None
+
         # Timestamp
         self.timestamp_long = args.timestamp_long
         self.timestamp = args.timestamp
@@ -126,6 +132,7 @@ class FlowCfg():
         if not self.is_primary_cfg:
             self.cfgs.append(self)
         else:
+            self._prefetch_child_cfgs()
             for entry in self.use_cfgs:
                 self._load_child_cfg(entry, mk_config)
 
@@ -212,6 +219,24 @@ class FlowCfg():
 
         return new_instance
 
+    def _prefetch_child_cfgs(self):
+        '''Parse the hjson files of all child cfgs in parallel
+
+        The child cfgs are then loaded one at a time as usual, but find their
+        files already parsed (see HjsonCache).
+
+        '''
+        cfg_files = [subst_wildcards(entry, self.__dict__, ignore_error=True)
+                     for entry in self.use_cfgs if type(entry) is str]
+
+        # These are the values that the child cfgs start from when resolving
+        # their imports (see CfgFactory.make_cfg).
+        initial_values = {'proj_root': self.proj_root}
+        if self.args.tool is not None:
+            initial_values['tool'] = self.args.tool
+
+        HjsonCache.prefetch(cfg_files, initial_values)
+
     def _load_child_cfg(self, entry, mk_config):
         '''Load a child configuration for a primary cfg'''
         if type(entry) is str:
@@ -376,7 +401,83 @@ class FlowCfg():
             sys.exit(1)
 
         for item in self.cfgs:
+            item._open_journal()
             item._create_deploy_objects()
+            item._resume_deploy_objects()
+
+    def _open_journal(self, load=None):
+        '''Opens the journal recording the status of the jobs of this cfg.
+
+        The journal is kept in the scratch area. If load is set (by default,
+        with --resume or --rerun-failed), the records of the previous
+        invocation are loaded, so that tests are created with the seeds they
+        were run with before.
+        '''
+        if load is None:
+            load = self.args.resume or self.args.rerun_failed
+        path = os.path.join(self.scratch_path, "journal.jsonl")
+        self.journal = Journal(path, load)
+        if load:
+            log.info("[journal]: [%s]: %s", self.name, self.journal)
+
+    def _resume_deploy_objects(self):
+        '''Skips the deploy objects that need not run again.
+
+        With --resume, the jobs that passed in the previous invocation (and
+        whose log is still there) are marked as resumed: the launcher picks up
+        their outcome from the existing log instead of running them again. With
+        --rerun-failed, in addition, the tests that did not run at all in the
+        previous invocation are dropped, so that only the failing ones (and
+        whatever they depend on that did not pass) are run.
+
+        A job is only resumed if all the jobs it depends on are resumed too:
+        if a build runs again, so do the tests using it, and if coverage is
+        merged again, so is the report on it. Dependencies that belong to
+        another cfg are only considered resumed if that cfg was resumed
+        before this one.
+        '''
+        if not (self.args.resume or self.args.rerun_failed):
+            return
+
+        passed = set()
+        dropped = set()
+        for item in self.deploy:
+            status = self.journal.get_status(item.journal_key)
+            # The log of a passing test may have been compressed.
+            log_path = item.get_log_path()
+            if status == 'P' and (os.path.exists(log_path) or
+                                  os.path.exists(log_path + ".gz")):
+                passed.add(item)
+            elif (self.args.rerun_failed and item.target == "run" and
+                  status is None):
+                dropped.add(item)
+
+        # Whether each job of this cfg is resumed, computed in dependency
+        # order.
+        own = set(self.deploy)
+        resumed = {}
+
+        def _is_resumed(item):
+            if item not in own:
+                return item.resumed
+            if item not in resumed:
+                resumed[item] = item in passed and all(
+                    _is_resumed(dep)
+                    for dep in item.dependencies if dep not in dropped)
+            return resumed[item]
+
+        deploy = []
+        for item in self.deploy:
+            if item in dropped:
+                continue
+            item.resumed = _is_resumed(item)
+            deploy.append(item)
+
+        num_resumed = sum(item.resumed for item in deploy)
+        log.info("[journal]: [%s]: %d of %d jobs passed previously; running "
+                 "%d", self.name, num_resumed, len(self.deploy),
+                 len(deploy) - num_resumed)
+        self.deploy = deploy
 
     def deploy_objects(self):
         '''Public facing API for deploying all available objects.
@@ -391,7 +492,38 @@ class FlowCfg():
             log.error("Nothing to run!")
             sys.exit(1)
 
-        return Scheduler(deploy, get_launcher_cls(), self.interactive).run()
+        results = Scheduler(deploy, get_launcher_cls(), self.interactive,
+                            self._on_job_done).run()
+
+        for item in self.cfgs:
+            item._flush_partial_results()
+            if item.journal is not None:
+                item.journal.close()
+
+        return results
+
+    def _on_job_done(self, item, status):
+        '''Called by the scheduler as each deployed item completes.
+
+        This records the status in the journal and forwards the result to the
+        cfg that the item belongs to.
+        '''
+        journal = item.sim_cfg.journal
+        if journal is not None and not item.dry_run:
+            journal.record(item, status)
+        item.sim_cfg._fold_result(item, status)
+
+    def _fold_result(self, item, status):
+        '''Fold the result of a completed item into partial results.
+
+        Flows that produce reports while the jobs are still running should
+        override this and _flush_partial_results.
+        '''
+        return
+
+    def _flush_partial_results(self):
+        '''Write out the partial results folded in so far.'''
+        return
 
     def _gen_results(self, results):
         '''
@@ -0,0 +1,111 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''pytest-based testing for resuming the jobs of a cfg'''
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# The dvsim modules import each other as top-level modules.
+sys.path.insert(0, str(Path(__file__).parent))
+
+from FlowCfg import FlowCfg  # noqa: E402
+
+
+class FakeJournal:
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    def get_status(self, key):
+        return self.statuses.get(key)
+
+
+class FakeDeploy:
+
+    def __init__(self, tmp_path, name, target, dependencies=(), log=True):
+        self.journal_key = name
+        self.target = target
+        self.dependencies = list(dependencies)
+        self.resumed = False
+        self.log_path = tmp_path / (name + '.log')
+        if log:
+            self.log_path.write_text('')
+
+    def get_log_path(self):
+        return str(self.log_path)
+
+
+def resume(deploy, statuses, rerun_failed=False):
+    '''Runs FlowCfg._resume_deploy_objects on the given jobs.
+
+    Returns the names of the jobs left to run and of those resumed.
+    '''
+    cfg = SimpleNamespace(
+        name='cfg',
+        args=SimpleNamespace(resume=not rerun_failed,
+                             rerun_failed=rerun_failed),
+        journal=FakeJournal(statuses),
+        deploy=deploy)
+    FlowCfg._resume_deploy_objects(cfg)
+    return ([item.journal_key for item in cfg.deploy],
+            [item.journal_key for item in cfg.deploy if item.resumed])
+
+
+def test_build_runs_again(tmp_path):
+    # The build failed last time: its tests run again with it, even those
+    # that passed.
+    build_a = FakeDeploy(tmp_path, 'build_a', 'build')
+    build_b = FakeDeploy(tmp_path, 'build_b', 'build')
+    deploy = [
+        build_a, build_b,
+        FakeDeploy(tmp_path, 'test_a', 'run', [build_a]),
+        FakeDeploy(tmp_path, 'test_b', 'run', [build_b]),
+    ]
+    statuses = {'build_a': 'F', 'build_b': 'P', 'test_a': 'P', 'test_b': 'P'}
+    assert resume(deploy, statuses)[1] == ['build_b', 'test_b']
+
+    # Likewise if the log of the build is gone.
+    build_a.log_path.unlink()
+    statuses['build_a'] = 'P'
+    for item in deploy:
+        item.resumed = False
+    assert resume(deploy, statuses)[1] == ['build_b', 'test_b']
+
+
+def test_coverage_chain(tmp_path):
+    # The merge runs again (its log was moved aside), so the report on it
+    # does too, although its log is there.
+    build = FakeDeploy(tmp_path, 'build', 'build')
+    test = FakeDeploy(tmp_path, 'test', 'run', [build])
+    merge = FakeDeploy(tmp_path, 'merge', 'cov_merge', [test], log=False)
+    report = FakeDeploy(tmp_path, 'report', 'cov_report', [merge])
+    statuses = {name: 'P' for name in ['build', 'test', 'merge', 'report']}
+    assert resume([report, merge, test, build],
+                  statuses)[1] == ['test', 'build']
+
+
+def test_rerun_failed(tmp_path):
+    # Tests that did not run before are dropped, and do not keep what
+    # depends on them from being resumed.
+    build = FakeDeploy(tmp_path, 'build', 'build')
+    passed = FakeDeploy(tmp_path, 'passed', 'run', [build])
+    failed = FakeDeploy(tmp_path, 'failed', 'run', [build])
+    new = FakeDeploy(tmp_path, 'new', 'run', [build], log=False)
+    merge = FakeDeploy(tmp_path, 'merge', 'cov_merge', [passed, new])
+    statuses = {'build': 'P', 'passed': 'P', 'failed': 'F', 'merge': 'P'}
+    assert resume([build, passed, failed, new, merge], statuses,
+                  rerun_failed=True) == (
+                      ['build', 'passed', 'failed', 'merge'],
+                      ['build', 'passed', 'merge'])
+
+
+def test_other_cfg(tmp_path):
+    # A build of another cfg counts as resumed only if it was resumed.
+    build = FakeDeploy(tmp_path, 'build', 'build')
+    test = FakeDeploy(tmp_path, 'test', 'run', [build])
+    assert resume([test], {'test': 'P'})[1] == []
+    build.resumed = True
+    assert resume([test], {'test': 'P'})[1] == ['test']
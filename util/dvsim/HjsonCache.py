@@ -0,0 +1,280 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+A cache of parsed hjson configuration files.
+"""
+
+import hashlib
+import json
+import logging as log
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import repeat
+
+import hjson
+
+from utils import VERBOSE, hjson_loader, parse_hjson, subst_wildcards
+
+
+def _parse_worker(path, to_disk):
+    '''Parses the hjson file at path in a worker process.
+
+    Returns a tuple (stat_key, content_key, data, entry) where data is the
+    pickled result and entry is what to store in the disk cache (if to_disk
+    is set, else None), or None if the file could not be read or parsed (the
+    error is then reported when the file is loaded for real).
+    '''
+    try:
+        stat_key = HjsonCache._stat_key(path)
+        with open(path, "rb") as f:
+            text = f.read()
+        obj = hjson_loader.loads(text.decode("utf-8"), use_decimal=True)
+    except Exception:
+        return None
+    return (stat_key, HjsonCache._content_key(text),
+            pickle.dumps(obj, pickle.HIGHEST_PROTOCOL),
+            HjsonCache._encode_entry(obj) if to_disk else None)
+
+
+class HjsonCache:
+    '''Caches the results of parsing dvsim's hjson configuration files.
+
+    Parsing with the pure-Python hjson module dominates the startup of dvsim
+    on a primary cfg, where the same few common files are imported by every
+    child cfg. Parsed files are kept in memory, keyed by their path, mtime
+    and size, and (if cache_dir is set) on disk, keyed by a hash of their
+    contents so that the cache survives across invocations.
+
+    Every lookup returns a fresh copy of the parsed data, since the loaders
+    merge it into their own dicts and update lists in place.
+
+    The scratch root holding the cache on disk may be shared with other users,
+    so entries are stored as JSON (which holds nothing but data) and only read
+    if they are owned by the current user and not writable by anyone else.
+    '''
+
+    # Directory where parsed files are cached on disk. Set from dvsim.py. If
+    # None, files are only cached in memory for the current invocation.
+    cache_dir = None
+
+    # Maximum number of processes used by prefetch().
+    max_workers = min(os.cpu_count() or 1, 16)
+
+    # Map of path to ((mtime, size), pickled parsed data).
+    _parsed = {}
+
+    @staticmethod
+    def _stat_key(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _content_key(text):
+        h = hashlib.sha256()
+        h.update(hjson.__version__.encode("utf-8"))
+        h.update(text)
+        return h.hexdigest()
+
+    @classmethod
+    def _disk_path(cls, content_key):
+        return os.path.join(cls.cache_dir, content_key[:2],
+                            content_key + ".json")
+
+    @staticmethod
+    def _encode_entry(obj):
+        '''Returns the parsed data obj as JSON, for the disk cache.
+
+        Numbers parsed as Decimal are written out as they are, so that they
+        are read back as the same Decimal (see _load_from_disk).
+        '''
+        return hjson.dumpsJSON(obj, use_decimal=True).encode("utf-8")
+
+    @classmethod
+    def _load_from_disk(cls, content_key):
+        '''Returns the pickled data of the disk cache entry for content_key.
+
+        Returns None if there is no such entry, or if it cannot be trusted.
+        '''
+        if cls.cache_dir is None:
+            return None
+        path = cls._disk_path(content_key)
+        try:
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_uid != os.getuid() or st.st_mode & 0o022:
+                    log.debug("[hjson_cache]: ignoring %s, which is not "
+                              "owned by (or only writable by) the current "
+                              "user", path)
+                    return None
+                obj = json.loads(f.read().decode("utf-8"),
+                                 parse_float=Decimal)
+        except (OSError, ValueError):
+            return None
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def _store_to_disk(cls, content_key, entry):
+        '''Writes entry to the disk cache, ignoring any errors.
+
+        The entry is written to a temporary file which is then renamed into
+        place, so that concurrent dvsim invocations never read a partially
+        written entry.
+        '''
+        if cls.cache_dir is None:
+            return
+        path = cls._disk_path(content_key)
+        tmp = "{}.tmp.{}".format(path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Whatever the umask, the entry is only writable by its owner,
+            # or it would be ignored.
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(entry)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.debug("[hjson_cache]: failed to write %s: %s", path, e)
+
+    @classmethod
+    def _lookup(cls, path):
+        '''Returns the pickled data for path if cached in memory and current.
+
+        Otherwise returns None, with the stat key of the file (or None if the
+        file could not be stat'ed) as the second item of the returned tuple.
+        '''
+        try:
+            stat_key = cls._stat_key(path)
+        except OSError:
+            return (None, None)
+        entry = cls._parsed.get(path)
+        if entry is not None and entry[0] == stat_key:
+            return (entry[1], stat_key)
+        return (None, stat_key)
+
+    @classmethod
+    def parse(cls, path):
+        '''Returns the parsed contents of the hjson file at path.
+
+        This is a drop-in replacement for utils.parse_hjson (which is used to
+        parse and report errors on a miss).
+        '''
+        data, stat_key = cls._lookup(path)
+        if data is not None:
+            return pickle.loads(data)
+
+        content_key = None
+        if stat_key is not None:
+            try:
+                with open(path, "rb") as f:
+                    content_key = cls._content_key(f.read())
+            except OSError:
+                pass
+
+        if content_key is not None:
+            data = cls._load_from_disk(content_key)
+            if data is not None:
+                cls._parsed[path] = (stat_key, data)
+                return pickle.loads(data)
+
+        obj = parse_hjson(path)
+        if content_key is not None:
+            data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+            cls._parsed[path] = (stat_key, data)
+            if cls.cache_dir is not None:
+                cls._store_to_disk(content_key, cls._encode_entry(obj))
+        return obj
+
+    @classmethod
+    def prefetch(cls, paths, initial_values):
+        '''Parses the given cfg files, and the files they import, in parallel.
+
+        This is done ahead of loading the child cfgs of a primary cfg, which
+        then find their files in the cache. Imported paths are resolved using
+        initial_values only (plus 'self_dir', as load_hjson does), so imports
+        that depend on values set in the cfgs themselves are not prefetched
+        and are parsed as they are loaded instead.
+        '''
+        # Pairs (path, self_dir) still to be looked at, where self_dir is the
+        # directory of the cfg that (transitively) imports path.
+        worklist = [(path, os.path.dirname(path)) for path in paths]
+        seen = set()
+        executor = None
+        try:
+            while worklist:
+                to_parse = []
+                parsed = []
+                for path, self_dir in worklist:
+                    if path in seen:
+                        continue
+                    seen.add(path)
+                    data, stat_key = cls._lookup(path)
+                    if data is None and stat_key is not None:
+                        data = cls._prefetch_from_disk(path, stat_key)
+                    if data is None:
+                        to_parse.append((path, self_dir))
+                    else:
+                        parsed.append((path, self_dir, data))
+
+                if to_parse:
+                    if executor is None and len(to_parse) > 1:
+                        executor = ProcessPoolExecutor(cls.max_workers)
+                    jobs = [path for path, _ in to_parse]
+                    to_disk = repeat(cls.cache_dir is not None)
+                    if executor is None:
+                        results = map(_parse_worker, jobs, to_disk)
+                    else:
+                        results = executor.map(_parse_worker, jobs, to_disk)
+                    for (path, self_dir), result in zip(to_parse, results):
+                        if result is None:
+                            continue
+                        stat_key, content_key, data, entry = result
+                        cls._parsed[path] = (stat_key, data)
+                        if entry is not None:
+                            cls._store_to_disk(content_key, entry)
+                        parsed.append((path, self_dir, data))
+
+                worklist = []
+                for path, self_dir, data in parsed:
+                    worklist += [(import_path, self_dir)
+                                 for import_path in cls._imports(
+                                     data, initial_values, self_dir)]
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        log.log(VERBOSE, "[hjson_cache]: prefetched %d files", len(seen))
+
+    @classmethod
+    def _prefetch_from_disk(cls, path, stat_key):
+        try:
+            with open(path, "rb") as f:
+                content_key = cls._content_key(f.read())
+        except OSError:
+            return None
+        data = cls._load_from_disk(content_key)
+        if data is not None:
+            cls._parsed[path] = (stat_key, data)
+        return data
+
+    @staticmethod
+    def _imports(data, initial_values, self_dir):
+        '''Returns the import_cfgs in data that resolve with initial_values.'''
+        obj = pickle.loads(data)
+        if not isinstance(obj, dict):
+            return []
+        import_cfgs = obj.get("import_cfgs")
+        if not isinstance(import_cfgs, list):
+            return []
+
+        values = dict(initial_values, self_dir=self_dir)
+        paths = []
+        for import_cfg in import_cfgs:
+            if not isinstance(import_cfg, str):
+                continue
+            path = subst_wildcards(import_cfg, values, ignore_error=True)
+            if "{" not in path:
+                paths.append(path)
+        return paths
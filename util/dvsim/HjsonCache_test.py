@@ -0,0 +1,117 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''pytest-based testing for the cache of parsed hjson cfgs'''
+
+import os
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+# The dvsim modules import each other as top-level modules.
+sys.path.insert(0, str(Path(__file__).parent))
+
+from HjsonCache import HjsonCache  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    '''An empty cache, on disk in tmp_path/cache.'''
+    monkeypatch.setattr(HjsonCache, 'cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setattr(HjsonCache, '_parsed', {})
+    return tmp_path / 'cache'
+
+
+def entries(cache):
+    return sorted(cache.glob('*/*'))
+
+
+def test_parse_copies(cache, tmp_path):
+    cfg = tmp_path / 'cfg.hjson'
+    cfg.write_text('{\n  name: foo\n  list: [1, 2]\n}\n')
+
+    obj = HjsonCache.parse(str(cfg))
+    assert obj == {'name': 'foo', 'list': [1, 2]}
+    obj['list'].append(3)
+    assert HjsonCache.parse(str(cfg)) == {'name': 'foo', 'list': [1, 2]}
+
+
+def test_invalidation(cache, tmp_path):
+    cfg = tmp_path / 'cfg.hjson'
+    cfg.write_text('{\n  name: foo\n}\n')
+    assert HjsonCache.parse(str(cfg)) == {'name': 'foo'}
+
+    # A change in size.
+    cfg.write_text('{\n  name: foobar\n}\n')
+    assert HjsonCache.parse(str(cfg)) == {'name': 'foobar'}
+
+    # A change in mtime only (same size).
+    cfg.write_text('{\n  name: bazbar\n}\n')
+    st = cfg.stat()
+    os.utime(cfg, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert HjsonCache.parse(str(cfg)) == {'name': 'bazbar'}
+
+    # Going back to earlier contents finds them on disk.
+    assert len(entries(cache)) == 3
+    cfg.write_text('{\n  name: foo\n}\n')
+    HjsonCache._parsed.clear()
+    assert HjsonCache.parse(str(cfg)) == {'name': 'foo'}
+    assert len(entries(cache)) == 3
+
+
+def test_disk_entries(cache, tmp_path):
+    cfg = tmp_path / 'cfg.hjson'
+    cfg.write_text('{a: 1.5, b: 2.0, c: 1e12, d: "1.5", e: [true, null]}')
+    expected = HjsonCache.parse(str(cfg))
+    assert expected['a'] == Decimal('1.5')
+    assert expected['b'] == 2 and isinstance(expected['b'], int)
+
+    # The entry is plain JSON, only writable by its owner.
+    entry, = entries(cache)
+    assert entry.suffix == '.json'
+    assert not entry.stat().st_mode & 0o022
+    assert entry.read_text().startswith('{')
+
+    # What is read back from disk is what was parsed, types included.
+    HjsonCache._parsed.clear()
+    obj = HjsonCache.parse(str(cfg))
+    assert obj == expected
+    assert [type(v) for v in obj.values()] == [type(v)
+                                               for v in expected.values()]
+    assert str(obj['c']) == str(expected['c'])
+
+
+def test_untrusted_entry(cache, tmp_path):
+    cfg = tmp_path / 'cfg.hjson'
+    cfg.write_text('{\n  name: foo\n}\n')
+    HjsonCache.parse(str(cfg))
+
+    # An entry that others could have written is not used.
+    entry, = entries(cache)
+    entry.write_text('{"name": "evil"}')
+    entry.chmod(0o666)
+    HjsonCache._parsed.clear()
+    assert HjsonCache.parse(str(cfg)) == {'name': 'foo'}
+
+    # Nor is one that is not JSON.
+    entry.write_bytes(b'\x80\x04K\x01.')
+    entry.chmod(0o644)
+    HjsonCache._parsed.clear()
+    assert HjsonCache.parse(str(cfg)) == {'name': 'foo'}
+
+
+def test_prefetch(cache, tmp_path):
+    (tmp_path / 'common.hjson').write_text('{\n  x: 1\n}\n')
+    for name in ['a', 'b']:
+        (tmp_path / (name + '.hjson')).write_text(
+            '{\n  name: ' + name +
+            '\n  import_cfgs: ["{self_dir}/common.hjson"]\n}\n')
+
+    HjsonCache.prefetch([str(tmp_path / 'a.hjson'),
+                         str(tmp_path / 'b.hjson')], {})
+    assert len(HjsonCache._parsed) == 3
+    assert len(entries(cache)) == 3
+    assert HjsonCache.parse(str(tmp_path / 'common.hjson')) == {'x': 1}
@@ -0,0 +1,88 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging as log
+import threading
+import time
+
+
+class JobStatusCache:
+    '''Caches the status of jobs dispatched to a compute farm.
+
+    Querying the status of each job individually on every poll does not scale
+    to thousands of jobs in flight. Instead, a single background thread
+    periodically queries the status of all outstanding jobs with one command
+    and stores the results in a dict. The launchers then look up the status
+    of their job in this dict, which makes their poll() a dictionary lookup.
+
+    This is an abstract class: the launcher variant-specific query is
+    implemented by the extended classes in _query().
+    '''
+
+    def __init__(self, refresh_secs):
+        # Query the status of the outstanding jobs every this many seconds.
+        self.refresh_secs = refresh_secs
+
+        # Ids of the jobs whose status is to be queried.
+        self._outstanding = set()
+        self._lock = threading.Lock()
+
+        # Map of job id to the last status queried. This dict is replaced
+        # (not updated) on each refresh, so readers never see it partially
+        # updated.
+        self._status = {}
+
+        self._thread = None
+
+    def add(self, job_id):
+        '''Starts tracking the status of a job.
+
+        The background thread is started on the first call.
+        '''
+        with self._lock:
+            self._outstanding.add(job_id)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run,
+                                            name=type(self).__name__,
+                                            daemon=True)
+            self._thread.start()
+
+    def remove(self, job_id):
+        '''Stops tracking the status of a job that has completed.'''
+        with self._lock:
+            self._outstanding.discard(job_id)
+
+    def get(self, job_id):
+        '''Returns the last known status of a job, or None if not known.'''
+        return self._status.get(job_id)
+
+    def refresh(self):
+        '''Queries the status of all outstanding jobs.
+
+        Failures are not fatal: the previous results are retained and the
+        launchers fall back to their own means of determining the status.
+        '''
+        with self._lock:
+            job_ids = sorted(self._outstanding)
+        if not job_ids:
+            return
+
+        try:
+            self._status = self._query(job_ids)
+        except Exception as e:
+            log.debug("%s: failed to query the status of %d jobs: %s",
+                      type(self).__name__, len(job_ids), e)
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_secs)
+
+    def _query(self, job_ids):
+        '''Queries the status of the given jobs.
+
+        Returns a dict mapping each job id found to its status.
+        '''
+        raise NotImplementedError()
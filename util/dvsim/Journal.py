@@ -0,0 +1,109 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+A persistent record of the outcome of the jobs of a cfg.
+"""
+
+import json
+import logging as log
+import os
+import time
+
+
+class Journal:
+    '''An append-only record of the status of each completed job of a cfg.
+
+    Each line of the journal file is a JSON object recording the completion of
+    one job: its key (Deploy.journal_key), its status ('P', 'F' or 'K') and the
+    seed it was run with. A line is written out as soon as the job completes,
+    so the journal survives dvsim being interrupted, which is what allows a
+    later invocation with --resume or --rerun-failed to pick up where the
+    previous one left off. If a job appears more than once, the last record
+    wins.
+    '''
+
+    # Flush the journal to disk (fsync) at most once per this many seconds.
+    # Records are always written out to the OS right away.
+    sync_secs = 1
+
+    def __init__(self, path, load):
+        self.path = path
+
+        # Map of job key to its last record.
+        self._records = {}
+        self._needs_newline = False
+        if load:
+            self._load()
+
+        # If the previous records are not loaded, they no longer apply and
+        # the journal is started afresh on the first write.
+        self._append = load
+        self._file = None
+        self._last_sync = 0
+
+    def __str__(self):
+        return self.path
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="UTF-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            log.warning("No journal found at %s; nothing to resume.",
+                        self.path)
+            return
+
+        # If the last line was only partially written, the next record must
+        # start on a new line.
+        self._needs_newline = bool(lines) and not lines[-1].endswith("\n")
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+                self._records[record["key"]] = record
+            except (ValueError, KeyError, TypeError):
+                # A partially written line, if dvsim was killed while writing
+                # it. The job is treated as not having completed.
+                log.debug("Ignoring malformed line in journal %s: %r",
+                          self.path, line)
+
+    def get_status(self, key):
+        '''Returns the last recorded status of a job, or None.'''
+        record = self._records.get(key)
+        return None if record is None else record.get("status")
+
+    def get_seed(self, key):
+        '''Returns the seed a job was last run with, or None.'''
+        record = self._records.get(key)
+        return None if record is None else record.get("seed")
+
+    def record(self, item, status):
+        '''Records the completion of a job with the given status.'''
+        record = {
+            "key": item.journal_key,
+            "status": status,
+            "seed": getattr(item, "seed", None),
+        }
+        self._records[record["key"]] = record
+
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a" if self._append else "w",
+                              encoding="UTF-8")
+            self._append = True
+            if self._needs_newline:
+                self._file.write("\n")
+                self._needs_newline = False
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+        now = time.monotonic()
+        if now - self._last_sync >= self.sync_secs:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
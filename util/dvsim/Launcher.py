@@ -10,7 +10,7 @@ import re
 import sys
 from pathlib import Path
 
-from utils import VERBOSE, clean_odirs, mk_symlink, rm_path
+from utils import VERBOSE, clean_odirs, mk_symlink, open_log, rm_path
 
 
 class LauncherError(Exception):
@@ -172,7 +172,9 @@ class Launcher:
 
         # If renew_odir flag is True - then move it.
         if self.renew_odir:
-            clean_odirs(odir=self.deploy.odir, max_odirs=self.max_odirs)
+            clean_odirs(odir=self.deploy.odir,
+                        max_odirs=self.max_odirs,
+                        reaper=self.deploy.reaper)
         os.makedirs(self.deploy.odir, exist_ok=True)
 
     def _link_odir(self, status):
@@ -224,7 +226,24 @@ class Launcher:
     def launch(self):
         """Launch the job."""
 
+        # If the job passed in the invocation of dvsim being resumed, there is
+        # nothing to prepare or run. Its outcome is picked up from its
+        # existing log, as if it had just completed.
+        if self.deploy.resumed:
+            self.start_time = datetime.datetime.now()
+            self.exit_code = 0
+            self._post_finish(*self._check_status())
+            return
+
         self._pre_launch()
+
+        # If the job's outputs were restored from a cache, there is nothing
+        # left to run. Mark it as passed right away; poll() will pick up the
+        # status.
+        if self.deploy.restored_from_cache:
+            self._post_finish("P", None)
+            return
+
         self._do_launch()
 
     def poll(self):
@@ -272,10 +291,7 @@ class Launcher:
         chk_passed = bool(pass_patterns) and (self.exit_code == 0)
 
         try:
-            with open(self.deploy.get_log_path(),
-                      "r",
-                      encoding="UTF-8",
-                      errors="surrogateescape") as f:
+            with open_log(self.deploy.get_log_path()) as f:
                 lines = f.readlines()
         except OSError as e:
             return "F", ErrorMessage(
@@ -9,6 +9,7 @@ from Launcher import Launcher
 from LocalLauncher import LocalLauncher
 from LsfLauncher import LsfLauncher
 from SgeLauncher import SgeLauncher
+from SocketLauncher import SocketLauncher
 
 try:
     from edacloudlauncher.EdaCloudLauncher import EdaCloudLauncher
@@ -25,8 +26,8 @@ def set_launcher_type(is_local=False):
 
     The env variable `DVSIM_LAUNCHER` is used to identify what launcher system
     to use. This variable is specific to the user's work site. It is meant to
-    be set externally before invoking DVSim. Valid values are [local, lsf,
-    edacloud]. If --local arg is supplied then the local launcher takes
+    be set externally before invoking DVSim. Valid values are [local, socket,
+    lsf, sge, edacloud]. If --local arg is supplied then the local launcher takes
     precedence.
     '''
 
@@ -39,6 +40,9 @@ def set_launcher_type(is_local=False):
     if launcher == "local":
         _LAUNCHER_CLS = LocalLauncher
 
+    elif launcher == "socket":
+        _LAUNCHER_CLS = SocketLauncher
+
     elif launcher == "lsf":
         _LAUNCHER_CLS = LsfLauncher
 
@@ -4,17 +4,168 @@
 # SPDX-License-Identifier: Apache-2.0
 r"""Helper class for parsing lint reports into a generic hjson format.
 """
+import os
 import re
 import hjson
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
+
+
+class _PatternGroup():
+    """Patterns tried together, compiled into one alternation.
+
+    Each pattern is wrapped in a named group, so that the first pattern
+    matching a line can be told from the match.
+    """
+
+    def __init__(self, indices: List[int], patterns: List[str],
+                 anchored: bool) -> None:
+        self.indices = indices
+        self.anchored = anchored
+
+        # Patterns with numbered back references cannot be combined, as the
+        # named groups shift the group numbers: try all of them on every line.
+        self.combined = None
+        if any(re.search(r"\\[1-9]", patterns[i]) for i in indices):
+            return
+        try:
+            self.combined = re.compile("|".join(
+                "(?P<p{}>{})".format(i, patterns[i]) for i in indices),
+                                       flags=re.MULTILINE)
+        except re.error:
+            pass
+
+    def candidates(self, line: str) -> List[int]:
+        """Returns the indices of the patterns that may match line."""
+        if self.combined is None:
+            return self.indices
+        if self.anchored:
+            m = self.combined.match(line)
+        else:
+            m = self.combined.search(line)
+        if m is None:
+            return []
+        if not self.anchored:
+            return self.indices
+
+        # The patterns before the first one matching did not match at the
+        # start of the line, the only place where they can match.
+        first = int(m.lastgroup[1:])
+        return [i for i in self.indices if i >= first]
+
+
+class PatternSet():
+    """A list of patterns matched against a report, one line at a time.
+
+    Rather than matching each pattern over the whole report, the patterns are
+    compiled into a few alternations (one per character that the patterns
+    anchored to the start of a line start with, one for the other anchored
+    patterns and one for the patterns that are not anchored). A line is only
+    matched against the individual patterns of the alternations that match
+    it, so that most lines are skipped after one or two regex searches, yet a
+    line matching several patterns is reported for each of them, as before.
+
+    Patterns are matched against each line without its line ending, so they
+    cannot match across lines.
+    """
+
+    # Characters with a special meaning at the start of a pattern.
+    _SPECIAL_CHARS = set(".^$*+?{}[]\\|()")
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.patterns = [re.compile(p, flags=re.MULTILINE) for p in patterns]
+
+        by_first_char = {}
+        anchored_other = []
+        unanchored = []
+        for i, pattern in enumerate(patterns):
+            if not pattern.startswith("^") or "|" in pattern:
+                unanchored.append(i)
+            elif len(pattern) > 2 and pattern[1] not in self._SPECIAL_CHARS \
+                    and pattern[2] not in "*+?{":
+                by_first_char.setdefault(pattern[1], []).append(i)
+            else:
+                anchored_other.append(i)
+
+        self.by_first_char = {
+            c: _PatternGroup(indices, patterns, True)
+            for c, indices in by_first_char.items()
+        }
+        self.groups = [
+            _PatternGroup(indices, patterns, anchored)
+            for indices, anchored in ((anchored_other, True),
+                                      (unanchored, False)) if indices
+        ]
+
+    def match_lines(self, lines: Iterable[str]) -> List[List]:
+        """Returns the matches of each pattern, in the order of the lines."""
+        matches = [[] for _ in self.patterns]
+        for line in lines:
+            line = line.rstrip("\n")
+            groups = self.groups
+            group = self.by_first_char.get(line[:1])
+            if group is not None:
+                groups = [group] + groups
+            for group in groups:
+                for i in group.candidates(line):
+                    matches[i] += self.patterns[i].findall(line)
+        return matches
+
+
+def parse_report(path: Path,
+                 patterns: List[Tuple[str, str]]) -> Tuple[Optional[str],
+                                                           List]:
+    """Parses a report, streaming it line by line.
+
+    Returns a tuple (error, matches), where matches is a list of (bucket,
+    messages) tuples, one per pattern, in the order of the patterns. If the
+    report cannot be read, error is the error message.
+
+    This is a function rather than a method so that reports can be parsed in
+    other processes.
+    """
+    pattern_set = PatternSet([pattern for _, pattern in patterns])
+    try:
+        with path.open() as f:
+            matches = pattern_set.match_lines(f)
+    except IOError as err:
+        return "IOError: %s" % err, []
+    return None, [(bucket, messages)
+                  for (bucket, _), messages in zip(patterns, matches)]
+
+
+def read_section(path: Path, start: str, end: str) -> Optional[str]:
+    """Returns the text of a report between two markers, or None.
+
+    The text is taken from just after the first line starting with 'start',
+    up to the first occurrence of 'end' after it, reading the report only as
+    far as needed.
+    """
+    section = None
+    with path.open() as f:
+        for line in f:
+            if section is None:
+                if line.startswith(start):
+                    section = [line[len(start):]]
+                continue
+            pos = line.find(end)
+            if pos >= 0:
+                section.append(line[:pos])
+                return ''.join(section)
+            section.append(line)
+    return None
 
 
 # TODO(#9079): this class will be refactored so that it can be integrated into
 # the Dvsim core code.
 class LintParser():
 
+    # If several reports are parsed at once and they are at least this many
+    # bytes in total, they are parsed in parallel, in a pool of processes.
+    parallel_min_bytes = 16 << 20
+
     def __init__(self) -> None:
         self.buckets = {
             'flow_warning': [],
@@ -40,9 +191,30 @@ class LintParser():
         The argument patterns needs to be a list of tuples with
         (<error_severity>, <pattern_to_match_for>).
         """
-        for bucket, pattern in patterns:
-            self.buckets[bucket] += \
-                re.findall(pattern, log_content, flags=re.MULTILINE)
+        pattern_set = PatternSet([pattern for _, pattern in patterns])
+        matches = pattern_set.match_lines(log_content.split('\n'))
+        for (bucket, _), messages in zip(patterns, matches):
+            self.buckets[bucket] += messages
+
+    def _parse_reports(self, args: Dict[Path, List[Tuple]]) -> List[Tuple]:
+        """Parses each report, in parallel if worthwhile.
+
+        Returns the results of parse_report() for each report, in order.
+        """
+        total_bytes = 0
+        for path in args:
+            try:
+                total_bytes += path.stat().st_size
+            except OSError:
+                pass
+
+        if len(args) < 2 or total_bytes < self.parallel_min_bytes:
+            return [parse_report(path, patterns)
+                    for path, patterns in args.items()]
+
+        with ProcessPoolExecutor(
+                max_workers=min(len(args), os.cpu_count() or 1)) as pool:
+            return list(pool.map(parse_report, args.keys(), args.values()))
 
     def get_results(self, args: Dict[Path, List[Tuple]]) -> Dict[str, int]:
         """
@@ -50,15 +222,12 @@ class LintParser():
         and info messages for each IP present in the result folder
         """
 
-        # Open all log files
-        for path, patterns in args.items():
-            try:
-                with path.open() as f:
-                    log_content = f.read()
-                    self.extract_messages(log_content, patterns)
-            except IOError as err:
-                self.buckets['flow_error'] += \
-                    ["IOError: %s" % err]
+        # Parse all log files
+        for error, matches in self._parse_reports(args):
+            if error is not None:
+                self.buckets['flow_error'] += [error]
+            for bucket, messages in matches:
+                self.buckets[bucket] += messages
 
         # If there are no errors or warnings, add the "fusesoc-error" field to
         # "errors" (which will be reported as tooling errors). Remove the
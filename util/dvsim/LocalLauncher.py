@@ -99,6 +99,10 @@ class LocalLauncher(Launcher):
         must not be called again once it has returned 'P' or 'F'.
         '''
 
+        # It is possible we may have determined the status already.
+        if self.status:
+            return self.status
+
         assert self.process is not None
         elapsed_time = datetime.datetime.now() - self.start_time
         self.job_runtime_secs = elapsed_time.total_seconds()
@@ -148,7 +152,8 @@ class LocalLauncher(Launcher):
             ErrorMessage(line_number=None, message='Job killed!', context=[]))
 
     def _post_finish(self, status, err_msg):
-        self._close_process()
+        if self.process is not None:
+            self._close_process()
         self.process = None
         super()._post_finish(status, err_msg)
 
@@ -2,6 +2,7 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
+import json
 import logging as log
 import os
 import re
@@ -9,24 +10,65 @@ import subprocess
 import tarfile
 from pathlib import Path
 
+from JobStatusCache import JobStatusCache
 from Launcher import ErrorMessage, Launcher, LauncherError
 from utils import VERBOSE, clean_odirs
 
 
+class LsfJobStatusCache(JobStatusCache):
+    """Caches the status of LSF jobs, queried with a single bjobs command."""
+
+    # Job states (STAT) in which the job is no longer running.
+    done_states = {"DONE", "EXIT"}
+
+    def _query(self, job_ids):
+        # Query the job arrays the outstanding jobs belong to. Finished jobs
+        # are retained by bjobs -a for a while after they complete.
+        array_ids = sorted({job_id.split("[")[0] for job_id in job_ids})
+        cmd = ["bjobs", "-a", "-json", "-o", "jobid jobindex stat exit_code"]
+        p = subprocess.run(cmd + array_ids,
+                           check=True,
+                           timeout=60,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE)
+        records = json.loads(p.stdout.decode("utf-8")).get("RECORDS", [])
+
+        status = {}
+        for record in records:
+            if "ERROR" in record:
+                continue
+            job_id = record["JOBID"]
+            if record.get("JOBINDEX", "0") not in ["", "0"]:
+                job_id = "{}[{}]".format(job_id, record["JOBINDEX"])
+            status[job_id] = record["STAT"]
+        return status
+
+
 class LsfLauncher(Launcher):
 
     # A hidden directory specific to a cfg, where we put individual 'job'
     # scripts.
     jobs_dir = {}
 
-    # All launcher instances available for lookup.
+    # The launcher instances of the jobs in each job array, by cfg and job
+    # name. Jobs that are resumed are not run, so they are not part of any
+    # job array.
     jobs = {}
 
+    # The number of jobs in each job array that the Scheduler has dispatched
+    # so far, by cfg and job name.
+    num_dispatched = {}
+
     # When the job completes, we try to read the job script output to determine
     # the outcome. It may not have been completely written the first time we
     # read it so we retry on the next poll, no more than 10 times.
     max_poll_retries = 10
 
+    # The status of all outstanding jobs is queried in one go by a background
+    # thread every this many seconds. Created on the first launch.
+    status_refresh_secs = 10
+    status_cache = None
+
     # TODO: Add support for build/run/cov job specific resource requirements:
     #       cpu, mem, disk, stack.
     # TODO: Allow site-specific job resource usage setting using
@@ -67,8 +109,8 @@ class LsfLauncher(Launcher):
         os.makedirs(Path(LsfLauncher.jobs_dir[cfg]), exist_ok=True)
 
     @staticmethod
-    def make_job_script(cfg, job_name):
-        """Creates the job script.
+    def make_job_script(cfg, job_name, jobs):
+        """Creates the job script running the given jobs.
 
         Once all jobs in the array are launched, the job script can be created.
         It is a bash script that takes the job index as a single argument.
@@ -89,7 +131,7 @@ class LsfLauncher(Launcher):
             lines += ["source {}/bin/activate\n".format(Launcher.pyvenv)]
 
         lines += ["case $1 in\n"]
-        for job in LsfLauncher.jobs[cfg][job_name]:
+        for job in jobs:
             # Redirect the job's stdout and stderr to its log file.
             cmd = "{} > {} 2>&1".format(job.deploy.cmd,
                                         job.deploy.get_log_path())
@@ -110,7 +152,7 @@ class LsfLauncher(Launcher):
                 f.writelines(lines)
         except IOError as e:
             err_msg = "ERROR: Failed to write {}:\n{}".format(job_script, e)
-            LsfLauncher._post_finish_job_array(cfg, job_name, err_msg)
+            LsfLauncher._post_finish_job_array(jobs, err_msg)
             raise LauncherError(err_msg)
 
         log.log(VERBOSE, "[job_script]: %s", job_script)
@@ -136,26 +178,54 @@ class LsfLauncher(Launcher):
         # Polling retry counter..
         self.num_poll_retries = 0
 
-        # Add self to the list of jobs.
+        # Set when the job is dispatched, unless its outputs were restored
+        # from a cache: the job is then run as part of its job array.
+        self.to_run = False
+
+        # Job's index in the array, set when the array is submitted.
+        self.index = None
+
+        # Add self to the list of jobs, unless it is not run at all.
+        if deploy.resumed:
+            return
         cfg_dict = LsfLauncher.jobs.setdefault(deploy.sim_cfg, {})
-        job_name_list = cfg_dict.setdefault(deploy.job_name, [])
-        job_name_list.append(self)
+        cfg_dict.setdefault(deploy.job_name, []).append(self)
 
-        # Job's index in the array.
-        self.index = len(job_name_list)
+    def launch(self):
+        super().launch()
 
-    def _do_launch(self):
-        # Add self to the list of jobs.
-        job_name = self.deploy.job_name
-        cfg = self.deploy.sim_cfg
-        job_total = len(LsfLauncher.jobs[cfg][job_name])
+        # Jobs that are resumed are not part of any job array.
+        if self.deploy.resumed:
+            return
 
         # The actual launching of the bsub command cannot happen until the
-        # Scheduler has dispatched ALL jobs in the array.
-        if self.index < job_total:
+        # Scheduler has dispatched ALL jobs in the array. The array is then
+        # made of the jobs that need to run.
+        job_name = self.deploy.job_name
+        cfg = self.deploy.sim_cfg
+        key = (cfg, job_name)
+        LsfLauncher.num_dispatched[key] = (
+            LsfLauncher.num_dispatched.get(key, 0) + 1)
+        jobs = LsfLauncher.jobs[cfg][job_name]
+        if LsfLauncher.num_dispatched[key] < len(jobs):
             return
 
-        job_script = self.make_job_script(cfg, job_name)
+        jobs = [job for job in jobs if job.to_run]
+        if jobs:
+            jobs[-1]._submit_job_array(cfg, job_name, jobs)
+
+    def _do_launch(self):
+        # The job is run once its job array is submitted, by launch().
+        self.to_run = True
+
+    def _submit_job_array(self, cfg, job_name, jobs):
+        """Submits the given jobs as a job array, with bsub."""
+
+        job_total = len(jobs)
+        for index, job in enumerate(jobs, 1):
+            job.index = index
+
+        job_script = self.make_job_script(cfg, job_name, jobs)
 
         # Update the shell's env vars with self.exports. Values in exports must
         # replace the values in the shell's env vars if the keys match.
@@ -219,19 +289,24 @@ class LsfLauncher(Launcher):
         except subprocess.CalledProcessError as e:
             # Need to mark all jobs in this range with this fail pattern.
             err_msg = e.stderr.decode("utf-8").strip()
-            self._post_finish_job_array(cfg, job_name, err_msg)
+            self._post_finish_job_array(jobs, err_msg)
             raise LauncherError(err_msg)
 
         # Extract the job ID.
         result = p.stdout.decode("utf-8").strip()
         job_id = result.split('Job <')[1].split('>')[0]
         if not job_id:
-            self._post_finish_job_array(cfg, job_name, "Job ID not found!")
+            self._post_finish_job_array(jobs, "Job ID not found!")
             raise LauncherError(err_msg)
 
-        for job in LsfLauncher.jobs[cfg][job_name]:
+        if LsfLauncher.status_cache is None:
+            LsfLauncher.status_cache = LsfJobStatusCache(
+                LsfLauncher.status_refresh_secs)
+
+        for job in jobs:
             job.bsub_out = Path("{}.{}.out".format(job_script, job.index))
             job.job_id = "{}[{}]".format(job_id, job.index)
+            LsfLauncher.status_cache.add(job.job_id)
             job._link_odir("D")
 
     def poll(self):
@@ -244,6 +319,14 @@ class LsfLauncher(Launcher):
             if not self.job_id:
                 return 'D'
 
+            # If the job's status has been queried by the status cache, there
+            # is no need to touch the filesystem until it has finished. Else
+            # (not queried yet, or bjobs is unavailable) check the job script
+            # output as described below.
+            stat = LsfLauncher.status_cache.get(self.job_id)
+            if stat is not None and stat not in LsfJobStatusCache.done_states:
+                return "D"
+
             # We redirect the job's output to the log file, so the job script
             # output remains empty until the point it finishes. This is a very
             # quick way to check if the job has completed. If nothing has been
@@ -278,10 +361,10 @@ class LsfLauncher(Launcher):
         # will appear in the job script output file. We want to retrieve that
         # so that we can report the status accurately.
         #
-        # At this point, we could run bjobs or bhist to determine the status,
-        # but it has been found to be too slow, expecially when running 1000s
-        # of jobs. Plus, we have to read the job script output anyway to look
-        # for those error messages.
+        # At this point, we could run bjobs or bhist for this job to determine
+        # its exit code, but it has been found to be too slow, expecially when
+        # running 1000s of jobs. Plus, we have to read the job script output
+        # anyway to look for those error messages.
         #
         # So we just read this file to determine both, the status and extract
         # the error message, rather than running bjobs or bhist. But there is
@@ -386,6 +469,8 @@ class LsfLauncher(Launcher):
         self._post_finish('K', "Job killed!")
 
     def _post_finish(self, status, err_msg):
+        if self.job_id and LsfLauncher.status_cache is not None:
+            LsfLauncher.status_cache.remove(self.job_id)
         if self.bsub_out_fd:
             self.bsub_out_fd.close()
         if self.exit_code is None:
@@ -393,12 +478,12 @@ class LsfLauncher(Launcher):
         super()._post_finish(status, err_msg)
 
     @staticmethod
-    def _post_finish_job_array(cfg, job_name, err_msg):
-        '''On LSF error, mark all jobs in this array as killed.
+    def _post_finish_job_array(jobs, err_msg):
+        '''On LSF error, mark all the given jobs in an array as killed.
 
         err_msg is the error message indicating the cause of failure.'''
 
-        for job in LsfLauncher.jobs[cfg][job_name]:
+        for job in jobs:
             job._post_finish(
                 'F', ErrorMessage(line_number=None,
                                   message=err_msg,
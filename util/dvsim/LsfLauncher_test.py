@@ -0,0 +1,140 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''pytest-based testing for the job arrays of LsfLauncher'''
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# The dvsim modules import each other as top-level modules.
+sys.path.insert(0, str(Path(__file__).parent))
+
+import LsfLauncher as lsf  # noqa: E402
+from Launcher import Launcher  # noqa: E402
+
+
+class FakeCfg:
+    project = 'proj'
+    tool = 'vcs'
+    timestamp = 'now'
+
+    def __init__(self, path):
+        self.scratch_path = str(path)
+        self.links = {status: path / status for status in 'DPFK'}
+        for link_dir in self.links.values():
+            link_dir.mkdir()
+
+
+class FakeDeploy:
+    dry_run = False
+    fail_patterns = []
+    pass_patterns = []
+    exports = {}
+    job_name = 'run_array'
+
+    def __init__(self, cfg, name, resumed=False, restored_from_cache=False):
+        self.sim_cfg = cfg
+        self.full_name = self.qual_name = name
+        self.odir = os.path.join(cfg.scratch_path, name)
+        self.cmd = 'run_' + name
+        self.resumed = resumed
+        self.restored_from_cache = restored_from_cache
+
+        # The log of a job that passed before.
+        if resumed:
+            os.makedirs(self.odir)
+            with open(self.get_log_path(), 'w') as f:
+                f.write('passed\n')
+
+    def get_log_path(self):
+        return os.path.join(self.odir, 'run.log')
+
+    def get_timeout_mins(self):
+        return None
+
+    def pre_launch(self):
+        pass
+
+    def post_finish(self, status):
+        pass
+
+    def extract_info_from_log(self, lines):
+        pass
+
+
+class FakeStatusCache:
+
+    def add(self, job_id):
+        pass
+
+    def remove(self, job_id):
+        pass
+
+
+@pytest.fixture
+def bsub(monkeypatch):
+    '''Records the bsub commands run, instead of running them.'''
+    monkeypatch.setattr(Launcher, 'workspace_prepared', True)
+    monkeypatch.setattr(Launcher, 'workspace_prepared_for_cfg', set())
+    monkeypatch.setattr(lsf.LsfLauncher, 'jobs_dir', {})
+    monkeypatch.setattr(lsf.LsfLauncher, 'jobs', {})
+    monkeypatch.setattr(lsf.LsfLauncher, 'num_dispatched', {})
+    monkeypatch.setattr(lsf.LsfLauncher, 'status_cache', FakeStatusCache())
+
+    cmds = []
+
+    def run(cmd, **kwargs):
+        cmds.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, b'Job <42> is submitted',
+                                           b'')
+
+    monkeypatch.setattr(lsf.subprocess, 'run', run)
+    return cmds
+
+
+@pytest.mark.parametrize('skipped', [0, 1, 2])
+@pytest.mark.parametrize('how', ['resumed', 'restored_from_cache'])
+def test_job_array_skips_jobs(bsub, tmp_path, skipped, how):
+    '''A job that is not run, wherever it is, is left out of its array.'''
+    cfg = FakeCfg(tmp_path)
+    deploys = [
+        FakeDeploy(cfg, 'test{}'.format(i), **{how: i == skipped})
+        for i in range(3)
+    ]
+    launchers = [lsf.LsfLauncher(deploy) for deploy in deploys]
+    for launcher in launchers:
+        launcher.launch()
+
+    assert len(bsub) == 1
+    assert 'run_array[1-2]' in bsub[0]
+
+    ran = [launcher for i, launcher in enumerate(launchers) if i != skipped]
+    assert [launcher.index for launcher in ran] == [1, 2]
+    assert [launcher.job_id for launcher in ran] == ['42[1]', '42[2]']
+
+    script = (tmp_path / 'lsf' / 'now' / 'run_array').read_text()
+    assert 'run_test{} '.format(skipped) not in script
+    for launcher in ran:
+        assert '  {})\n    {} >'.format(launcher.index,
+                                        launcher.deploy.cmd) in script
+
+    assert launchers[skipped].status == 'P'
+    assert launchers[skipped].job_id is None
+
+
+def test_job_array_all_resumed(bsub, tmp_path):
+    cfg = FakeCfg(tmp_path)
+    launchers = [
+        lsf.LsfLauncher(FakeDeploy(cfg, 'test{}'.format(i), resumed=True))
+        for i in range(2)
+    ]
+    for launcher in launchers:
+        launcher.launch()
+
+    assert not bsub
+    assert [launcher.status for launcher in launchers] == ['P', 'P']
@@ -482,6 +482,8 @@ class Regressions(Modes):
         self.test_names = []
 
         self.reseed = None
+        # Per-test reseed values, overriding 'reseed' for the tests listed.
+        self.reseeds = None
         self.excl_tests = []  # TODO: add support for this
         self.en_sim_modes = []
         self.en_run_modes = []
@@ -632,5 +634,7 @@ class Regressions(Modes):
             test.run_opts.extend(self.run_opts)
 
             # Override reseed if available.
-            if self.reseed is not None:
+            if self.reseeds and test.name in self.reseeds:
+                test.reseed = self.reseeds[test.name]
+            elif self.reseed is not None:
                 test.reseed = self.reseed
@@ -0,0 +1,260 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+Background housekeeping of the scratch area.
+"""
+
+import gzip
+import logging as log
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from utils import TS_FORMAT, VERBOSE, rm_path
+
+
+class Reaper:
+    '''Deletes and compresses files in the scratch area in the background.
+
+    Deleting a large output directory on a network filesystem can take
+    minutes, so rather than deleting it in place, remove() renames it into a
+    trash directory in the scratch root (which is quick, and frees up its
+    name right away) and a background thread deletes it from there, at a
+    limited rate so as not to swamp the filesystem. Whatever is left in the
+    trash when dvsim exits is deleted by the next invocation.
+
+    The background thread also compresses the logs of passing tests, if
+    enabled, and enforces a quota on the size of the scratch root by evicting
+    the oldest backed up output directories (see utils.clean_odirs).
+    '''
+
+    trash_name = ".trash"
+
+    def __init__(self, scratch_root, max_rate=0, quota=0,
+                 compress_logs=False):
+        self.scratch_root = Path(scratch_root)
+        self.trash_dir = self.scratch_root / self.trash_name
+
+        # The maximum number of files deleted per second (0 for no limit).
+        self.max_rate = max_rate
+
+        # The maximum size of the scratch root, in bytes (0 for no limit).
+        self.quota = quota
+
+        # Whether to compress the logs of passing tests.
+        self.compress_logs = compress_logs
+
+        # Directories that must not be evicted to enforce the quota.
+        self._protected = set()
+
+        self._tasks = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # The start of the current second and the number of files deleted in
+        # it, for rate limiting.
+        self._window_start = 0
+        self._window_count = 0
+
+    def __str__(self):
+        return str(self.trash_dir)
+
+    def start(self):
+        '''Starts the background thread.
+
+        The leftovers in the trash are queued for deletion first. The quota is
+        only enforced once enforce_quota() is called.
+        '''
+        try:
+            os.makedirs(self.trash_dir, exist_ok=True)
+            leftovers = list(self.trash_dir.iterdir())
+        except OSError as e:
+            log.warning("Failed to set up the trash in %s: %s",
+                        self.trash_dir, e)
+            leftovers = []
+        for path in leftovers:
+            self._tasks.put((self._delete, path))
+
+        self._thread = threading.Thread(target=self._run,
+                                        name="reaper",
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self):
+        '''Stops the background thread, leaving the pending work undone.
+
+        Pending deletions are picked up by the next invocation. Pending
+        compressions are dropped.
+        '''
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        pending = self._tasks.qsize()
+        if pending:
+            log.log(VERBOSE, "[reaper]: leaving %d tasks to the next run",
+                    pending)
+
+    def remove(self, path):
+        '''Removes a file or a directory in the background.
+
+        The path is gone from its location when this returns. If it cannot be
+        moved to the trash (if it is on another filesystem, for instance), it
+        is deleted in place right away.
+        '''
+        path = Path(path)
+        if not os.path.lexists(path):
+            return
+        if self._thread is not None:
+            dest = self.trash_dir / uuid.uuid4().hex
+            try:
+                os.rename(path, dest)
+            except OSError as e:
+                log.debug("Failed to move %s to the trash: %s", path, e)
+            else:
+                self._tasks.put((self._delete, dest))
+                return
+        rm_path(path, ignore_error=True)
+
+    def compress(self, path):
+        '''Compresses a log in the background, if enabled.'''
+        if self.compress_logs and self._thread is not None:
+            self._tasks.put((self._compress, Path(path)))
+
+    def protect(self, paths):
+        '''Prevents the given directories from being evicted.'''
+        self._protected.update(Path(p).resolve() for p in paths)
+
+    def enforce_quota(self):
+        '''Enforces the quota, if any, in the background.
+
+        This must be called once all the directories that must be kept have
+        been protected, since any other backed up output directory may be
+        evicted.
+        '''
+        if self.quota and self._thread is not None:
+            self._tasks.put((self._enforce_quota, ))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                task = self._tasks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            func, *args = task
+            try:
+                func(*args)
+            except OSError as e:
+                log.warning("[reaper]: %s%s failed: %s", func.__name__,
+                            tuple(str(a) for a in args), e)
+
+    def _throttle(self):
+        '''Waits as needed to keep deletions under max_rate per second.'''
+        if not self.max_rate:
+            return
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        if self._window_count >= self.max_rate:
+            self._stop.wait(max(0, self._window_start + 1 - now))
+
+    def _delete(self, path):
+        '''Deletes a path, one file at a time.
+
+        Returns early if the reaper is stopped, leaving the rest of the path
+        to be deleted later.
+        '''
+        if not path.is_dir() or path.is_symlink():
+            path.unlink(missing_ok=True)
+            return
+        for dirpath, dirnames, filenames in os.walk(path, topdown=False):
+            for name in filenames:
+                if self._stop.is_set():
+                    return
+                os.unlink(os.path.join(dirpath, name))
+                self._throttle()
+            for name in dirnames:
+                # Symlinks to directories are listed with the directories.
+                dirname = os.path.join(dirpath, name)
+                if os.path.islink(dirname):
+                    os.unlink(dirname)
+                else:
+                    os.rmdir(dirname)
+        os.rmdir(path)
+
+    def _compress(self, path):
+        '''Replaces a log with its gzip-compressed version.'''
+        if not path.exists():
+            return
+        tmp = path.with_name(path.name + ".gz.tmp")
+        with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, path.with_name(path.name + ".gz"))
+        os.remove(path)
+
+    def _enforce_quota(self):
+        '''Evicts the oldest backed up output directories over the quota.
+
+        Backed up output directories are those named with a timestamp by
+        utils.clean_odirs.
+        '''
+        backups = []
+
+        def _walk(path):
+            '''Returns the size in bytes of what is below path.'''
+            size = 0
+            with os.scandir(path) as it:
+                for entry in it:
+                    if self._stop.is_set():
+                        break
+                    st = entry.stat(follow_symlinks=False)
+                    size += st.st_blocks * 512
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    if entry.path == str(self.trash_dir):
+                        continue
+                    subdir_size = _walk(entry.path)
+                    size += subdir_size
+                    try:
+                        ts = datetime.strptime(entry.name, TS_FORMAT)
+                    except ValueError:
+                        continue
+                    backups.append((ts, Path(entry.path), subdir_size))
+            return size
+
+        total = _walk(self.scratch_root)
+        if total <= self.quota:
+            return
+
+        backups.sort()
+        evicted = []
+        for _, path, size in backups:
+            if total <= self.quota or self._stop.is_set():
+                break
+            resolved = path.resolve()
+            if any(p == resolved or resolved in p.parents
+                   for p in self._protected):
+                continue
+            # A backup within one evicted already is accounted for.
+            if any(p in path.parents for p in evicted):
+                continue
+            log.log(VERBOSE, "[reaper]: evicting %s (%d MB)", path,
+                    size >> 20)
+            self.remove(path)
+            total -= size
+            evicted.append(path)
+
+        if total > self.quota:
+            log.warning("[reaper]: %s uses %d MB even after evicting %d old "
+                        "output directories, over the quota of %d MB.",
+                        self.scratch_root, total >> 20, len(evicted),
+                        self.quota >> 20)
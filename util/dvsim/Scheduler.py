@@ -4,6 +4,7 @@
 
 import logging as log
 import threading
+from collections import OrderedDict
 from signal import SIGINT, SIGTERM, signal
 
 from Launcher import LauncherError
@@ -48,18 +49,39 @@ def get_next_item(arr, index):
 class Scheduler:
     '''An object that runs one or more Deploy items'''
 
-    def __init__(self, items, launcher_cls, interactive):
+    def __init__(self, items, launcher_cls, interactive, on_done=None):
         self.items = items
 
-        # 'scheduled[target][cfg]' is a list of Deploy objects for the chosen
-        # target and cfg. As items in _scheduled are ready to be run (once
-        # their dependencies pass), they are moved to the _queued list, where
-        # they wait until slots are available for them to be dispatched.
-        # When all items (in all cfgs) of a target are done, it is removed from
-        # this dictionary.
+        # An optional callback, called as on_done(item, status) when an item
+        # completes (passes, fails or is killed / cancelled).
+        self.on_done = on_done
+
+        # The set of items, for fast membership checks.
+        self._item_set = set(items)
+
+        # 'scheduled[target][cfg]' is an ordered set (a dict with None values)
+        # of Deploy objects for the chosen target and cfg. As items in
+        # _scheduled are ready to be run (once their dependencies pass), they
+        # are moved to the _queued list, where they wait until slots are
+        # available for them to be dispatched. When all items (in all cfgs) of
+        # a target are done, it is removed from this dictionary.
         self._scheduled = {}
         self.add_to_scheduled(items)
 
+        # The dependency graph. '_successors[item]' lists the items that
+        # depend on item (in the order of self.items) and
+        # '_pending_deps[item]' is the number of item's dependencies that are
+        # yet to complete. This avoids scanning all items of the next target
+        # and their dependency lists each time an item completes.
+        self._successors = {}
+        self._pending_deps = {}
+        for item in items:
+            deps = [dep for dep in dict.fromkeys(item.dependencies)
+                    if dep in self._item_set]
+            self._pending_deps[item] = len(deps)
+            for dep in deps:
+                self._successors.setdefault(dep, []).append(item)
+
         # Print status periodically using an external status printer.
         self.status_printer = get_status_printer(interactive)
         self.status_printer.print_header(
@@ -68,9 +90,11 @@ class Scheduler:
 
         # Sets of items, split up by their current state. The sets are
         # disjoint and their union equals the keys of self.item_to_status.
-        # _queued is a list so that we dispatch things in order (relevant
-        # for things like tests where we have ordered things cleverly to
-        # try to see failures early). They are maintained for each target.
+        # _queued is an ordered set (an OrderedDict with None values) so that
+        # we dispatch things in order (relevant for things like tests where we
+        # have ordered things cleverly to try to see failures early) while
+        # still removing items from it in constant time. They are maintained
+        # for each target.
 
         # The list of available targets and the list of running items in each
         # target are polled in a circular fashion, looping back to the start.
@@ -87,7 +111,7 @@ class Scheduler:
         self.last_target_polled_idx = -1
         self.last_item_polled_idx = {}
         for target in self._scheduled:
-            self._queued[target] = []
+            self._queued[target] = OrderedDict()
             self._running[target] = []
             self._passed[target] = set()
             self._failed[target] = set()
@@ -188,24 +212,19 @@ class Scheduler:
 
         for item in items:
             target_dict = self._scheduled.setdefault(item.target, {})
-            cfg_list = target_dict.setdefault(item.sim_cfg, [])
-            if item not in cfg_list:
-                cfg_list.append(item)
+            target_dict.setdefault(item.sim_cfg, {})[item] = None
 
     def _remove_from_scheduled(self, item):
-        '''Removes the item from _scheduled[target][cfg] list.
+        '''Removes the item from _scheduled[target][cfg].
 
         When all items in _scheduled[target][cfg] are finally removed, the cfg
         key is deleted.
         '''
         target_dict = self._scheduled[item.target]
-        cfg_list = target_dict.get(item.sim_cfg)
-        if cfg_list is not None:
-            try:
-                cfg_list.remove(item)
-            except ValueError:
-                pass
-            if not cfg_list:
+        cfg_items = target_dict.get(item.sim_cfg)
+        if cfg_items is not None:
+            cfg_items.pop(item, None)
+            if not cfg_items:
                 del target_dict[item.sim_cfg]
 
     def _get_next_target(self, curr_target):
@@ -246,7 +265,7 @@ class Scheduler:
             assert next_item not in self.item_to_status
             assert next_item not in self._queued[next_item.target]
             self.item_to_status[next_item] = 'Q'
-            self._queued[next_item.target].append(next_item)
+            self._queued[next_item.target][next_item] = None
             self._remove_from_scheduled(next_item)
 
     def _cancel_successors(self, item):
@@ -262,11 +281,12 @@ class Scheduler:
     def _get_successors(self, item=None):
         '''Find immediate successors of an item.
 
-        'item' is a job that has completed. We choose the target that follows
-        the 'item''s current target and find the list of successors whose
-        dependency list contains 'item'. If 'item' is None, we pick successors
-        from all cfgs, else we pick successors only from the cfg to which the
-        item belongs.
+        'item' is a job that has completed. We find the list of successors
+        whose dependency list contains 'item' and that are yet to be enqueued.
+        These are usually in the target that follows the 'item''s current
+        target, but may also be in the same one (as with a tree of partial
+        coverage merges). If 'item' is None, we pick the items of the first
+        target from all cfgs.
 
         Returns the list of item's successors, or an empty list if there are
         none.
@@ -274,49 +294,39 @@ class Scheduler:
 
         if item is None:
             target = self._get_next_target(None)
-            cfgs = set(self._scheduled[target])
-        else:
-            target = self._get_next_target(item.target)
-            cfgs = {item.sim_cfg}
-
-        if target is None:
-            return []
-
-        # Find item's successors that can be enqueued. We assume here that
-        # only the immediately succeeding target can be enqueued at this
-        # time.
-        successors = []
-        for cfg in cfgs:
-            for next_item in self._scheduled[target][cfg]:
-                if item is not None:
-                    # Something is terribly wrong if item exists but the
-                    # next_item's dependency list is empty.
-                    assert next_item.dependencies
-                    if item not in next_item.dependencies:
-                        continue
-
-                if self._ok_to_enqueue(next_item):
-                    successors.append(next_item)
-
-        return successors
+            if target is None:
+                return []
+
+            successors = []
+            for cfg_items in self._scheduled[target].values():
+                successors.extend(next_item for next_item in cfg_items
+                                  if self._ok_to_enqueue(next_item))
+            return successors
+
+        return [
+            next_item for next_item in self._successors.get(item, [])
+            if (self._is_scheduled(next_item) and
+                self._ok_to_enqueue(next_item))
+        ]
+
+    def _is_scheduled(self, item):
+        '''Returns true if item is in _scheduled (i.e. not yet enqueued).'''
+        target_dict = self._scheduled.get(item.target, {})
+        return item in target_dict.get(item.sim_cfg, {})
 
     def _ok_to_enqueue(self, item):
         '''Returns true if ALL dependencies of item are complete.'''
+        return self._pending_deps[item] == 0
 
-        for dep in item.dependencies:
-            # Ignore dependencies that were not scheduled to run.
-            if dep not in self.items:
-                continue
-
-            # Has the dep even been enqueued?
-            if dep not in self.item_to_status:
-                return False
-
-            # Has the dep completed?
-            if self.item_to_status[dep] not in ["P", "F", "K"]:
-                return False
+    def _set_done(self, item, status):
+        '''Records the completion of item with the given status.
 
-        return True
+        This updates the count of pending dependencies of item's successors.
+        '''
+        if self.item_to_status.get(item) not in ['P', 'F', 'K']:
+            for next_item in self._successors.get(item, []):
+                self._pending_deps[next_item] -= 1
+        self.item_to_status[item] = status
 
     def _ok_to_run(self, item):
         '''Returns true if the required dependencies have passed.
@@ -329,7 +339,7 @@ class Scheduler:
         # should already show up in the item to status map).
         for dep in item.dependencies:
             # Ignore dependencies that were not scheduled to run.
-            if dep not in self.items:
+            if dep not in self._item_set:
                 continue
 
             dep_status = self.item_to_status[dep]
@@ -385,9 +395,10 @@ class Scheduler:
 
                 self._running[target].pop(self.last_item_polled_idx[target])
                 self.last_item_polled_idx[target] -= 1
-                self.item_to_status[item] = status
+                self._set_done(item, status)
                 log.log(level, "[%s]: [%s]: [status] [%s: %s]", hms, target,
                         item.full_name, status)
+                self._notify_done(item, status)
 
                 # Enqueue item's successors regardless of its status.
                 #
@@ -412,7 +423,7 @@ class Scheduler:
         # weights.
         sum_weight = 0
         slots_filled = 0
-        total_weight = sum(self._queued[t][0].weight for t in self._queued
+        total_weight = sum(self._first_queued(t).weight for t in self._queued
                            if self._queued[t])
 
         for target in self._scheduled:
@@ -438,7 +449,7 @@ class Scheduler:
             # solution, except that it prioritizes the slot allocation to
             # targets that are earlier in the list such that in the end, all
             # slots are fully consumed.
-            sum_weight += self._queued[target][0].weight
+            sum_weight += self._first_queued(target).weight
             target_slots = round(
                 (slots * sum_weight) / total_weight) - slots_filled
             if target_slots <= 0:
@@ -447,7 +458,7 @@ class Scheduler:
 
             to_dispatch = []
             while self._queued[target] and target_slots > 0:
-                next_item = self._queued[target].pop(0)
+                next_item, _ = self._queued[target].popitem(last=False)
                 if not self._ok_to_run(next_item):
                     self._cancel_item(next_item, cancel_successors=False)
                     self._enqueue_successors(next_item)
@@ -471,6 +482,10 @@ class Scheduler:
                     log.error('{}'.format(err))
                     self._kill_item(item)
 
+    def _first_queued(self, target):
+        '''Returns the item at the head of _queued[target].'''
+        return next(iter(self._queued[target]))
+
     def _kill(self):
         '''Kill any running items and cancel any that are waiting'''
 
@@ -530,10 +545,11 @@ class Scheduler:
         either, we move it straight to _killed.
         '''
 
-        self.item_to_status[item] = 'K'
+        self._set_done(item, 'K')
         self._killed[item.target].add(item)
+        self._notify_done(item, 'K')
         if item in self._queued[item.target]:
-            self._queued[item.target].remove(item)
+            del self._queued[item.target][item]
         else:
             self._remove_from_scheduled(item)
 
@@ -544,7 +560,12 @@ class Scheduler:
         '''Kill a running item and cancel all of its successors.'''
 
         item.launcher.kill()
-        self.item_to_status[item] = 'K'
+        self._set_done(item, 'K')
         self._killed[item.target].add(item)
         self._running[item.target].remove(item)
+        self._notify_done(item, 'K')
         self._cancel_successors(item)
+
+    def _notify_done(self, item, status):
+        if self.on_done is not None:
+            self.on_done(item, status)
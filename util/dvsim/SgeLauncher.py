@@ -108,6 +108,10 @@ class SgeLauncher(Launcher):
         must not be called again once it has returned 'P' or 'F'.
         '''
 
+        # It is possible we may have determined the status already.
+        if self.status:
+            return self.status
+
         assert self.process is not None
         if self.process.poll() is None:
             return 'D'
@@ -172,7 +176,8 @@ class SgeLauncher(Launcher):
 
     def _post_finish(self, status, err_msg):
         super()._post_finish(status, err_msg)
-        self._close_process()
+        if self.process is not None:
+            self._close_process()
         self.process = None
 
     def _close_process(self):
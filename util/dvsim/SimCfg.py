@@ -12,19 +12,27 @@ import json
 import logging as log
 import os
 import re
+import sqlite3
 import sys
+import time
 from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 
-from Deploy import CompileSim, CovAnalyze, CovMerge, CovReport, CovUnr, RunTest
+from CovGrader import CovGrader, read_cov_items
+from Deploy import (CompileSim, CovAnalyze, CovMerge, CovMergePartial,
+                    CovReport, CovUnr, RunTest)
 from FlowCfg import FlowCfg
+from JobTime import JobTime
 from Modes import BuildModes, Modes, Regressions, RunModes, Tests
+from results_db import ResultsDb
 from results_server import ResultsServer
+from sim_utils import get_job_runtime
 from SimResults import SimResults
 from tabulate import tabulate
 from Testplan import Testplan
-from utils import TS_FORMAT, rm_path
+from utils import (TS_FORMAT, VERBOSE, md_results_to_html, open_log,
+                   rm_path)
 
 # This affects the bucketizer failure report.
 _MAX_UNIQUE_TESTS = 5
@@ -47,6 +55,21 @@ class SimCfg(FlowCfg):
         "sw_build_opts"
     ]
 
+    # While the jobs are running, write out a partial report of the results
+    # at most every this many seconds (0 disables). Set from dvsim.py.
+    results_flush_secs = 60
+
+    # Path of the database the results of each regression are appended to,
+    # or None. Set from dvsim.py.
+    results_db = None
+
+    # The builds of all the cfgs of this invocation, by their exact
+    # equivalence key (see Deploy.get_equivalence_key()). A build resolving to
+    # the same command and exports as the build of another cfg (and hence to
+    # the same build directory) is only run once, by the cfg that created it
+    # first.
+    build_registry = {}
+
     def __init__(self, flow_cfg_file, hjson_data, args, mk_config):
         # Options set from command line
         self.tool = args.tool
@@ -69,6 +92,8 @@ class SimCfg(FlowCfg):
         self.max_waves = args.max_waves
         self.cov = args.cov
         self.cov_merge_previous = args.cov_merge_previous
+        self.cov_merge_fanin = args.cov_merge_fanin
+        self.grade_target = args.grade_target
         self.profile = args.profile or '(cfg uses profile without --profile)'
         self.xprop_off = args.xprop_off
         self.no_rerun = args.no_rerun
@@ -103,6 +128,7 @@ class SimCfg(FlowCfg):
         self.pre_run_cmds = []
         self.post_run_cmds = []
         self.run_dir = ""
+        self.cov_grade_items = "cov_items.txt"
         self.sw_images = []
         self.sw_build_opts = []
         self.pass_patterns = []
@@ -135,6 +161,11 @@ class SimCfg(FlowCfg):
         self.cov_report_deploy = None
         self.results_summary = OrderedDict()
 
+        # Results folded in as the jobs complete (see _fold_result).
+        self.partial_results = None
+        self.partial_done = 0
+        self.partial_flush_time = 0.0
+
         super().__init__(flow_cfg_file, hjson_data, args, mk_config)
 
     def _expand(self):
@@ -425,8 +456,15 @@ class SimCfg(FlowCfg):
 
         self.builds = []
         build_map = {}
-        for build_mode_obj in self.build_list:
-            new_build = CompileSim(build_mode_obj, self)
+        builds_by_key = {}
+
+        # Builds that can be shared with other cfgs go first, so that the
+        # equivalent builds of this cfg are folded into them.
+        new_builds = [CompileSim(b, self) for b in self.build_list]
+        new_builds.sort(key=lambda b: b.get_equivalence_key() not in
+                        SimCfg.build_registry)
+        for new_build in new_builds:
+            build_mode_obj = new_build.build_mode_obj
 
             # It is possible for tests to supply different build modes, but
             # those builds may differ only under specific circumstances,
@@ -435,20 +473,32 @@ class SimCfg(FlowCfg):
             # save compute resources by removing the extra duplicated
             # builds. We discard the new_build if it is equivalent to an
             # existing one.
-            is_unique = True
-            for build in self.builds:
-                if build.is_equivalent_job(new_build):
-                    # Discard `new_build` since it is equivalent to build. If
-                    # `new_build` is the same as `primary_build_mode`, update
-                    # `primary_build_mode` to match `build`.
-                    if new_build.name == self.primary_build_mode:
-                        self.primary_build_mode = build.name
-                    new_build = build
-                    is_unique = False
-                    break
-
-            if is_unique:
-                self.builds.append(new_build)
+            key = new_build.get_equivalence_key(ignore_name=True)
+            build = builds_by_key.get(key)
+            if build is not None:
+                log.log(VERBOSE, "Deploy job \"%s\" is equivalent to \"%s\"",
+                        new_build.name, build.name)
+                # Discard `new_build` since it is equivalent to build. If
+                # `new_build` is the same as `primary_build_mode`, update
+                # `primary_build_mode` to match `build`.
+                if new_build.name == self.primary_build_mode:
+                    self.primary_build_mode = build.name
+                build_map[build_mode_obj] = build
+                continue
+
+            # Likewise, the same build may be needed by several cfgs of a
+            # primary cfg. It is then shared with the cfg that created it.
+            exact_key = new_build.get_equivalence_key()
+            build = SimCfg.build_registry.get(exact_key)
+            if build is not None and build.name == new_build.name:
+                log.log(VERBOSE, "[%s]: sharing build \"%s\" of %s", self.name,
+                        build.name, build.sim_cfg.name)
+                new_build = build
+            else:
+                SimCfg.build_registry[exact_key] = new_build
+
+            builds_by_key[key] = new_build
+            self.builds.append(new_build)
             build_map[build_mode_obj] = new_build
 
         # If there is only one build, set primary_build_mode to it.
@@ -479,10 +529,10 @@ class SimCfg(FlowCfg):
                         "Picking {}".format(self.runs[0].full_name))
 
         # Add builds to the list of things to run, only if --run-only switch
-        # is not passed.
+        # is not passed. Builds shared with other cfgs are run by them.
         self.deploy = []
         if not self.run_only:
-            self.deploy += self.builds
+            self.deploy += [b for b in self.builds if b.sim_cfg is self]
 
         if not self.build_only:
             self.deploy += self.runs
@@ -490,13 +540,57 @@ class SimCfg(FlowCfg):
             # Create cov_merge and cov_report objects, so long as we've got at
             # least one run to do.
             if self.cov and self.runs:
-                self.cov_merge_deploy = CovMerge(self.runs, self)
+                merge_tree = self._create_cov_merge_tree()
+                self.cov_merge_deploy = CovMerge(
+                    self.runs, self, merge_tree[-1] if merge_tree else None)
                 self.cov_report_deploy = CovReport(self.cov_merge_deploy, self)
+                self.deploy += [item for level in merge_tree for item in level]
                 self.deploy += [self.cov_merge_deploy, self.cov_report_deploy]
 
         # Create initial set of directories before kicking off the regression.
         self._create_dirs()
 
+    def _create_cov_merge_tree(self):
+        '''Create a tree of partial coverage merges for --cov-merge-fanin.
+
+        Returns the levels of the tree as a list of lists of CovMergePartial
+        jobs, from the leaves (which merge the coverage of up to
+        cov_merge_fanin tests each) to the top (which has at most
+        cov_merge_fanin jobs, whose outputs are merged by CovMerge). The list
+        is empty if the coverage is to be merged by CovMerge in one go.
+        '''
+        fanin = self.cov_merge_fanin
+        if not fanin or len(self.runs) <= fanin:
+            return []
+
+        if fanin < 2:
+            log.error("--cov-merge-fanin must be at least 2, got %d.", fanin)
+            sys.exit(1)
+
+        if not getattr(self, "cov_merge_tree_opts", None):
+            log.warning("%s: %s does not support merging coverage in a tree "
+                        "(cov_merge_tree_opts is not set). Merging it in one "
+                        "go instead.", self.name, self.tool)
+            return []
+
+        # Remove stale partial merges from a previous regression.
+        if not self.dry_run:
+            rm_path(Path(self.cov_merge_dir, "partial"))
+
+        # The coverage of the primary build mode goes first (see CovMerge).
+        inputs = sorted(
+            self.runs,
+            key=lambda run: run.build_mode != self.primary_build_mode)
+        levels = []
+        while len(inputs) > fanin:
+            level = [
+                CovMergePartial(len(levels), i, inputs[j:j + fanin], self)
+                for i, j in enumerate(range(0, len(inputs), fanin))
+            ]
+            levels.append(level)
+            inputs = level
+        return levels
+
     def _cov_analyze(self):
         '''Use the last regression coverage data to open up the GUI tool to
         analyze the coverage.
@@ -533,6 +627,191 @@ class SimCfg(FlowCfg):
         for item in self.cfgs:
             item._cov_unr()
 
+    def _grade(self):
+        '''Grade the tests of the last regression by their coverage.
+
+        The tests are the ones selected with --items, with the seeds recorded
+        in the journal of the last regression. Each test that passed is
+        expected to have left a tool-neutral summary of the coverage items it
+        hit (see CovGrader.read_cov_items) in the file named by
+        'cov_grade_items' in its run directory. Tests are weighted by their
+        runtime, or by the median runtime of the others if the tool does not
+        report it.
+
+        The runs that reach the --grade-target coverage most cheaply are
+        written out as a regression named "graded", in which each test is
+        reseeded as many times as it was picked. The file can be added to the
+        import_cfgs of the sim cfg to run it.
+        '''
+        self._open_journal(load=True)
+        self._create_build_and_run_list()
+        build_map = {
+            build_mode_obj: CompileSim(build_mode_obj, self)
+            for build_mode_obj in self.build_list
+        }
+
+        grader = CovGrader()
+        for run in self._expand_run_list(build_map):
+            if self.journal.get_status(run.journal_key) != 'P':
+                continue
+
+            path = os.path.join(run.odir, self.cov_grade_items)
+            try:
+                items = read_cov_items(path)
+            except OSError as e:
+                log.warning("No coverage summary for %s: %s", run.full_name,
+                            e)
+                continue
+
+            grader.add_run(run, items, self._get_run_cost(run))
+
+        if not grader.num_items:
+            log.error("No coverage to grade in %s.", self.scratch_path)
+            sys.exit(1)
+
+        picked = grader.grade(self.grade_target / 100)
+        reseeds = OrderedDict()
+        table = []
+        for run, gain, covered in picked:
+            reseeds[run.test] = reseeds.get(run.test, 0) + 1
+            table.append((run.test, run.seed, gain,
+                          "{:.2f} %".format(covered * 100 / grader.num_items)))
+
+        regression = {
+            "name": "graded",
+            "tests": list(reseeds.keys()),
+            "reseeds": reseeds,
+        }
+        hjson_path = os.path.join(self.scratch_path, "graded_regression.hjson")
+        with open(hjson_path, "w", encoding="UTF-8") as f:
+            f.write("// Generated by dvsim.py --grade from the regression "
+                    "run in\n// {}.\n".format(self.scratch_path))
+            f.write(json.dumps({"regressions": [regression]}, indent=2))
+            f.write("\n")
+
+        print("\n## Coverage grading of {}\n".format(self.name))
+        print(tabulate(table,
+                       headers=["Test", "Seed", "New items", "Coverage"],
+                       tablefmt="pipe",
+                       colalign=("left", "right", "right", "right")))
+        costs = dict(grader.costs())
+        picked_cost = sum(costs[run] for run, _, _ in picked)
+        print("\n{} of {} runs ({:.1f} % of the cost) cover {} of the {} "
+              "items covered.".format(len(picked), len(costs),
+                                      picked_cost * 100 / sum(costs.values()),
+                                      picked[-1][2] if picked else 0,
+                                      grader.num_items))
+        log.info("[grade]: [%s]: %s", self.name, hjson_path)
+
+    @staticmethod
+    def _get_run_cost(run):
+        '''Returns the runtime of a run in seconds, or None if not known.'''
+        try:
+            with open_log(run.get_log_path()) as f:
+                time, unit = get_job_runtime(f.readlines(),
+                                             run.sim_cfg.tool)
+        except (OSError, NotImplementedError, RuntimeError):
+            return None
+        return JobTime(time, unit).with_unit("s").get()[0] or None
+
+    def grade(self):
+        '''Public facing API for grading the tests of the last regression.
+        '''
+        for item in self.cfgs:
+            item._grade()
+
+    def _fold_result(self, item, status):
+        '''Fold the result of a completed item into self.partial_results.
+
+        A partial report is written out if the last one is older than
+        results_flush_secs.
+        '''
+        if self.partial_results is None:
+            self.partial_results = SimResults([], {})
+        self.partial_results.add_item(item, status)
+        self.partial_done += 1
+
+        now = time.monotonic()
+        if (self.results_flush_secs and
+                now - self.partial_flush_time >= self.results_flush_secs):
+            self.partial_flush_time = now
+            self._flush_partial_results()
+
+    def _flush_partial_results(self):
+        '''Write a partial report of the results folded in so far.
+
+        The report is written to {scratch_path}/report.partial.{json,html}
+        so that a dashboard can show the progress of a running regression.
+        The full report is generated by gen_results() once all jobs are done.
+        '''
+        if self.partial_results is None:
+            return
+
+        results = self.partial_results
+        timestamp = datetime.strptime(self.timestamp, TS_FORMAT)
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+        tests = [{
+            'name': tr.name,
+            'passing_runs': tr.passing,
+            'total_runs': tr.total,
+            'pass_rate': tr.passing * 100.0 / tr.total if tr.total else 0,
+        } for tr in results.table]
+        buckets = sorted(results.buckets.items(),
+                         key=lambda i: len(i[1]),
+                         reverse=True)
+        json_results = {
+            'block_name': self.name.lower(),
+            'report_timestamp': timestamp.isoformat(),
+            'jobs_completed': self.partial_done,
+            'jobs_total': len(self.deploy),
+            'tests': tests,
+            'failure_buckets': [{
+                'identifier': bucket,
+                'failure_count': len(failures),
+            } for bucket, failures in buckets],
+        }
+
+        results_str = "## " + self.results_title + " (in progress)\n"
+        results_str += "### " + self.timestamp_long + "\n"
+        results_str += "### Jobs completed: {} / {}\n".format(
+            self.partial_done, len(self.deploy))
+        if tests:
+            table = [["Test", "Passing", "Total", "Pass Rate"]]
+            table += [[t['name'], t['passing_runs'], t['total_runs'],
+                       "{:.2f} %".format(t['pass_rate'])] for t in tests]
+            results_str += "\n" + tabulate(table,
+                                            headers="firstrow",
+                                            tablefmt="pipe",
+                                            colalign=("left", "right",
+                                                      "right", "right"))
+            results_str += "\n"
+        if buckets:
+            results_str += "\n## Failure Buckets\n\n"
+            for bucket, failures in buckets:
+                results_str += "* `{}` has {} failures.\n".format(
+                    bucket, len(failures))
+
+        # The partial report is for information only, so failing to write it
+        # should not bring down the regression.
+        scratch_path = Path(self.scratch_path)
+        try:
+            self._write_atomic(scratch_path / "report.partial.json",
+                               json.dumps(json_results))
+            self._write_atomic(
+                scratch_path / "report.partial.html",
+                md_results_to_html(self.results_title, self.css_file,
+                                   results_str))
+        except Exception as e:
+            log.warning("Failed to write partial results in %s: %s",
+                        scratch_path, e)
+
+    @staticmethod
+    def _write_atomic(path, text):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
     def _gen_json_results(self, run_results):
         """Returns the run results as json-formatted dictionary.
         """
@@ -588,9 +867,7 @@ class SimCfg(FlowCfg):
         results['report_timestamp'] = timestamp.isoformat()
 
         # Extract Git properties.
-        m = re.search(r'https://github.com/.+?/tree/([0-9a-fA-F]+)',
-                      self.revision)
-        results['git_revision'] = m.group(1) if m else None
+        results['git_revision'] = self._get_git_revision()
         results['git_branch_name'] = _empty_str_as_none(self.branch)
 
         # Describe type of report and tool used.
@@ -869,8 +1146,63 @@ class SimCfg(FlowCfg):
             results_str += "\n".join(create_bucket_report(results.buckets))
 
         self.results_md = results_str
+        self._record_results(run_results, results)
         return results_str
 
+    def _get_git_revision(self):
+        '''Returns the commit hash in self.revision, or None.'''
+        m = re.search(r'https://github.com/.+?/tree/([0-9a-fA-F]+)',
+                      self.revision)
+        return m.group(1) if m else None
+
+    def _record_results(self, run_results, results):
+        '''Appends the results of the runs to the results database.
+
+        results is the SimResults of the regression, from which the failure
+        bucket of each failing run is taken.
+        '''
+        if self.results_db is None or self.dry_run:
+            return
+
+        buckets = {}
+        for bucket, failures in results.buckets.items():
+            for item, _, _ in failures:
+                buckets[item] = bucket
+
+        runs = []
+        for item in self.deploy:
+            status = run_results.get(item)
+            if not isinstance(item, RunTest) or status is None:
+                continue
+            runs.append((item.name, item.seed, status,
+                         item.job_runtime.with_unit('s').get()[0],
+                         item.simulated_time.with_unit('us').get()[0],
+                         buckets.get(item)))
+        if not runs:
+            return
+
+        timestamp = datetime.strptime(self.timestamp, TS_FORMAT)
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+        # The history is for information only, so failing to record it should
+        # not bring down the regression.
+        try:
+            db = ResultsDb(self.results_db)
+            try:
+                db.add_session(self.name.lower(),
+                               self.variant.lower() or None,
+                               self.tool.lower(), timestamp.isoformat(),
+                               self._get_git_revision(), self.branch or None,
+                               runs)
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            log.warning("Failed to record results in %s: %s",
+                        self.results_db, e)
+            return
+        log.log(VERBOSE, "[results_db]: [%s] [%s]", self.name,
+                self.results_db)
+
     def gen_results_summary(self):
         '''Generate the summary results table.
 
@@ -6,6 +6,7 @@ Class describing simulation results
 """
 
 import collections
+import functools
 import re
 
 from Testplan import Result
@@ -80,13 +81,16 @@ class SimResults:
         self.buckets = collections.defaultdict(list)
         self._name_to_row = {}
         for item in items:
-            self._add_item(item, results)
+            self.add_item(item, results[item])
 
-    def _add_item(self, item, results):
-        '''Recursively add a single item to the table of results'''
-        status = results[item]
+    def add_item(self, item, status):
+        '''Add a single item with the given status to the table of results
+
+        This can be called as each item completes, to fold its result in
+        incrementally.
+        '''
         if status in ["F", "K"]:
-            bucket = self._bucketize(item.launcher.fail_msg.message)
+            bucket = _bucketize(item.launcher.fail_msg.message)
             self.buckets[bucket].append(
                 (item, item.launcher.fail_msg.line_number,
                  item.launcher.fail_msg.context))
@@ -115,15 +119,22 @@ class SimResults:
             row.passing += 1
         row.total += 1
 
-    def _bucketize(self, fail_msg):
-        bucket = fail_msg
-        # Remove stuff.
-        for regex in _REGEX_REMOVE:
-            bucket = regex.sub('', bucket)
-        # Strip stuff.
-        for regex in _REGEX_STRIP:
-            bucket = regex.sub(r'\g<1>', bucket)
-        # Replace with '*'.
-        for regex in _REGEX_STAR:
-            bucket = regex.sub('*', bucket)
-        return bucket
+
+@functools.lru_cache(maxsize=4096)
+def _bucketize(fail_msg):
+    '''Return the failure bucket for fail_msg
+
+    This is memoized, since many failures share the same message (such as
+    reseeds of a test hitting the same error, or tests killed on timeout).
+    '''
+    bucket = fail_msg
+    # Remove stuff.
+    for regex in _REGEX_REMOVE:
+        bucket = regex.sub('', bucket)
+    # Strip stuff.
+    for regex in _REGEX_STRIP:
+        bucket = regex.sub(r'\g<1>', bucket)
+    # Replace with '*'.
+    for regex in _REGEX_STAR:
+        bucket = regex.sub('*', bucket)
+    return bucket
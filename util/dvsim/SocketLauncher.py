@@ -0,0 +1,270 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging as log
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import worker_daemon
+from Launcher import ErrorMessage, Launcher, LauncherError
+
+
+class WorkerConnection:
+    '''The connection of this dvsim invocation to the worker daemon.
+
+    Events sent back by the daemon are read without blocking whenever a
+    launcher polls, and stored until the launcher of the job picks them up.
+    '''
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b""
+
+        # Map of job id to its "done" event, not yet picked up.
+        self.done = {}
+
+        self.next_id = 0
+
+    def send(self, msg):
+        try:
+            self.sock.sendall(worker_daemon.encode_msg(msg))
+        except OSError as e:
+            raise LauncherError("Lost connection to the worker daemon: "
+                                "{}".format(e))
+
+    def pump(self, block=False, timeout=None):
+        '''Reads the events available on the socket.
+
+        If block is set, waits for at least some data to be available, for up
+        to timeout seconds if timeout is not None.
+        '''
+        if block:
+            self.sock.settimeout(timeout)
+        else:
+            self.sock.setblocking(False)
+        try:
+            while True:
+                data = self.sock.recv(1 << 16)
+                if not data:
+                    raise LauncherError("The worker daemon closed the "
+                                        "connection.")
+                msgs, self.inbuf = worker_daemon.decode_msgs(self.inbuf +
+                                                             data)
+                for msg in msgs:
+                    self.done[msg["id"]] = msg
+                if block:
+                    return
+        except (BlockingIOError, socket.timeout):
+            pass
+        except OSError as e:
+            raise LauncherError("Lost connection to the worker daemon: "
+                                "{}".format(e))
+        finally:
+            self.sock.setblocking(True)
+
+
+class SocketLauncher(Launcher):
+    """
+    Implementation of Launcher to launch jobs through the local worker daemon.
+
+    Rather than forking each job itself, dvsim sends it to a long-running
+    worker daemon (see worker_daemon.py) over a Unix domain socket. The daemon
+    holds a copy of dvsim's environment (sent once on connecting), so each job
+    only carries its own exports, and it writes the job's env_vars file and
+    log header itself. The daemon caps the number of jobs running on the host
+    across all dvsim invocations that use it. It is started on first use if it
+    is not already running.
+    """
+
+    # Misc common SocketLauncher settings.
+    max_odirs = 5
+
+    # Completion events are pushed by the daemon, so they are cheap to poll
+    # for.
+    poll_freq = 0.1
+
+    # Number of jobs the daemon runs at a time, if dvsim starts it. Set from
+    # dvsim.py.
+    daemon_max_parallel = 16
+
+    # Seconds to wait for a daemon started by dvsim to come up.
+    daemon_start_timeout = 10
+
+    # Seconds to wait for the daemon to confirm that a job was killed. This
+    # leaves time for the job to exit after SIGTERM, or be sent SIGKILL.
+    kill_timeout = worker_daemon.KILL_GRACE_SECS + 10
+
+    # The WorkerConnection, shared by all instances.
+    conn = None
+
+    def __init__(self, deploy):
+        '''Initialize common class members.'''
+
+        super().__init__(deploy)
+
+        # Id of the job, as known by the daemon. This is None until the job
+        # was sent to the daemon.
+        self.job_id = None
+
+    @staticmethod
+    def prepare_workspace(project, repo_top, args):
+        '''Connects to the worker daemon, starting it if needed.'''
+
+        path = worker_daemon.default_socket_path()
+        sock = SocketLauncher._connect(path)
+        if sock is None:
+            SocketLauncher._start_daemon(path)
+            deadline = time.monotonic() + SocketLauncher.daemon_start_timeout
+            while sock is None and time.monotonic() < deadline:
+                time.sleep(0.1)
+                sock = SocketLauncher._connect(path)
+            if sock is None:
+                log.error("Failed to start the worker daemon on %s. See "
+                          "%s.log.", path, path)
+                sys.exit(1)
+
+        SocketLauncher.conn = WorkerConnection(sock)
+        SocketLauncher.conn.send({
+            "op": "hello",
+            "env": dict(os.environ),
+            "cwd": os.getcwd(),
+        })
+        log.info("[worker_daemon]: %s", path)
+
+    @staticmethod
+    def _connect(path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            return None
+        return sock
+
+    @staticmethod
+    def _start_daemon(path):
+        '''Starts the daemon in the background, detached from dvsim.'''
+
+        log.info("[worker_daemon]: starting with %d workers",
+                 SocketLauncher.daemon_max_parallel)
+        with open(path + ".log", "a") as f:
+            subprocess.Popen([
+                sys.executable, worker_daemon.__file__, "--socket", path,
+                "--max-parallel",
+                str(SocketLauncher.daemon_max_parallel)
+            ],
+                             stdin=subprocess.DEVNULL,
+                             stdout=f,
+                             stderr=f,
+                             start_new_session=True)
+
+    def _do_launch(self):
+        if self.deploy.sim_cfg.interactive:
+            raise LauncherError("Interactive mode is not supported by the "
+                                "socket launcher. Use --local.")
+
+        timeout_mins = self.deploy.get_timeout_mins()
+        conn = SocketLauncher.conn
+        job_id = conn.next_id
+        conn.next_id += 1
+        conn.send({
+            "op": "run",
+            "id": job_id,
+            "cmd": self.deploy.cmd,
+            "exports": self.deploy.exports,
+            "log": self.deploy.get_log_path(),
+            "env_vars": self.deploy.odir + "/env_vars",
+            "timeout": timeout_mins * 60 if timeout_mins else None,
+        })
+        self.job_id = job_id
+
+    def _link_odir(self, status):
+        # Jobs are dispatched to the daemon's queue and not necessarily
+        # running, so the dispatched link is not maintained.
+        if status != "D":
+            super()._link_odir(status)
+
+    def poll(self):
+        '''Check status of the job.
+
+        This returns 'D', 'P', 'F', or 'K'. If 'D', the job is still running.
+        If 'P', the job finished successfully. If 'F', the job finished with
+        an error. If 'K' it was killed.
+        '''
+
+        # It is possible we may have determined the status already.
+        if self.status:
+            return self.status
+
+        conn = SocketLauncher.conn
+        if self.job_id not in conn.done:
+            conn.pump()
+        event = conn.done.pop(self.job_id, None)
+        if event is None:
+            return 'D'
+
+        self._finish(event)
+        return self.status
+
+    def _finish(self, event):
+        '''Posts the outcome of the job, from its "done" event.'''
+
+        self.job_runtime_secs = event["runtime"]
+        if event["error"]:
+            msg = "Failed to start the job: {}".format(event["error"])
+            self._post_finish(
+                'F', ErrorMessage(line_number=None, message=msg,
+                                  context=[msg]))
+        elif event["timed_out"]:
+            msg = 'Job timed out after {} minutes'.format(
+                self.deploy.get_timeout_mins())
+            self._post_finish(
+                'K', ErrorMessage(line_number=None, message=msg,
+                                  context=[msg]))
+        elif event["killed"]:
+            self._post_finish(
+                'K',
+                ErrorMessage(line_number=None, message='Job killed!',
+                             context=[]))
+        else:
+            self.exit_code = event["exit_code"]
+            self._post_finish(*self._check_status())
+
+    def kill(self):
+        '''Kill the job and wait for the daemon to confirm it.'''
+
+        # If the job was never sent to the daemon (because _do_launch()
+        # failed), there is nothing to kill.
+        if self.job_id is None:
+            self._post_finish(
+                'K',
+                ErrorMessage(line_number=None, message='Job killed!',
+                             context=[]))
+            return
+
+        conn = SocketLauncher.conn
+        deadline = time.monotonic() + SocketLauncher.kill_timeout
+        try:
+            conn.send({"op": "kill", "id": self.job_id})
+            while (self.job_id not in conn.done and
+                   time.monotonic() < deadline):
+                conn.pump(block=True,
+                          timeout=max(deadline - time.monotonic(), 0))
+        except LauncherError as e:
+            log.error("%s", e)
+
+        event = conn.done.pop(self.job_id, None)
+        if event is None:
+            msg = ("Job killed, but the worker daemon did not confirm that "
+                   "it exited")
+            self._post_finish(
+                'K', ErrorMessage(line_number=None, message=msg,
+                                  context=[msg]))
+            return
+
+        event["killed"] = not event["timed_out"]
+        self._finish(event)
@@ -5,6 +5,7 @@ r"""Testpoint and Testplan classes for maintaining the testplan
 """
 
 import os
+import pickle
 import re
 import sys
 from collections import defaultdict
@@ -201,10 +202,15 @@ class Testpoint(Element):
     def map_test_results(self, test_results):
         """Map test results to tests against this testpoint.
 
-        Given a list of test results find the ones that match the tests listed
+        Given the test results find the ones that match the tests listed
         in this testpoint and buiild a structure. If no match is found, or if
         self.tests is an empty list, indicate 0/1 passing so that it is
         factored into the final total.
+
+        test_results is a dict mapping each test name to the list of
+        (position, Result) tuples with that name, where position is the
+        position of the result in the full list of results (see
+        Testplan.map_test_results).
         """
         # If no written tests were indicated for this testpoint, then reuse
         # the testpoint name to count towards "not run".
@@ -217,15 +223,18 @@ class Testpoint(Element):
         if self.not_mapped:
             return
 
-        for tr in test_results:
-            assert isinstance(tr, Result)
-            if tr.name in self.tests:
-                tr.mapped = True
-                self.test_results.append(tr)
+        # Keep the results in the order in which they were given.
+        found = []
+        for test in dict.fromkeys(self.tests):
+            found += test_results.get(test, [])
+        found.sort(key=lambda item: item[0])
+        for _, tr in found:
+            tr.mapped = True
+            self.test_results.append(tr)
 
         # Did we map all tests in this testpoint? If we are mapping the full
         # testplan, then count the ones not found as "not run", i.e. 0 / 0.
-        tests_mapped = [tr.name for tr in self.test_results]
+        tests_mapped = {tr.name for tr in self.test_results}
         for test in self.tests:
             if test not in tests_mapped:
                 self.test_results.append(Result(name=test))
@@ -240,11 +249,38 @@ class Testplan:
     rsvd_keywords = ["import_testplans", "testpoints", "covergroups"]
     element_cls = {'testpoint': Testpoint, 'covergroup': Covergroup}
 
+    # Map of path to ((mtime, size), pickled parsed data) of the HJson files
+    # parsed so far. A primary cfg creates a testplan for each of its cfgs,
+    # which mostly import the same few common testplans.
+    _parsed = {}
+
     @staticmethod
     def _parse_hjson(filename):
-        """Parses an input file with HJson and returns a dict."""
+        """Parses an input file with HJson and returns a dict.
+
+        The file is only parsed again if it changed since it was last parsed.
+        A fresh copy of the data is returned each time, since it is consumed
+        destructively.
+        """
+        path = os.path.abspath(filename)
         try:
-            return hjson.load(open(filename, 'r'))
+            st = os.stat(path)
+            stat_key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stat_key = None
+        entry = Testplan._parsed.get(path)
+        if entry is not None and stat_key is not None and \
+                entry[0] == stat_key:
+            return pickle.loads(entry[1])
+
+        try:
+            with open(filename, 'r') as f:
+                obj = hjson.load(f)
+            if stat_key is not None:
+                Testplan._parsed[path] = (stat_key,
+                                          pickle.dumps(
+                                              obj, pickle.HIGHEST_PROTOCOL))
+            return obj
         except IOError as e:
             print(f"IO Error when opening file {filename}\n{e}")
         except hjson.scanner.HjsonDecodeError as e:
@@ -608,9 +644,16 @@ class Testplan:
         }
         unmapped = Testpoint(arg)
 
+        # Index the results by test name once, so that mapping them to the
+        # testpoints is linear in the number of tests.
+        results_by_name = defaultdict(list)
+        for i, tr in enumerate(test_results):
+            assert isinstance(tr, Result)
+            results_by_name[tr.name].append((i, tr))
+
         # Now, map the simulation results to each testpoint.
         for tp in self.testpoints:
-            tp.map_test_results(test_results)
+            tp.map_test_results(results_by_name)
             _process_testpoint(tp, totals)
 
         # If we do have unmapped tests, then count that too.
@@ -655,6 +698,7 @@ class Testplan:
         if not self.covergroups:
             return
 
+        cgs_found = set(cgs_found)
         written = 0
         total = 0
         for cg in self.covergroups:
@@ -20,6 +20,7 @@ by the sim tool.
 """
 
 import argparse
+import atexit
 import datetime
 import logging as log
 import os
@@ -34,8 +35,13 @@ import Launcher
 import LauncherFactory
 import LocalLauncher
 import SgeLauncher
+import SocketLauncher
+from BuildCache import BuildCache
 from CfgFactory import make_cfg
-from Deploy import RunTest
+from Deploy import CompileSim, Deploy, RunTest
+from HjsonCache import HjsonCache
+from Reaper import Reaper
+from SimCfg import SimCfg
 from Timer import Timer
 from utils import (TS_FORMAT, TS_FORMAT_LONG, VERBOSE, rm_path,
                    run_cmd_with_timeout)
@@ -329,6 +335,24 @@ def parse_args():
                              'not used, dvsim will process all configs listed '
                              'in a primary config.'))
 
+    whatg.add_argument("--resume",
+                       action='store_true',
+                       help=('Resume the previous invocation of dvsim with '
+                             'the same arguments, using the journal of job '
+                             'statuses that it kept in the scratch area. Jobs '
+                             'that passed are not run again (and their '
+                             'outputs, such as builds, are reused); the '
+                             'others are run, with the same seeds as '
+                             'before.'))
+
+    whatg.add_argument("--rerun-failed",
+                       action='store_true',
+                       help=('Like --resume, but only rerun the tests that '
+                             'failed or were killed in the previous '
+                             'invocation, with the same seeds, against the '
+                             'existing builds. Tests that did not run at all '
+                             'are not run.'))
+
     disg = parser.add_argument_group('Dispatch options')
 
     disg.add_argument("--job-prefix",
@@ -395,6 +419,31 @@ def parse_args():
                        action='store_true',
                        help="Clean the scratch directory before running.")
 
+    pathg.add_argument("--scratch-quota",
+                       type=float,
+                       default=0,
+                       metavar="GB",
+                       help=('Keep the scratch root under GB gigabytes by '
+                             'deleting the oldest backed up output '
+                             'directories. This is checked in the background '
+                             'once the jobs to run are known. Defaults to 0, '
+                             'no quota.'))
+
+    pathg.add_argument("--delete-rate",
+                       type=int,
+                       default=2000,
+                       metavar="N",
+                       help=('Old output directories are deleted in the '
+                             'background, from {scratch-root}/.trash. '
+                             'Delete at most N files per second so as not to '
+                             'overload the filesystem (defaults to 2000). Set '
+                             'to 0 for no limit.'))
+
+    pathg.add_argument("--compress-passing-logs",
+                       action='store_true',
+                       help=('Compress the logs of passing tests with gzip '
+                             'in the background, to save space.'))
+
     buildg = parser.add_argument_group('Options for building')
 
     buildg.add_argument("--build-only",
@@ -427,6 +476,20 @@ def parse_args():
                         help=('The options for each build_mode in this list '
                               'are applied to all build and run targets.'))
 
+    buildg.add_argument("--build-cache",
+                        nargs="?",
+                        const="",
+                        metavar="PATH",
+                        help=('Cache simulation builds in PATH, keyed by the '
+                              'resolved build command, its exports and the '
+                              'contents of all sources in the generated '
+                              'filelist. A build whose key is found in the '
+                              'cache is restored from it instead of being '
+                              'run. If PATH is not given, the path in the '
+                              'DVSIM_BUILD_CACHE environment variable is '
+                              'used, if set, or {scratch-root}/build_cache '
+                              'otherwise.'))
+
     buildg.add_argument("--build-timeout-mins",
                         type=int,
                         metavar="MINUTES",
@@ -595,6 +658,18 @@ def parse_args():
                             'coverage database directory with the new '
                             'coverage database.'))
 
+    covg.add_argument("--cov-merge-fanin",
+                      type=int,
+                      default=0,
+                      metavar="K",
+                      help=('Only applicable with --cov. Merge the coverage '
+                            'in a tree of partial merges of K databases each, '
+                            'run as soon as their tests complete, so that '
+                            'only the top of the tree is left to merge once '
+                            'all tests are done. This needs the tool to set '
+                            'cov_merge_tree_opts. By default, the coverage '
+                            'of all tests is merged in one go.'))
+
     covg.add_argument("--cov-unr",
                       action='store_true',
                       help=('Run coverage UNR analysis and generate report. '
@@ -605,6 +680,24 @@ def parse_args():
                       help=('Rather than building or running any tests, '
                             'analyze the coverage from the last run.'))
 
+    covg.add_argument("--grade",
+                      action='store_true',
+                      help=('Grade the tests of the last regression by their '
+                            'contribution to coverage, using the summary of '
+                            'the coverage items hit that each test left in '
+                            'its run directory (see cov_grade_items), and '
+                            'write out the smallest set of tests and seeds '
+                            'reaching --grade-target as a regression named '
+                            '"graded", with per-test reseed counts.'))
+
+    covg.add_argument("--grade-target",
+                      type=float,
+                      default=100.0,
+                      metavar="PCT",
+                      help=('Percentage of the coverage of the last '
+                            'regression to retain with --grade (default: '
+                            '100).'))
+
     pubg = parser.add_argument_group('Generating and publishing results')
 
     pubg.add_argument("--map-full-testplan",
@@ -616,6 +709,29 @@ def parse_args():
                       action='store_true',
                       help="Publish results to reports.opentitan.org.")
 
+    pubg.add_argument("--results-flush-interval",
+                      type=int,
+                      default=60,
+                      metavar="N",
+                      help=('While a simulation regression is running, write '
+                            'a partial report of the results to '
+                            '{scratch_path}/report.partial.{json,html} at '
+                            'most every N seconds (defaults to 60). Set to 0 '
+                            'to only write it once all jobs are done.'))
+
+    pubg.add_argument("--results-db",
+                      metavar="PATH",
+                      help=('Append the results of each test run of a '
+                            'simulation regression (status, seed, runtime, '
+                            'simulated time and failure bucket) to the '
+                            'SQLite database in PATH (defaults to '
+                            '{scratch-root}/results.db). Use '
+                            'util/dvsim/results_db.py to query it.'))
+
+    pubg.add_argument("--no-results-db",
+                      action='store_true',
+                      help="Do not record the results in a database.")
+
     dvg = parser.add_argument_group('Controlling DVSim itself')
 
     dvg.add_argument("--print-interval",
@@ -634,6 +750,12 @@ def parse_args():
                            'messages. With --verbose=debug, the volume of '
                            'messages is even higher.'))
 
+    dvg.add_argument("--no-hjson-cache",
+                     action='store_true',
+                     help=('Do not cache parsed hjson cfg files in '
+                           '{scratch-root}/hjson_cache. Parsed files are then '
+                           'only cached for the current invocation.'))
+
     dvg.add_argument("--dry-run",
                      "-n",
                      action='store_true',
@@ -651,6 +773,10 @@ def parse_args():
     if args.interactive and args.remote:
         log.error("--interactive and --remote cannot be set together")
         sys.exit()
+    if (args.resume or args.rerun_failed) and args.purge:
+        log.error("--resume / --rerun-failed and --purge cannot be set "
+                  "together")
+        sys.exit(1)
     if args.interactive and args.reseed != 1:
         args.reseed = 1
 
@@ -719,10 +845,38 @@ def main():
         args.reseed = 1
     RunTest.fixed_seed = args.fixed_seed
 
+    # Enable the build cache if requested.
+    if args.build_cache is not None:
+        cache_dir = (args.build_cache or os.environ.get('DVSIM_BUILD_CACHE') or
+                     os.path.join(args.scratch_root, "build_cache"))
+        CompileSim.build_cache = BuildCache(os.path.realpath(cache_dir))
+        log.info("[build_cache]: %s", CompileSim.build_cache)
+
+    # Delete old output directories in the background.
+    if not args.dry_run:
+        reaper = Reaper(args.scratch_root,
+                        max_rate=args.delete_rate,
+                        quota=int(args.scratch_quota * (1 << 30)),
+                        compress_logs=args.compress_passing_logs)
+        reaper.start()
+        atexit.register(reaper.close)
+        Deploy.reaper = reaper
+
+    # Cache parsed hjson cfg files in the scratch area unless told otherwise.
+    if not args.no_hjson_cache:
+        HjsonCache.cache_dir = os.path.join(args.scratch_root, "hjson_cache")
+
+    SimCfg.results_flush_secs = args.results_flush_interval
+    if not args.no_results_db:
+        SimCfg.results_db = (args.results_db or
+                             os.path.join(args.scratch_root, "results.db"))
+
     # Register the common deploy settings.
     Timer.print_interval = args.print_interval
     LocalLauncher.LocalLauncher.max_parallel = args.max_parallel
     SgeLauncher.SgeLauncher.max_parallel = args.max_parallel
+    SocketLauncher.SocketLauncher.max_parallel = args.max_parallel
+    SocketLauncher.SocketLauncher.daemon_max_parallel = args.max_parallel
     Launcher.Launcher.max_odirs = args.max_odirs
     LauncherFactory.set_launcher_type(args.local)
 
@@ -754,10 +908,23 @@ def main():
         cfg.deploy_objects()
         sys.exit(0)
 
+    # In simulation mode: if --grade is passed, grade the tests of the last
+    # regression by their coverage.
+    if args.grade:
+        cfg.grade()
+        sys.exit(0)
+
     # Deploy the builds and runs
     if args.items:
         # Create deploy objects.
         cfg.create_deploy_objects()
+
+        # The directories the jobs need (such as the previous coverage
+        # databases to merge) are protected by now, so the quota can be
+        # enforced.
+        if Deploy.reaper is not None:
+            Deploy.reaper.enforce_quota()
+
         results = cfg.deploy_objects()
 
         # Generate results.
@@ -10,7 +10,7 @@ import re
 import sys
 
 from pathlib import Path
-from LintParser import LintParser
+from LintParser import LintParser, read_section
 
 
 def extract_rule_patterns(file_path: Path):
@@ -20,10 +20,11 @@ def extract_rule_patterns(file_path: Path):
     '''
 
     rule_patterns = []
-    full_file = ''
+    summary = None
     try:
-        with Path(file_path).open() as f:
-            full_file = f.read()
+        # extract the summary table
+        summary = read_section(Path(file_path), 'Summary of Policy: NEW',
+                               'Rule Details of Policy: NEW')
     except IOError:
         # We will attempt read this file again in a second pass to parse out
         # the details, this error will get caught and reported.
@@ -33,14 +34,10 @@ def extract_rule_patterns(file_path: Path):
     severity = ''
     known_rule_names = {}
     # total_msgs = 0
-    # extract the summary table
-    m = re.findall(
-        r'^Summary of Policy: NEW((?:.|\n|\r\n)*)Rule Details of Policy: NEW',
-        full_file, flags=re.MULTILINE)
-    if m:
+    if summary is not None:
         # step through the table and identify rule names and their
         # category and severity
-        for line in m[0].split('\n'):
+        for line in summary.split('\n'):
             if re.match(r'^POLICY\s+NEW', line):
                 continue
                 # total = re.findall(r'^POLICY\s+NEW\s+([0-9]+)', line)
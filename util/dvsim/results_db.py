@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+Query the history of simulation results recorded by dvsim.
+
+Each time dvsim finishes a simulation regression, it appends the results of
+every test run (its status, seed, runtime, simulated time and failure bucket)
+to a SQLite database, {scratch_root}/results.db by default (see --results-db
+in dvsim). This script reports trends over that history:
+
+  flaky     Tests that both passed and failed over the last few regressions
+            of their block.
+  slow      Tests whose runtime in the last regression of their block went up
+            compared with the regressions before it.
+  buckets   Failure buckets, with the regression (and commit) they were first
+            seen in.
+"""
+
+import argparse
+import logging as log
+import os
+import sqlite3
+import sys
+
+from tabulate import tabulate
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    block TEXT NOT NULL,
+    variant TEXT,
+    tool TEXT,
+    timestamp TEXT NOT NULL,
+    git_revision TEXT,
+    branch TEXT
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    test TEXT NOT NULL,
+    seed INTEGER,
+    status TEXT NOT NULL,
+    runtime_s REAL,
+    simulated_time_us REAL,
+    bucket TEXT
+);
+
+CREATE INDEX IF NOT EXISTS sessions_by_block ON sessions(block, timestamp);
+CREATE INDEX IF NOT EXISTS runs_by_session ON runs(session_id, test);
+CREATE INDEX IF NOT EXISTS runs_by_bucket ON runs(bucket, session_id)
+    WHERE bucket IS NOT NULL;
+"""
+
+# The last sessions of each block (the most recent first), numbered from 1.
+_RECENT_SESSIONS = """
+recent AS (
+    SELECT id, block, timestamp, git_revision,
+           ROW_NUMBER() OVER (PARTITION BY block
+                              ORDER BY timestamp DESC, id DESC) AS age
+    FROM sessions
+    WHERE ? IS NULL OR block = ?
+)
+"""
+
+
+class ResultsDb:
+    '''A SQLite database of the results of simulation regressions.
+
+    A session is one regression of one block (one sim cfg). The runs of a
+    session are the runs of the tests in it, one row per reseed.
+    '''
+
+    # Seconds to wait for another dvsim process writing to the database.
+    busy_timeout = 60
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=self.busy_timeout)
+        self._conn.executescript(_SCHEMA)
+
+    def __str__(self):
+        return self.path
+
+    def close(self):
+        self._conn.close()
+
+    def add_session(self, block, variant, tool, timestamp, git_revision,
+                    branch, runs):
+        '''Records a regression and the runs in it.
+
+        runs is an iterable of (test, seed, status, runtime_s,
+        simulated_time_us, bucket) tuples. The session is written in a single
+        transaction, so that a query never sees it half-written.
+        '''
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO sessions (block, variant, tool, timestamp, "
+                "git_revision, branch) VALUES (?, ?, ?, ?, ?, ?)",
+                (block, variant, tool, timestamp, git_revision, branch))
+            session_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO runs (session_id, test, seed, status, "
+                "runtime_s, simulated_time_us, bucket) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((session_id, ) + tuple(run) for run in runs))
+        return session_id
+
+    def flaky_tests(self, block=None, sessions=10):
+        '''Returns the tests that both passed and failed in the last sessions.
+
+        Returns a list of (block, test, passing, failing, sessions, last
+        failed timestamp) tuples, the most failing first.
+        '''
+        return self._conn.execute(
+            "WITH " + _RECENT_SESSIONS + """
+            SELECT s.block, r.test,
+                   SUM(r.status = 'P') AS passing,
+                   SUM(r.status != 'P') AS failing,
+                   COUNT(DISTINCT s.id),
+                   MAX(CASE WHEN r.status != 'P' THEN s.timestamp END)
+            FROM recent s JOIN runs r ON r.session_id = s.id
+            WHERE s.age <= ?
+            GROUP BY s.block, r.test
+            HAVING passing > 0 AND failing > 0
+            ORDER BY failing * 1.0 / (passing + failing) DESC, s.block, r.test
+            """, (block, block, sessions)).fetchall()
+
+    def runtime_regressions(self, block=None, sessions=10, threshold=1.5):
+        '''Returns the tests that got slower in the last session.
+
+        The mean runtime of the passing runs of each test in the last session
+        of its block is compared with its mean over the sessions before it
+        (up to the given number of them). Returns a list of (block, test,
+        baseline runtime, last runtime, ratio) tuples, for the tests whose
+        runtime went up by at least the threshold ratio, the worst first.
+        '''
+        return self._conn.execute(
+            "WITH " + _RECENT_SESSIONS + """,
+            runtimes AS (
+                SELECT s.block, r.test, s.age, AVG(r.runtime_s) AS runtime
+                FROM recent s JOIN runs r ON r.session_id = s.id
+                WHERE s.age <= ? + 1 AND r.status = 'P' AND r.runtime_s > 0
+                GROUP BY s.block, r.test, s.age
+            ),
+            trends AS (
+                SELECT block, test,
+                       AVG(CASE WHEN age > 1 THEN runtime END) AS baseline,
+                       MAX(CASE WHEN age = 1 THEN runtime END) AS last
+                FROM runtimes
+                GROUP BY block, test
+            )
+            SELECT block, test, baseline, last, last / baseline AS ratio
+            FROM trends
+            WHERE last >= baseline * ?
+            ORDER BY ratio DESC, block, test
+            """, (block, block, sessions, threshold)).fetchall()
+
+    def bucket_history(self, block=None):
+        '''Returns when each failure bucket was first and last seen.
+
+        Returns a list of (bucket, block, first seen timestamp, first seen
+        revision, last seen timestamp, number of failures) tuples, the most
+        recently introduced bucket first.
+        '''
+        # With a single MIN() aggregate, SQLite takes the bare columns
+        # (git_revision) from the row holding the minimum.
+        return self._conn.execute(
+            """
+            SELECT r.bucket, s.block, MIN(s.timestamp), s.git_revision,
+                   (SELECT MAX(s2.timestamp)
+                    FROM runs r2 JOIN sessions s2 ON s2.id = r2.session_id
+                    WHERE r2.bucket = r.bucket AND s2.block = s.block),
+                   COUNT(*)
+            FROM runs r JOIN sessions s ON s.id = r.session_id
+            WHERE r.bucket IS NOT NULL AND (? IS NULL OR s.block = ?)
+            GROUP BY r.bucket, s.block
+            ORDER BY MIN(s.timestamp) DESC, s.block, r.bucket
+            """, (block, block)).fetchall()
+
+
+def _fmt_secs(secs):
+    return "{:.2f}s".format(secs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db",
+                        default=os.path.join(
+                            os.environ.get("SCRATCH_ROOT", "scratch"),
+                            "results.db"),
+                        metavar="PATH",
+                        help=("The results database (default: "
+                              "%(default)s)."))
+    parser.add_argument("--block",
+                        metavar="NAME",
+                        help="Only report on this block.")
+    parser.add_argument("--sessions",
+                        type=int,
+                        default=10,
+                        metavar="N",
+                        help=("Look at the last N regressions of each block "
+                              "(default: %(default)s)."))
+    parser.add_argument("--threshold",
+                        type=float,
+                        default=1.5,
+                        metavar="RATIO",
+                        help=("With 'slow', report the tests whose runtime "
+                              "went up by at least RATIO (default: "
+                              "%(default)s)."))
+    parser.add_argument("query", choices=["flaky", "slow", "buckets"])
+    args = parser.parse_args()
+
+    log.basicConfig(format="%(levelname)s: %(message)s", level=log.INFO)
+
+    if not os.path.exists(args.db):
+        log.error("Results database %s not found.", args.db)
+        sys.exit(1)
+
+    block = args.block.lower() if args.block else None
+    db = ResultsDb(args.db)
+    if args.query == "flaky":
+        header = ["Block", "Test", "Passing", "Failing", "Sessions",
+                  "Last Failed"]
+        rows = db.flaky_tests(block, args.sessions)
+    elif args.query == "slow":
+        header = ["Block", "Test", "Baseline", "Last", "Ratio"]
+        rows = [(b, t, _fmt_secs(base), _fmt_secs(last),
+                 "{:.2f}x".format(ratio))
+                for b, t, base, last, ratio in db.runtime_regressions(
+                    block, args.sessions, args.threshold)]
+    else:
+        header = ["Bucket", "Block", "First Seen", "Revision", "Last Seen",
+                  "Failures"]
+        rows = db.bucket_history(block)
+    db.close()
+
+    if not rows:
+        print("Nothing to report.")
+        return
+    print(tabulate(rows, headers=header, tablefmt="pipe"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+Microbenchmark for the dvsim Scheduler.
+
+This schedules a synthetic regression with the same shape as a real one (per
+cfg: a few builds, many runs each depending on one build, a coverage merge
+depending on all runs, optionally through a tree of partial merges, and a
+coverage report depending on the merge). Jobs are run with a dummy launcher
+that completes them as soon as they are polled, so that the time measured is
+the time spent in the scheduler itself.
+"""
+
+import argparse
+import logging as log
+import random
+import sys
+import time
+
+from Scheduler import Scheduler
+
+
+class BenchLauncher:
+    '''A launcher that completes each job on its first poll.'''
+
+    max_parallel = sys.maxsize
+    max_poll = 10000
+    poll_freq = 0
+
+    # Fraction of the jobs that fail.
+    fail_rate = 0.0
+
+    def __init__(self, deploy):
+        self.deploy = deploy
+
+    def launch(self):
+        pass
+
+    def poll(self):
+        return 'F' if random.random() < self.fail_rate else 'P'
+
+    def kill(self):
+        pass
+
+
+class BenchItem:
+    '''A stand-in for a Deploy object with just what the Scheduler needs.'''
+
+    def __init__(self, target, weight, sim_cfg, name, dependencies,
+                 needs_all_dependencies_passing=True):
+        self.target = target
+        self.weight = weight
+        self.sim_cfg = sim_cfg
+        self.name = name
+        self.full_name = "{}:{}".format(sim_cfg, name)
+        self.dependencies = dependencies
+        self.needs_all_dependencies_passing = needs_all_dependencies_passing
+        self.launcher = None
+
+    def create_launcher(self):
+        self.launcher = BenchLauncher(self)
+
+
+def make_items(num_cfgs, num_builds, num_runs, merge_fanin):
+    '''Returns the list of items of a synthetic regression.'''
+    builds, runs, merges, reports = [], [], [], []
+    for c in range(num_cfgs):
+        cfg = "cfg{}".format(c)
+        cfg_builds = [BenchItem("build", 5, cfg, "build{}".format(b), [])
+                      for b in range(num_builds)]
+        cfg_runs = [BenchItem("run", 1, cfg, "run{}".format(r),
+                              [cfg_builds[r % num_builds]])
+                    for r in range(num_runs)]
+        inputs = cfg_runs
+        level = 0
+        while merge_fanin and len(inputs) > merge_fanin:
+            inputs = [BenchItem("cov_merge", 10, cfg,
+                                "cov_merge.{}.{}".format(level, i),
+                                inputs[j:j + merge_fanin],
+                                needs_all_dependencies_passing=False)
+                      for i, j in enumerate(range(0, len(inputs),
+                                                  merge_fanin))]
+            merges += inputs
+            level += 1
+        merge = BenchItem("cov_merge", 10, cfg, "cov_merge", list(inputs),
+                          needs_all_dependencies_passing=False)
+        report = BenchItem("cov_report", 10, cfg, "cov_report", [merge])
+        builds += cfg_builds
+        runs += cfg_runs
+        merges.append(merge)
+        reports.append(report)
+    return builds + runs + merges + reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cfgs", type=int, default=10,
+                        help="Number of cfgs (default: 10).")
+    parser.add_argument("--builds", type=int, default=4,
+                        help="Number of builds per cfg (default: 4).")
+    parser.add_argument("--runs", type=int, default=10000,
+                        help="Number of runs per cfg (default: 10000).")
+    parser.add_argument("--max-parallel", type=int, default=1000,
+                        help="Maximum number of jobs in flight "
+                        "(default: 1000).")
+    parser.add_argument("--merge-fanin", type=int, default=0,
+                        help="Merge coverage in a tree of partial merges "
+                        "of this many inputs each (default: 0, no tree).")
+    parser.add_argument("--fail-rate", type=float, default=0.01,
+                        help="Fraction of jobs that fail (default: 0.01).")
+    args = parser.parse_args()
+
+    log.basicConfig(format="%(levelname)s: %(message)s", level=log.WARNING)
+    random.seed(0)
+    BenchLauncher.max_parallel = args.max_parallel
+    BenchLauncher.fail_rate = args.fail_rate
+
+    items = make_items(args.cfgs, args.builds, args.runs, args.merge_fanin)
+
+    start = time.perf_counter()
+    scheduler = Scheduler(items, BenchLauncher, interactive=True)
+    setup = time.perf_counter() - start
+    results = scheduler.run()
+    total = time.perf_counter() - start
+
+    statuses = {}
+    for status in results.values():
+        statuses[status] = statuses.get(status, 0) + 1
+    print("{} jobs ({}): setup {:.2f}s, total {:.2f}s ({:.1f}us/job)".format(
+        len(items),
+        ", ".join("{}: {}".format(k, v) for k, v in sorted(statuses.items())),
+        setup, total, total * 1e6 / len(items)))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ r"""
 Utility functions common across dvsim.
 """
 
+import gzip
 import logging as log
 import os
 import re
@@ -17,10 +18,14 @@ from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 
-import hjson
 import mistletoe
 from premailer import transform
 
+# Hjson files are parsed with the loader shared with reggen and topgen, which
+# is much faster on files that are plain JSON.
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from reggen import hjson_loader  # noqa: E402
+
 # For verbose logging
 VERBOSE = 15
 
@@ -85,7 +90,7 @@ def parse_hjson(hjson_file):
         log.debug("Parsing %s", hjson_file)
         f = open(hjson_file, 'r')
         text = f.read()
-        hjson_cfg_dict = hjson.loads(text, use_decimal=True)
+        hjson_cfg_dict = hjson_loader.loads(text, use_decimal=True)
         f.close()
     except Exception as e:
         log.fatal(
@@ -116,17 +121,62 @@ def _stringify_wildcard_value(value):
                          'type.'.format(value))
 
 
-def _subst_wildcards(var, mdict, ignored, ignore_error, seen):
+# A wildcard is a name enclosed in braces (see subst_wildcards).
+_WILDCARD_RE = re.compile(r"{([A-Za-z0-9\_]+)}")
+
+# Output of the commands run with eval_cmd, keyed by the command. Commands are
+# assumed to produce the same output for the duration of a dvsim invocation.
+_EVAL_CMD_CACHE = {}
+
+# Memoized results of subst_wildcards (see _subst_memo_get).
+_SUBST_MEMO = {}
+
+# Bound on the number of entries in _SUBST_MEMO, beyond which it is flushed.
+_SUBST_MEMO_MAX = 1 << 16
+
+
+def _lookup_wildcard(name, mdict, deps):
+    '''Look up the value of a wildcard in mdict, or else in the environment.
+
+    If deps is not None, the lookup is recorded in it as a tuple (name,
+    mdict_value, env_value) so that a memoized expansion can later be checked
+    for validity (see _subst_memo_get).
+
+    '''
+    value = mdict.get(name)
+    env_value = None
+    if value is None:
+        env_value = os.environ.get(name)
+    if deps is not None:
+        # Lists are copied since they may be updated in place later on.
+        recorded = list(value) if type(value) is list else value
+        deps.append((name, recorded, env_value))
+    return value if value is not None else env_value
+
+
+def _eval_cmd(cmd):
+    '''Run cmd for an eval_cmd wildcard, caching its output'''
+    output = _EVAL_CMD_CACHE.get(cmd)
+    if output is None:
+        output = run_cmd(cmd)
+        _EVAL_CMD_CACHE[cmd] = output
+    return output
+
+
+def _subst_wildcards(var, mdict, ignored, ignore_error, seen, deps=None):
     '''Worker function for subst_wildcards
 
     seen is a list of wildcards that have been expanded on the way to this call
-    (used for spotting circular recursion).
+    (used for spotting circular recursion). If deps is not None, each lookup
+    of a wildcard value is appended to it (see _lookup_wildcard).
 
     Returns (expanded, seen_err) where expanded is the new value of the string
     and seen_err is true if we stopped early because of an ignored error.
 
     '''
-    wildcard_re = re.compile(r"{([A-Za-z0-9\_]+)}")
+    # Fast path: most strings contain no wildcards at all.
+    if '{' not in var:
+        return (var, False)
 
     # Work from left to right, expanding each wildcard we find. idx is where we
     # should start searching (so that we don't keep finding a wildcard that
@@ -136,8 +186,7 @@ def _subst_wildcards(var, mdict, ignored, ignore_error, seen):
     any_err = False
 
     while True:
-        right_str = var[idx:]
-        match = wildcard_re.search(right_str)
+        match = _WILDCARD_RE.search(var, idx)
 
         # If no match, we're done.
         if match is None:
@@ -147,7 +196,7 @@ def _subst_wildcards(var, mdict, ignored, ignore_error, seen):
 
         # If the name should be ignored, skip over it.
         if name in ignored:
-            idx += match.end()
+            idx = match.end()
             continue
 
         # If the name has been seen already, we've spotted circular recursion.
@@ -158,14 +207,14 @@ def _subst_wildcards(var, mdict, ignored, ignore_error, seen):
 
         # Treat eval_cmd specially
         if name == 'eval_cmd':
-            cmd = _subst_wildcards(right_str[match.end():], mdict, ignored,
-                                   ignore_error, seen)[0]
+            cmd = _subst_wildcards(var[match.end():], mdict, ignored,
+                                   ignore_error, seen, deps)[0]
 
             # Are there any wildcards left in cmd? If not, we can run the
             # command and we're done.
-            cmd_matches = list(wildcard_re.finditer(cmd))
+            cmd_matches = list(_WILDCARD_RE.finditer(cmd))
             if not cmd_matches:
-                var = var[:match.start()] + run_cmd(cmd)
+                var = var[:match.start()] + _eval_cmd(cmd)
                 continue
 
             # Otherwise, check that each of them is ignored, or that
@@ -185,19 +234,15 @@ def _subst_wildcards(var, mdict, ignored, ignore_error, seen):
             # don't want to report an error either because ignore_error is true
             # or because each wildcard that's left is ignored. Return the
             # partially evaluated version.
-            return (var[:idx] + right_str[:match.end()] + cmd, True)
+            return (var[:match.end()] + cmd, True)
 
-        # Otherwise, look up name in mdict.
-        value = mdict.get(name)
-
-        # If the value isn't set, check the environment
-        if value is None:
-            value = os.environ.get(name)
+        # Otherwise, look up name in mdict (or the environment).
+        value = _lookup_wildcard(name, mdict, deps)
 
         if value is None:
             # Ignore missing values if ignore_error is True.
             if ignore_error:
-                idx += match.end()
+                idx = match.end()
                 continue
 
             raise ValueError('String to be expanded contains '
@@ -208,15 +253,45 @@ def _subst_wildcards(var, mdict, ignored, ignore_error, seen):
         # Do any recursive expansion of value, adding name to seen (to avoid
         # circular recursion).
         value, saw_err = _subst_wildcards(value, mdict, ignored, ignore_error,
-                                          seen + [name])
+                                          seen + [name], deps)
 
         # Replace the original match with the result and go around again. If
         # saw_err, increment idx past what we just inserted.
-        var = (var[:idx] + right_str[:match.start()] + value +
-               right_str[match.end():])
+        var = var[:match.start()] + value + var[match.end():]
         if saw_err:
             any_err = True
-            idx += match.start() + len(value)
+            idx = match.start() + len(value)
+
+
+def _subst_memo_get(key, mdict):
+    '''Return the memoized expansion for key, or None if not valid.
+
+    Each memoized expansion is stored along with the wildcard lookups made to
+    compute it. The expansion only depends on those (eval_cmd output aside,
+    which is cached separately), so it is still valid for mdict if every
+    wildcard looks up to the same value again. This holds across different
+    dictionaries and across updates to the same one (such as the in-place
+    substitution done by find_and_substitute_wildcards).
+
+    '''
+    entry = _SUBST_MEMO.get(key)
+    if entry is None:
+        return None
+
+    result, deps = entry
+    for name, value, env_value in deps:
+        mdict_value = mdict.get(name)
+        if mdict_value != value:
+            return None
+        if value is None and os.environ.get(name) != env_value:
+            return None
+    return result
+
+
+def _subst_memo_set(key, result, deps):
+    if len(_SUBST_MEMO) >= _SUBST_MEMO_MAX:
+        _SUBST_MEMO.clear()
+    _SUBST_MEMO[key] = (result, deps)
 
 
 def subst_wildcards(var, mdict, ignored_wildcards=[], ignore_error=False):
@@ -285,13 +360,27 @@ def subst_wildcards(var, mdict, ignored_wildcards=[], ignore_error=False):
     not a good idea to use.
 
     '''
+    # Expansions are memoized (see _subst_memo_get), which matters since the
+    # same strings are expanded for every test and reseed.
+    if '{' not in var:
+        return var
+
+    key = (var, tuple(ignored_wildcards), ignore_error)
+    result = _subst_memo_get(key, mdict)
+    if result is not None:
+        return result
+
+    deps = []
     try:
-        return _subst_wildcards(var, mdict, ignored_wildcards, ignore_error,
-                                [])[0]
+        result = _subst_wildcards(var, mdict, ignored_wildcards, ignore_error,
+                                  [], deps)[0]
     except ValueError as err:
         log.error(str(err))
         sys.exit(1)
 
+    _subst_memo_set(key, result, deps)
+    return result
+
 
 def find_and_substitute_wildcards(sub_dict,
                                   full_dict,
@@ -301,34 +390,36 @@ def find_and_substitute_wildcards(sub_dict,
     Recursively find key values containing wildcards in sub_dict in full_dict
     and return resolved sub_dict.
     '''
-    for key in sub_dict.keys():
-        if type(sub_dict[key]) in [dict, OrderedDict]:
+    for key, value in sub_dict.items():
+        value_type = type(value)
+        if value_type is str:
+            sub_dict[key] = subst_wildcards(value, full_dict,
+                                            ignored_wildcards, ignore_error)
+
+        elif value_type in [dict, OrderedDict]:
             # Recursively call this funciton in sub-dicts
             sub_dict[key] = find_and_substitute_wildcards(
-                sub_dict[key], full_dict, ignored_wildcards, ignore_error)
+                value, full_dict, ignored_wildcards, ignore_error)
 
-        elif type(sub_dict[key]) is list:
-            sub_dict_key_values = list(sub_dict[key])
+        elif value_type is list:
+            sub_dict_key_values = list(value)
             # Loop through the list of key's values and substitute each var
             # in case it contains a wildcard
-            for i in range(len(sub_dict_key_values)):
-                if type(sub_dict_key_values[i]) in [dict, OrderedDict]:
+            for i, item in enumerate(sub_dict_key_values):
+                item_type = type(item)
+                if item_type is str:
+                    sub_dict_key_values[i] = subst_wildcards(
+                        item, full_dict, ignored_wildcards, ignore_error)
+
+                elif item_type in [dict, OrderedDict]:
                     # Recursively call this funciton in sub-dicts
                     sub_dict_key_values[i] = \
-                        find_and_substitute_wildcards(sub_dict_key_values[i],
-                                                      full_dict, ignored_wildcards, ignore_error)
-
-                elif type(sub_dict_key_values[i]) is str:
-                    sub_dict_key_values[i] = subst_wildcards(
-                        sub_dict_key_values[i], full_dict, ignored_wildcards,
-                        ignore_error)
+                        find_and_substitute_wildcards(item, full_dict,
+                                                      ignored_wildcards,
+                                                      ignore_error)
 
             # Set the substituted key values back
             sub_dict[key] = sub_dict_key_values
-
-        elif type(sub_dict[key]) is str:
-            sub_dict[key] = subst_wildcards(sub_dict[key], full_dict,
-                                            ignored_wildcards, ignore_error)
     return sub_dict
 
 
@@ -558,6 +649,23 @@ def rm_path(path, ignore_error=False):
             raise exc
 
 
+def open_log(path):
+    '''Opens a log for reading, as text.
+
+    If the log is not found, its gzip-compressed version (path + ".gz") is
+    opened instead, if there is one.
+    '''
+    try:
+        return open(path, "r", encoding="UTF-8", errors="surrogateescape")
+    except FileNotFoundError:
+        if not os.path.exists(str(path) + ".gz"):
+            raise
+    return gzip.open(str(path) + ".gz",
+                     "rt",
+                     encoding="UTF-8",
+                     errors="surrogateescape")
+
+
 def mk_path(path):
     '''Create the specified path if it does not exist.
 
@@ -587,14 +695,15 @@ def mk_symlink(path, link):
             rm_path(link)
 
 
-def clean_odirs(odir, max_odirs, ts_format=TS_FORMAT):
+def clean_odirs(odir, max_odirs, ts_format=TS_FORMAT, reaper=None):
     """Clean previous output directories.
 
     When running jobs, we may want to maintain a limited history of
     previous invocations. This method finds and deletes the output
     directories at the base of input arg 'odir' with the oldest timestamps,
     if that limit is reached. It returns a list of directories that
-    remain after deletion.
+    remain after deletion. If 'reaper' (a Reaper object) is given, the
+    directories are deleted by it in the background.
     """
 
     odir = Path(odir)
@@ -619,7 +728,10 @@ def clean_odirs(odir, max_odirs, ts_format=TS_FORMAT):
                   reverse=True)
 
     for old in dirs[max(0, max_odirs - 1):]:
-        shutil.rmtree(old, ignore_errors=True)
+        if reaper is not None:
+            reaper.remove(old)
+        else:
+            shutil.rmtree(old, ignore_errors=True)
 
     return [] if max_odirs == 0 else dirs[:max_odirs - 1]
 
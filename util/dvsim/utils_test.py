@@ -78,3 +78,27 @@ def test_subst_wildcards():
                                 'bar': 'q',
                                 'p_xyz_q': 'baz'
                             }) == 'baz')
+
+
+def test_subst_wildcards_memo():
+    '''Check that memoized expansions track the values they depend on.'''
+    mdict = {'a': '{b} {c}', 'b': 'bee', 'c': ['x', 'y']}
+    assert subst_wildcards('{a}', mdict) == 'bee x y'
+    assert subst_wildcards('{a}', mdict) == 'bee x y'
+
+    # Updating any value that was looked up invalidates the expansion,
+    # including lists updated in place.
+    mdict['b'] = 'buzz'
+    assert subst_wildcards('{a}', mdict) == 'buzz x y'
+    mdict['c'].append('z')
+    assert subst_wildcards('{a}', mdict) == 'buzz x y z'
+
+    # An expansion is reused with a different dict holding the same values.
+    assert subst_wildcards('{a}', dict(mdict)) == 'buzz x y z'
+
+    # Values that were missing from the dict are looked up again too.
+    assert (subst_wildcards('{d} {b}', mdict, ignore_error=True) ==
+            '{d} buzz')
+    mdict['d'] = 'dee'
+    assert (subst_wildcards('{d} {b}', mdict, ignore_error=True) ==
+            'dee buzz')
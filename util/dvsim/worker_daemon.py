@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+r"""
+A local worker pool that runs dvsim jobs on behalf of one or more dvsim
+invocations on the same host.
+
+The daemon listens on a Unix domain socket. Each dvsim invocation using the
+socket launcher (DVSIM_LAUNCHER=socket) connects to it, sends its environment
+once, and then sends one message per job to run. The daemon runs at most
+--max-parallel jobs at a time across all the connected invocations (picking
+queued jobs from each of them in turn) and sends an event back to the
+invocation as each job completes.
+
+The daemon is normally started by dvsim on first use, and exits by itself once
+it has been idle for --idle-timeout seconds.
+
+The protocol consists of JSON objects, one per line. The client sends:
+
+  {"op": "hello", "env": {...}, "cwd": "..."}
+  {"op": "run", "id": N, "cmd": "...", "exports": {...}, "log": "...",
+   "env_vars": "...", "timeout": SECS or null}
+  {"op": "kill", "id": N}
+
+and the daemon replies with, for each job:
+
+  {"event": "done", "id": N, "exit_code": N, "killed": BOOL,
+   "timed_out": BOOL, "runtime": SECS, "error": "..." or null}
+"""
+
+import argparse
+import json
+import logging as log
+import os
+import selectors
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict, deque
+
+# Seconds to wait for a job to exit after SIGTERM, before sending it SIGKILL.
+KILL_GRACE_SECS = 2
+
+
+def default_socket_path():
+    '''Returns the path of the socket of the daemon for the current user.
+
+    This can be overridden with the DVSIM_WORKER_SOCKET environment variable.
+    '''
+    return os.environ.get(
+        "DVSIM_WORKER_SOCKET",
+        os.path.join(tempfile.gettempdir(),
+                     "dvsim-worker-{}.sock".format(os.getuid())))
+
+
+def encode_msg(msg):
+    '''Encodes a message of the protocol as a line of JSON.'''
+    return (json.dumps(msg) + "\n").encode("utf-8")
+
+
+def decode_msgs(buf):
+    '''Decodes the complete messages in buf.
+
+    Returns a tuple (msgs, rest) where rest is the trailing partial line.
+    '''
+    *lines, rest = buf.split(b"\n")
+    return [json.loads(line) for line in lines if line], rest
+
+
+class Job:
+    '''A job sent by a client, queued or running.'''
+
+    def __init__(self, client, msg):
+        self.client = client
+        self.id = msg["id"]
+        self.cmd = msg["cmd"]
+        self.exports = msg.get("exports") or {}
+        self.log_path = msg["log"]
+        self.env_vars_path = msg.get("env_vars")
+        self.timeout = msg.get("timeout")
+
+        self.process = None
+        self.start_time = None
+        self.kill_time = None
+        self.killed = False
+        self.timed_out = False
+
+    def start(self):
+        '''Starts the job, in the environment of its client.
+
+        The environment is the one the client sent on connecting, updated
+        with the job's exports, so the client does not need to copy its
+        environment for each job.
+        '''
+        env = dict(self.client.env)
+        env.update(self.exports)
+
+        # As in LocalLauncher, the job's command is logically a top-level
+        # invocation of make.
+        env.pop("MAKEFLAGS", None)
+
+        if self.env_vars_path:
+            with open(self.env_vars_path,
+                      "w",
+                      encoding="UTF-8",
+                      errors="surrogateescape") as f:
+                for var in sorted(env.keys()):
+                    f.write("{}={}\n".format(var, env[var]))
+
+        with open(self.log_path,
+                  "w",
+                  encoding="UTF-8",
+                  errors="surrogateescape") as f:
+            f.write("[Executing]:\n{}\n\n".format(self.cmd))
+            f.flush()
+            self.start_time = time.monotonic()
+            self.process = subprocess.Popen(shlex.split(self.cmd),
+                                            stdin=subprocess.DEVNULL,
+                                            stdout=f,
+                                            stderr=f,
+                                            cwd=self.client.cwd,
+                                            env=env)
+
+    def kill(self):
+        '''Sends SIGTERM to the job. It gets SIGKILL later if need be.'''
+        if self.process is not None and self.kill_time is None:
+            self.process.terminate()
+            self.kill_time = time.monotonic()
+
+
+class Client:
+    '''A connection from a dvsim invocation.'''
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.env = dict(os.environ)
+        self.cwd = None
+        self.inbuf = b""
+        self.outbuf = b""
+
+        # Queued jobs, in the order they were sent.
+        self.queue = deque()
+
+
+class WorkerDaemon:
+    '''A pool of workers running jobs sent over a Unix domain socket.'''
+
+    def __init__(self, socket_path, max_parallel, idle_timeout):
+        self.socket_path = socket_path
+        self.max_parallel = max_parallel
+        self.idle_timeout = idle_timeout
+
+        self.sel = selectors.DefaultSelector()
+        self.listener = None
+
+        # Connected clients, in the order in which they are served.
+        self.clients = OrderedDict()
+
+        # Running jobs, keyed by (client, id).
+        self.running = {}
+
+        self.last_busy = time.monotonic()
+
+    def serve(self):
+        '''Serves clients until the daemon has been idle long enough.'''
+        self._listen()
+        try:
+            while not self._is_idle():
+                timeout = 0.05 if self.running else 1
+                for key, mask in self.sel.select(timeout):
+                    if key.fileobj is self.listener:
+                        self._accept()
+                    else:
+                        if mask & selectors.EVENT_READ:
+                            self._read(key.data)
+                        # The client may have gone away while reading.
+                        if (mask & selectors.EVENT_WRITE and
+                                key.data.sock in self.clients):
+                            self._write(key.data)
+                self._reap()
+                self._dispatch()
+        finally:
+            for job in list(self.running.values()):
+                job.kill()
+            self.listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        log.info("Exiting after %d seconds idle.", self.idle_timeout)
+
+    def _listen(self):
+        # A socket file left behind by a daemon that died is removed, but not
+        # one that a live daemon is listening on.
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                log.error("A worker daemon is already listening on %s.",
+                          self.socket_path)
+                sys.exit(1)
+            finally:
+                probe.close()
+
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            self.listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.sel.register(self.listener, selectors.EVENT_READ)
+        log.info("Listening on %s with %d workers.", self.socket_path,
+                 self.max_parallel)
+
+    def _is_idle(self):
+        if self.clients or self.running:
+            self.last_busy = time.monotonic()
+            return False
+        return time.monotonic() - self.last_busy > self.idle_timeout
+
+    def _accept(self):
+        sock, _ = self.listener.accept()
+        sock.setblocking(False)
+        client = Client(sock)
+        self.clients[sock] = client
+        self.sel.register(sock, selectors.EVENT_READ, client)
+
+    def _disconnect(self, client):
+        '''Drops a client that went away, along with its jobs.
+
+        Does nothing if the client was already dropped.
+        '''
+        if client.sock not in self.clients:
+            return
+        self.sel.unregister(client.sock)
+        client.sock.close()
+        del self.clients[client.sock]
+        for job in self.running.values():
+            if job.client is client:
+                job.kill()
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(1 << 16)
+        except OSError:
+            data = b""
+        if not data:
+            self._disconnect(client)
+            return
+
+        msgs, client.inbuf = decode_msgs(client.inbuf + data)
+        for msg in msgs:
+            op = msg.get("op")
+            if op == "hello":
+                client.env = msg["env"]
+                client.cwd = msg.get("cwd")
+            elif op == "run":
+                client.queue.append(Job(client, msg))
+            elif op == "kill":
+                self._kill(client, msg["id"])
+
+    def _send(self, client, msg):
+        if client.sock not in self.clients:
+            return
+        client.outbuf += encode_msg(msg)
+        self._write(client)
+
+    def _write(self, client):
+        try:
+            sent = client.sock.send(client.outbuf)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._disconnect(client)
+            return
+        client.outbuf = client.outbuf[sent:]
+        events = selectors.EVENT_READ
+        if client.outbuf:
+            events |= selectors.EVENT_WRITE
+        self.sel.modify(client.sock, events, client)
+
+    def _kill(self, client, job_id):
+        '''Kills a job of the client.
+
+        The "done" event of a running job is sent once it exits. Otherwise,
+        whether the job is still queued or unknown (it finished already, or
+        was never sent), the event is sent right away, as the client waits
+        for it.
+        '''
+        job = self.running.get((client, job_id))
+        if job is not None:
+            job.killed = True
+            job.kill()
+            return
+
+        for job in client.queue:
+            if job.id == job_id:
+                client.queue.remove(job)
+                break
+
+        self._send(client, {
+            "event": "done",
+            "id": job_id,
+            "exit_code": None,
+            "killed": True,
+            "timed_out": False,
+            "runtime": 0,
+            "error": None,
+        })
+
+    def _dispatch(self):
+        '''Starts queued jobs, taking one from each client in turn.'''
+        while len(self.running) < self.max_parallel:
+            client = next((c for c in self.clients.values() if c.queue), None)
+            if client is None:
+                return
+
+            # Move the client to the back of the line.
+            self.clients.move_to_end(client.sock)
+            job = client.queue.popleft()
+            try:
+                job.start()
+            except (OSError, ValueError, subprocess.SubprocessError) as e:
+                self._send(client, {
+                    "event": "done",
+                    "id": job.id,
+                    "exit_code": None,
+                    "killed": False,
+                    "timed_out": False,
+                    "runtime": 0,
+                    "error": str(e),
+                })
+                continue
+            self.running[(client, job.id)] = job
+
+    def _reap(self):
+        '''Reports the jobs that exited and enforces timeouts.'''
+        now = time.monotonic()
+        for key, job in list(self.running.items()):
+            exit_code = job.process.poll()
+            runtime = now - job.start_time
+            if exit_code is None:
+                if job.kill_time is not None:
+                    if now - job.kill_time > KILL_GRACE_SECS:
+                        job.process.kill()
+                elif job.timeout and runtime > job.timeout:
+                    job.timed_out = True
+                    job.kill()
+                continue
+
+            del self.running[key]
+            self._send(job.client, {
+                "event": "done",
+                "id": job.id,
+                "exit_code": exit_code,
+                "killed": job.killed,
+                "timed_out": job.timed_out,
+                "runtime": runtime,
+                "error": None,
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket",
+                        default=default_socket_path(),
+                        metavar="PATH",
+                        help=("Path of the Unix domain socket to listen on "
+                              "(default: %(default)s)."))
+    parser.add_argument("--max-parallel",
+                        type=int,
+                        default=16,
+                        metavar="N",
+                        help=("Run up to N jobs at a time, across all clients "
+                              "(default: %(default)s)."))
+    parser.add_argument("--idle-timeout",
+                        type=int,
+                        default=600,
+                        metavar="SECS",
+                        help=("Exit after SECS seconds without clients or "
+                              "jobs (default: %(default)s)."))
+    args = parser.parse_args()
+
+    log.basicConfig(format="%(asctime)s %(levelname)s: %(message)s",
+                    level=log.INFO)
+
+    # Exit cleanly (killing the running jobs and removing the socket) on
+    # SIGTERM, as on SIGINT.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    try:
+        WorkerDaemon(args.socket, args.max_parallel, args.idle_timeout).serve()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+'''pytest-based testing for the worker daemon and the socket launcher'''
+
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# The dvsim modules import each other as top-level modules.
+sys.path.insert(0, str(Path(__file__).parent))
+
+import worker_daemon  # noqa: E402
+from Launcher import LauncherError  # noqa: E402
+from SocketLauncher import SocketLauncher, WorkerConnection  # noqa: E402
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    '''Runs a worker daemon in a thread, listening on a socket in tmp_path.'''
+    path = str(tmp_path / 'worker.sock')
+    daemon = worker_daemon.WorkerDaemon(path, max_parallel=2, idle_timeout=1)
+    thread = threading.Thread(target=daemon.serve, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield daemon
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def connect(daemon, tmp_path):
+    '''Connects a client to the daemon, as SocketLauncher does.'''
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(daemon.socket_path)
+    conn = WorkerConnection(sock)
+    conn.send({'op': 'hello', 'env': dict(os.environ), 'cwd': str(tmp_path)})
+    return conn
+
+
+def run(conn, tmp_path, job_id, cmd):
+    conn.send({
+        'op': 'run',
+        'id': job_id,
+        'cmd': cmd,
+        'exports': {},
+        'log': str(tmp_path / 'job{}.log'.format(job_id)),
+        'env_vars': None,
+        'timeout': None,
+    })
+
+
+def wait(conn, job_id):
+    '''Returns the "done" event of job job_id.'''
+    deadline = time.monotonic() + 10
+    while job_id not in conn.done:
+        assert time.monotonic() < deadline
+        conn.pump(block=True, timeout=1)
+    return conn.done.pop(job_id)
+
+
+def test_run_and_kill(daemon, tmp_path):
+    conn = connect(daemon, tmp_path)
+
+    run(conn, tmp_path, 0, 'true')
+    run(conn, tmp_path, 1, 'false')
+    assert wait(conn, 0)['exit_code'] == 0
+    assert wait(conn, 1)['exit_code'] == 1
+    assert (tmp_path / 'job0.log').read_text().startswith('[Executing]:')
+
+    # A running job.
+    run(conn, tmp_path, 2, 'sleep 30')
+    time.sleep(0.2)
+    conn.send({'op': 'kill', 'id': 2})
+    event = wait(conn, 2)
+    assert event['killed']
+    assert event['runtime'] < 10
+
+    # A job that was never sent, or that is already done, is acknowledged.
+    conn.send({'op': 'kill', 'id': 7})
+    assert wait(conn, 7)['killed']
+    conn.send({'op': 'kill', 'id': 0})
+    assert wait(conn, 0)['killed']
+
+    conn.sock.close()
+
+
+def test_disconnect(daemon, tmp_path):
+    conn_a = connect(daemon, tmp_path)
+    conn_b = connect(daemon, tmp_path)
+
+    run(conn_a, tmp_path, 0, 'sleep 30')
+    run(conn_b, tmp_path, 0, 'sleep 0.5')
+    time.sleep(0.2)
+
+    # The jobs of a client that goes away are killed, but not those of the
+    # other clients, which are still served.
+    conn_a.sock.close()
+    event = wait(conn_b, 0)
+    assert event['exit_code'] == 0
+    assert not event['killed']
+
+    run(conn_b, tmp_path, 1, 'true')
+    assert wait(conn_b, 1)['exit_code'] == 0
+    assert not daemon.running
+
+    conn_b.sock.close()
+
+
+def test_disconnect_twice(tmp_path):
+    daemon = worker_daemon.WorkerDaemon(str(tmp_path / 'worker.sock'), 1, 1)
+    sock, peer = socket.socketpair()
+    client = worker_daemon.Client(sock)
+    daemon.clients[sock] = client
+    daemon.sel.register(sock, worker_daemon.selectors.EVENT_READ, client)
+
+    daemon._disconnect(client)
+    daemon._disconnect(client)
+    assert not daemon.clients
+    peer.close()
+
+
+def make_launcher(job_id):
+    '''Makes a SocketLauncher, without a deploy object, that records the
+    status it is finished with.'''
+    launcher = SocketLauncher.__new__(SocketLauncher)
+    launcher.job_id = job_id
+    launcher.finished = []
+    launcher._post_finish = lambda status, err_msg: launcher.finished.append(
+        (status, err_msg.message))
+    return launcher
+
+
+def test_kill_unsent(monkeypatch):
+    # The connection must not be used.
+    monkeypatch.setattr(SocketLauncher, 'conn', None)
+    launcher = make_launcher(None)
+    launcher.kill()
+    assert launcher.finished == [('K', 'Job killed!')]
+
+
+def test_kill_no_reply(monkeypatch):
+    sock, peer = socket.socketpair()
+    monkeypatch.setattr(SocketLauncher, 'conn', WorkerConnection(sock))
+    monkeypatch.setattr(SocketLauncher, 'kill_timeout', 0.2)
+    launcher = make_launcher(3)
+    launcher.kill()
+    assert [status for status, _ in launcher.finished] == ['K']
+
+    # A lost connection is reported, but the job is still killed.
+    peer.close()
+    with pytest.raises(LauncherError):
+        SocketLauncher.conn.pump(block=True, timeout=1)
+    launcher = make_launcher(4)
+    launcher.kill()
+    assert [status for status, _ in launcher.finished] == ['K']
+    sock.close()
@@ -11,6 +11,7 @@ from pathlib import Path
 
 from ipgen import (IpBlockRenderer, IpConfig, IpTemplate, TemplateParseError,
                    TemplateRenderError)
+from reggen import output_writer
 
 
 def init_logging(verbose: bool) -> None:
@@ -35,8 +36,13 @@ def action_generate(ip_template: IpTemplate, args: argparse.Namespace) -> None:
                                    config_text, "the file passed to --config")
 
     # Render the IP template into an IP block.
+    output_writer.check_only = args.check
+    output_writer.manifest_path = args.manifest
+
     renderer = IpBlockRenderer(ip_template, ip_config)
     renderer.render(output_path, overwrite_output_dir)
+    if args.check:
+        return
 
     print(f"Wrote IP block {ip_config.instance_name!r} "
           f"from template {ip_template.name!r} to '{output_path}'.")
@@ -117,6 +123,18 @@ def main() -> int:
         action="store_true",
         help="overwrite the output directory, if it exists",
     )
+    parser_generate.add_argument(
+        "--check",
+        action="store_true",
+        help=("check that the output directory is up to date rather than "
+              "writing to it"),
+    )
+    parser_generate.add_argument(
+        "--manifest",
+        type=Path,
+        help=("write a manifest of the generated files, with their SHA-256 "
+              "digests, to this file"),
+    )
     parser_generate.add_argument(
         "--config-file",
         "-c",
@@ -142,7 +160,7 @@ def main() -> int:
             logging.error(str(e))
         return 1
 
-    return 0
+    return output_writer.finish()
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Any, Dict, Optional, Union
 
 import hjson  # type: ignore
+from reggen import hjson_loader
 from reggen.lib import check_int, check_keys, check_list, check_name, check_str
 from reggen.params import BaseParam, Params
 
@@ -138,7 +139,7 @@ class IpTemplate:
 
         # Read the template description from file.
         try:
-            tpldesc_obj = hjson.load(open(tpldesc_file, 'r'), use_decimal=True)
+            tpldesc_obj = hjson_loader.load(tpldesc_file, use_decimal=True)
         except (OSError, FileNotFoundError) as e:
             raise TemplateParseError(
                 "Unable to read template description file {!r}: {}".format(
@@ -182,14 +183,12 @@ class IpConfig:
             # same representation no matter if we load the config from
             # file, or directly pass it on to the template. Also, catch
             # encoding/decoding errors when setting the object.
-            json = hjson.dumps(obj,
-                               ensure_ascii=False,
-                               use_decimal=True,
-                               for_json=True,
-                               encoding='UTF-8')
-            obj_checked = hjson.loads(json,
-                                      use_decimal=True,
-                                      encoding='UTF-8')
+            json = hjson.dumpsJSON(obj,
+                                   ensure_ascii=False,
+                                   use_decimal=True,
+                                   for_json=True,
+                                   encoding='UTF-8')
+            obj_checked = hjson_loader.loads(json, use_decimal=True)
         except TypeError as e:
             raise ValueError('{} cannot be serialized as Hjson: {}'
                              .format(what, str(e))) from None
@@ -262,7 +261,7 @@ class IpConfig:
     @classmethod
     def from_text(cls, template_params: TemplateParams, txt: str, where: str) -> 'IpConfig':
         """Load an IpConfig from an Hjson description in txt"""
-        raw = hjson.loads(txt, use_decimal=True, encoding="UTF-8")
+        raw = hjson_loader.loads(txt, use_decimal=True)
         return cls.from_raw(template_params, raw, where)
 
     def to_file(self, file_path: Path, header: Optional[str] = ""):
@@ -2,14 +2,14 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 
-import os
 import shutil
-import time
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Union
 import logging
 
 import reggen.gen_rtl
+from reggen import output_writer
+from reggen.template_cache import get_lookup
 from mako import exceptions as mako_exceptions  # type: ignore
 from mako.lookup import TemplateLookup as MakoTemplateLookup  # type: ignore
 from reggen.ip_block import IpBlock
@@ -47,8 +47,6 @@ class IpTemplateRendererBase:
     ip_template: IpTemplate
     ip_config: IpConfig
 
-    _lookup: Optional[MakoTemplateLookup] = None
-
     def __init__(self, ip_template: IpTemplate, ip_config: IpConfig) -> None:
         self.ip_template = ip_template
         self.ip_config = ip_config
@@ -95,18 +93,21 @@ class IpTemplateRendererBase:
         return ret
 
     def _get_mako_template_lookup(self) -> MakoTemplateLookup:
-        """ Get a Mako TemplateLookup object """
-
-        if self._lookup is None:
-            # Define the directory containing the IP template as "base"
-            # directory, allowing templates to include other templates within
-            # this directory using relative paths.
-            # Use strict_undefined to throw a NameError if undefined variables
-            # are used within a template.
-            self._lookup = MakoTemplateLookup(
-                directories=[str(self.ip_template.template_path)],
-                strict_undefined=True)
-        return self._lookup
+        """ Get a Mako TemplateLookup object
+
+        The lookup is shared by all renderers of the same IP template, so
+        that each template is only compiled once for all the instances of
+        the IP template, and the compiled templates are kept in the reggen
+        cache directory across runs (see reggen.template_cache).
+        """
+
+        # Define the directory containing the IP template as "base"
+        # directory, allowing templates to include other templates within
+        # this directory using relative paths.
+        # Use strict_undefined to throw a NameError if undefined variables
+        # are used within a template.
+        return get_lookup([str(self.ip_template.template_path)],
+                          strict_undefined=True)
 
     def _tplfunc_instance_vlnv(self, template_vlnv_str: str) -> str:
         template_vlnv = template_vlnv_str.split(':')
@@ -240,13 +241,14 @@ class IpBlockRenderer(IpTemplateRendererBase):
                 "Output directory '{}' exists and should not be overwritten.".
                 format(output_dir))
 
-        # Prepare the IP directory in a staging area to later atomically move it
-        # to the final destination.
+        # Prepare the IP directory in a staging area to later copy it to the
+        # final destination.
         output_dir_staging = output_dir.parent / f".~{output_dir.stem}.staging"
         if output_dir_staging.is_dir():
             raise TemplateRenderError(
                 "Output staging directory '{}' already exists. Remove it and "
                 "try again.".format(output_dir_staging))
+        output_writer.add_scratch_dir(output_dir_staging)
 
         template_path = self.ip_template.template_path
 
@@ -304,37 +306,12 @@ class IpBlockRenderer(IpTemplateRendererBase):
                 'data/{}.ipconfig.hjson'.format(self.ip_config.instance_name),
                 header=_HJSON_LICENSE_HEADER)
 
-            # Safely overwrite the existing directory if necessary:
-            #
-            # - First move the existing directory out of the way.
-            # - Then move the staging directory with the new content in place.
-            # - Finally remove the old directory.
-            #
-            # If anything goes wrong in the meantime we are left with either
-            # the old or the new directory, and potentially some backups of
-            # outdated files.
-            do_overwrite = overwrite_output_dir and output_dir.exists()
-            output_dir_existing_bak = output_dir.with_suffix(
-                '.bak~' + str(int(time.time())))
-            if do_overwrite:
-                os.rename(output_dir, output_dir_existing_bak)
-
-            # Move the staging directory to the final destination.
-            os.rename(output_dir_staging, output_dir)
-
-            # Remove the old/"overwritten" data.
-            if do_overwrite:
-                try:
-                    shutil.rmtree(output_dir_existing_bak)
-                except Exception as e:
-                    msg = (
-                        'Unable to delete the backup directory '
-                        f'{output_dir_existing_bak} of the overwritten data. '
-                        'Please remove it manually.')
-                    raise TemplateRenderError(msg).with_traceback(
-                        e.__traceback__)
+            # Copy the new content to the final destination, writing only the
+            # files that changed, so that the tools building from them do not
+            # rebuild anything, and removing the files that are not generated
+            # any more.
+            output_writer.sync_dir(output_dir_staging, output_dir)
 
         finally:
-            # Ensure that the staging directory is removed at the end. Ignore
-            # errors as the directory should not exist at this point actually.
+            # Ensure that the staging directory is removed at the end.
             shutil.rmtree(output_dir_staging, ignore_errors=True)
@@ -7,17 +7,19 @@ import logging as log
 import os
 import sys
 from collections import defaultdict
+from pathlib import Path
 from typing import Dict, List, Union, Optional
 
 import yaml
 
 from mako import exceptions  # type: ignore
-from mako.lookup import TemplateLookup  # type: ignore
 from pkg_resources import resource_filename
 
+from reggen import output_writer
 from reggen.ip_block import IpBlock
 from reggen.multi_register import MultiRegister
 from reggen.register import Register
+from reggen.template_cache import get_lookup
 from reggen.window import Window
 
 
@@ -106,9 +108,8 @@ def gen_core_file(outdir: str,
         },
     }
     core_file_path = os.path.join(outdir, lblock + '_ral_pkg.core')
-    with open(core_file_path, 'w') as core_file:
-        core_file.write('CAPI=2:\n')
-        yaml.dump(core_data, core_file, encoding='utf-8')
+    output_writer.write(Path(core_file_path),
+                        'CAPI=2:\n' + yaml.dump(core_data))
 
 
 def get_dv_base_names_objects(dv_base_names: List[str]) -> Dict[str, DvBaseNames]:
@@ -152,7 +153,7 @@ def get_block_base_name(dv_base_names_map: Dict[str, DvBaseNames], block: str) -
 def gen_dv(block: IpBlock, dv_base_names: List[str], outdir: str) -> int:
     '''Generate DV files for an IpBlock'''
 
-    lookup = TemplateLookup(directories=[resource_filename('reggen', '.')])
+    lookup = get_lookup([resource_filename('reggen', '.')])
     uvm_reg_tpl = lookup.get_template('uvm_reg.sv.tpl')
 
     # Generate the RAL package(s). For a device interface with no name we
@@ -176,16 +177,17 @@ def gen_dv(block: IpBlock, dv_base_names: List[str], outdir: str) -> int:
         file_name = mod_base + '_ral_pkg.sv'
         generated.append(file_name)
         reg_top_path = os.path.join(outdir, file_name)
-        with open(reg_top_path, 'w', encoding='UTF-8') as fout:
-            try:
-                fout.write(uvm_reg_tpl.render(rb=rb,
-                                              block=block,
-                                              esc_if_name=mod_base,
-                                              reg_block_path=reg_block_path,
-                                              dv_base_names=block_dv_base_names))
-            except:  # noqa F722 for template Exception handling
-                log.error(exceptions.text_error_template().render())
-                return 1
+        try:
+            output_writer.write(
+                Path(reg_top_path),
+                uvm_reg_tpl.render(rb=rb,
+                                   block=block,
+                                   esc_if_name=mod_base,
+                                   reg_block_path=reg_block_path,
+                                   dv_base_names=block_dv_base_names))
+        except:  # noqa F722 for template Exception handling
+            log.error(exceptions.text_error_template().render())
+            return 1
 
     gen_core_file(outdir, lblock, dv_base_names, generated)
     return 0
@@ -8,19 +8,20 @@
 
 import logging as log
 import os.path
+from pathlib import Path
 
 import yaml
 from mako import exceptions  # type: ignore
-from mako.template import Template  # type: ignore
 from pkg_resources import resource_filename
 
+from reggen import output_writer
 from reggen.ip_block import IpBlock
+from reggen.template_cache import get_template
 
 
 def gen_fpv(block: IpBlock, outdir: str) -> int:
     # Read Register templates
-    fpv_csr_tpl = Template(
-        filename=resource_filename('reggen', 'fpv_csr.sv.tpl'))
+    fpv_csr_tpl = get_template(resource_filename('reggen', 'fpv_csr.sv.tpl'))
 
     device_hier_paths = block.bus_interfaces.device_hier_paths
 
@@ -43,16 +44,17 @@ def gen_fpv(block: IpBlock, outdir: str) -> int:
         filename = mod_name + '.sv'
         generated.append(filename)
         reg_top_path = os.path.join(outdir, filename)
-        with open(reg_top_path, 'w', encoding='UTF-8') as fout:
-            try:
-                fout.write(fpv_csr_tpl.render(block=block,
-                                              reg_block_path=reg_block_path,
-                                              mod_base=mod_base,
-                                              if_name=if_name,
-                                              rb=rb))
-            except:  # noqa F722 for template Exception handling
-                log.error(exceptions.text_error_template().render())
-                return 1
+        try:
+            output_writer.write(
+                Path(reg_top_path),
+                fpv_csr_tpl.render(block=block,
+                                   reg_block_path=reg_block_path,
+                                   mod_base=mod_base,
+                                   if_name=if_name,
+                                   rb=rb))
+        except:  # noqa F722 for template Exception handling
+            log.error(exceptions.text_error_template().render())
+            return 1
 
     # Generate a fusesoc core file that points at the files we've just
     # generated.
@@ -77,8 +79,7 @@ def gen_fpv(block: IpBlock, outdir: str) -> int:
         },
     }
     core_file_path = os.path.join(outdir, lblock + '_csr_assert_fpv.core')
-    with open(core_file_path, 'w') as core_file:
-        core_file.write('CAPI=2:\n')
-        yaml.dump(core_data, core_file, encoding='utf-8')
+    output_writer.write(Path(core_file_path),
+                        'CAPI=2:\n' + yaml.dump(core_data))
 
     return 0
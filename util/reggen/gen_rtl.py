@@ -3,12 +3,10 @@
 # SPDX-License-Identifier: Apache-2.0
 """Generate SystemVerilog designs from IpBlock object"""
 
-import logging as log
 import os
+from pathlib import Path
 from typing import Dict, Optional, Tuple
 
-from mako import exceptions  # type: ignore
-from mako.template import Template  # type: ignore
 from pkg_resources import resource_filename
 
 from reggen.ip_block import IpBlock
@@ -16,6 +14,7 @@ from reggen.lib import check_int
 from reggen.multi_register import MultiRegister
 from reggen.reg_base import RegBase
 from reggen.register import Register
+from reggen.render_jobs import RenderJobs
 
 
 def escape_name(name: str) -> str:
@@ -92,11 +91,13 @@ def get_reg_tx_type(block: IpBlock, reg: RegBase, hw2reg: bool) -> str:
 
 
 def gen_rtl(block: IpBlock, outdir: str) -> int:
-    # Read Register templates
-    reg_top_tpl = Template(
-        filename=resource_filename('reggen', 'reg_top.sv.tpl'))
-    reg_pkg_tpl = Template(
-        filename=resource_filename('reggen', 'reg_pkg.sv.tpl'))
+    # Register templates
+    reg_top_tpl = resource_filename('reggen', 'reg_top.sv.tpl')
+    reg_pkg_tpl = resource_filename('reggen', 'reg_pkg.sv.tpl')
+
+    # The files below do not depend on each other, so they are rendered
+    # together at the end.
+    jobs = RenderJobs()
 
     # In case the generated package contains alias definitions, we add
     # the alias implementation identifier to the package name so that it
@@ -109,13 +110,8 @@ def gen_rtl(block: IpBlock, outdir: str) -> int:
     # module(s) and the block itself.
     reg_pkg_path = os.path.join(outdir, block.name.lower() + alias_impl +
                                 "_reg_pkg.sv")
-    with open(reg_pkg_path, 'w', encoding='UTF-8') as fout:
-        try:
-            fout.write(reg_pkg_tpl.render(block=block,
-                                          alias_impl=alias_impl))
-        except:  # noqa F722 for template Exception handling
-            log.error(exceptions.text_error_template().render())
-            return 1
+    jobs.add(reg_pkg_tpl, Path(reg_pkg_path), block=block,
+             alias_impl=alias_impl)
 
     # Generate the register block implementation(s). For a device interface
     # with no name we generate the register module "<block>_reg_top"
@@ -130,18 +126,14 @@ def gen_rtl(block: IpBlock, outdir: str) -> int:
 
         mod_name = mod_base + alias_impl + '_reg_top'
         reg_top_path = os.path.join(outdir, mod_name + '.sv')
-        with open(reg_top_path, 'w', encoding='UTF-8') as fout:
-            try:
-                fout.write(reg_top_tpl.render(block=block,
-                                              mod_base=mod_base,
-                                              mod_name=mod_name,
-                                              if_name=if_name,
-                                              rb=rb))
-            except:  # noqa F722 for template Exception handling
-                log.error(exceptions.text_error_template().render())
-                return 1
-
-    return 0
+        jobs.add(reg_top_tpl, Path(reg_top_path),
+                 block=block,
+                 mod_base=mod_base,
+                 mod_name=mod_name,
+                 if_name=if_name,
+                 rb=rb)
+
+    return 1 if jobs.run() else 0
 
 
 def render_param(dst_type: str, value: str) -> str:
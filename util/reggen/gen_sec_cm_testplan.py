@@ -8,10 +8,11 @@ from pathlib import Path
 
 import hjson  # type: ignore
 from mako import exceptions  # type: ignore
-from mako.lookup import TemplateLookup  # type: ignore
 from pkg_resources import resource_filename
 
+from reggen import output_writer
 from reggen.ip_block import IpBlock
+from reggen.template_cache import get_lookup
 
 
 def gen_sec_cm_testplan(block: IpBlock, outdir: str) -> int:
@@ -51,15 +52,15 @@ def gen_sec_cm_testplan(block: IpBlock, outdir: str) -> int:
 
         return 0
 
-    lookup = TemplateLookup(directories=[resource_filename('reggen', '.')])
+    lookup = get_lookup([resource_filename('reggen', '.')])
     sec_cm_testplan_tpl = lookup.get_template('sec_cm_testplan.hjson.tpl')
-    with open(outfile, 'w', encoding='UTF-8') as f:
-        try:
-            f.write(
-                sec_cm_testplan_tpl.render(block=block,
-                                           block_name=block.name.lower()))
-        except:  # noqa F722 for template Exception handling
-            log.error(exceptions.text_error_template().render())
-            return 1
+    try:
+        output_writer.write(
+            outfile,
+            sec_cm_testplan_tpl.render(block=block,
+                                       block_name=block.name.lower()))
+    except:  # noqa F722 for template Exception handling
+        log.error(exceptions.text_error_template().render())
+        return 1
 
     return 0
@@ -328,6 +328,11 @@ def gen_const_interrupts(fieldout: TextIO, block: IpBlock, component: str,
 def gen_tock(block: IpBlock, outfile: TextIO, src_file: Optional[str],
              src_lic: Optional[str], src_copy: str,
              version_stamp: Dict[str, str]) -> int:
+    # Number the reserved fields of each block from 1, even when one process
+    # generates the registers of several blocks (see regtool --batch).
+    global filler_no
+    filler_no = 0
+
     rnames = block.get_rnames()
 
     paramout = io.StringIO()
@@ -0,0 +1,98 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+'''Loading of Hjson files, with a fast path for plain JSON
+
+The hjson library is written in pure Python and is much slower than the C
+parser of the json module. Every JSON document is also an Hjson document, so
+loads() first tries to parse its input as JSON and only hands it to hjson if
+that fails. Files are mostly rejected by the JSON parser at their first
+character (a comment) or key (without quotes), so trying costs next to
+nothing.
+
+The results are the same as those of hjson.loads(). In particular, hjson
+turns numbers written with a fraction or an exponent into integers if they
+are integral (and small enough), which is done here too.
+
+load() also caches the contents of each file it parses, keyed by its path,
+modification time and size, so that the scripts that read the same file in
+several places only parse it once.
+'''
+
+import json
+import os
+import pickle
+from collections import OrderedDict
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import hjson  # type: ignore
+
+# The pickled contents of the files parsed by load(), keyed by the absolute
+# path of each file and the arguments it was parsed with. Each entry also
+# holds the modification time and size of the file when it was parsed.
+_FILES = {}  # type: Dict[Tuple[str, bool, object], Tuple[Tuple, bytes]]
+
+
+def _parse_decimal(text: str) -> Union[int, Decimal]:
+    value = Decimal(text)
+    return int(value) if int(value) == value and abs(value) < 1e10 else value
+
+
+def _parse_float(text: str) -> Union[int, float]:
+    value = float(text)
+    return int(value) if int(value) == value and abs(value) < 1e10 else value
+
+
+def _reject_constant(name: str) -> None:
+    # hjson reads NaN and Infinity as strings (or not at all), so leave them
+    # to hjson.
+    raise ValueError('{} is not a JSON value'.format(name))
+
+
+def loads(text: str,
+          use_decimal: bool = False,
+          object_pairs_hook: Optional[Callable] = None) -> Any:
+    '''Parses Hjson text, like hjson.loads() with the same arguments.'''
+    if object_pairs_hook is None and not use_decimal:
+        # What hjson.loads() returns when called without arguments.
+        pairs_hook = OrderedDict  # type: Optional[Callable]
+    else:
+        pairs_hook = object_pairs_hook
+    try:
+        return json.loads(text,
+                          parse_float=(_parse_decimal
+                                       if use_decimal else _parse_float),
+                          parse_constant=_reject_constant,
+                          object_pairs_hook=pairs_hook)
+    except (ValueError, OverflowError):
+        pass
+    return hjson.loads(text,
+                       use_decimal=use_decimal,
+                       object_pairs_hook=object_pairs_hook)
+
+
+def load(path: Union[str, Path],
+         use_decimal: bool = False,
+         object_pairs_hook: Optional[Callable] = None) -> Any:
+    '''Parses the Hjson file at path, like loads().
+
+    A file is only parsed again if it changed since it was last parsed. Each
+    call returns a new copy of the contents, which the caller may modify.
+    '''
+    abs_path = os.path.abspath(str(path))
+    key = (abs_path, use_decimal, object_pairs_hook)
+    st = os.stat(abs_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    entry = _FILES.get(key)
+    if entry is not None and entry[0] == stamp:
+        return pickle.loads(entry[1])
+
+    with open(abs_path, 'r', encoding='utf-8') as handle:
+        obj = loads(handle.read(),
+                    use_decimal=use_decimal,
+                    object_pairs_hook=object_pairs_hook)
+    _FILES[key] = (stamp, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+    return obj
@@ -5,7 +5,7 @@
 
 from typing import Dict, List, Optional, Sequence, Set, Tuple
 
-import hjson  # type: ignore
+from reggen import hjson_loader, ip_block_cache
 from reggen.alert import Alert
 from reggen.bus_interfaces import BusInterfaces
 from reggen.clocking import Clocking, ClockingItem
@@ -392,10 +392,18 @@ class IpBlock:
                   param_defaults: List[Tuple[str, str]],
                   where: str,
                   node: str = '') -> 'IpBlock':
-        '''Load an IpBlock from an hjson description in txt'''
-        return IpBlock.from_raw(param_defaults,
-                                hjson.loads(txt, use_decimal=True), where,
-                                node)
+        '''Load an IpBlock from an hjson description in txt
+
+        Blocks are cached (see reggen.ip_block_cache), so a description that
+        was loaded before with the same arguments is not parsed again.
+        '''
+        key = ip_block_cache.get_key(txt, param_defaults, where, node)
+        block = ip_block_cache.load(key)
+        if block is None:
+            raw = hjson_loader.loads(txt, use_decimal=True)
+            block = IpBlock.from_raw(param_defaults, raw, where, node)
+            ip_block_cache.store(key, block)
+        return block
 
     @staticmethod
     def from_path(path: str, param_defaults: List[Tuple[str,
@@ -517,7 +525,8 @@ class IpBlock:
 
     def alias_from_text(self, scrub: bool, txt: str, where: str) -> None:
         '''Load alias regblocks from an hjson description in txt'''
-        self.alias_from_raw(scrub, hjson.loads(txt, use_decimal=True), where)
+        self.alias_from_raw(scrub, hjson_loader.loads(txt, use_decimal=True),
+                            where)
 
     def alias_from_path(self, scrub: bool, path: str) -> None:
         '''Load alias regblocks from an hjson description in a file at path'''
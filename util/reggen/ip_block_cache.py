@@ -0,0 +1,119 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+'''A cache of parsed and validated IP block descriptions
+
+Parsing an IP block description with the pure-Python hjson library and
+validating its registers takes tens of milliseconds per block, and the same
+descriptions are loaded again and again: by every pass of topgen, by every
+generator run from Bazel and by the scripts that read all the blocks of a
+top. Validated blocks are pickled and kept in memory for the current process
+and in a directory shared by all processes, keyed by a hash of everything
+that determines the outcome: the description, the parameter defaults and the
+source code of reggen itself (so that a change to reggen invalidates the
+cache).
+
+The cache directory is $REGGEN_CACHE_DIR if set, otherwise opentitan/reggen
+in the user cache directory ($XDG_CACHE_HOME or ~/.cache). Setting
+REGGEN_CACHE_DIR to an empty string disables the on-disk cache.
+'''
+
+import hashlib
+import logging as log
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import hjson  # type: ignore
+
+# Pickled blocks loaded or parsed by this process, by key.
+_IN_MEMORY = {}  # type: Dict[str, bytes]
+
+# A digest of the source code of reggen, computed on first use.
+_SOURCE_DIGEST = None  # type: Optional[str]
+
+
+def cache_dir() -> Optional[Path]:
+    '''Returns the on-disk cache directory, or None if it is disabled.'''
+    path = os.environ.get('REGGEN_CACHE_DIR')
+    if path is not None:
+        return Path(path) if path else None
+
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'opentitan' / 'reggen'
+
+
+def _source_digest() -> str:
+    '''Returns a digest of the code that parses and validates IP blocks.'''
+    global _SOURCE_DIGEST
+    if _SOURCE_DIGEST is None:
+        h = hashlib.sha256()
+        h.update(sys.version.encode('utf-8'))
+        h.update(hjson.__version__.encode('utf-8'))
+        for path in sorted(Path(__file__).parent.glob('*.py')):
+            h.update(path.name.encode('utf-8'))
+            h.update(path.read_bytes())
+        _SOURCE_DIGEST = h.hexdigest()
+    return _SOURCE_DIGEST
+
+
+def get_key(txt: str, param_defaults: List[Tuple[str, str]], where: str,
+            node: str) -> str:
+    '''Returns the key of the block parsed with the given arguments.'''
+    h = hashlib.sha256()
+    h.update(_source_digest().encode('utf-8'))
+    h.update(repr((param_defaults, where, node)).encode('utf-8'))
+    h.update(txt.encode('utf-8'))
+    return h.hexdigest()
+
+
+def _disk_path(root: Path, key: str) -> Path:
+    return root / key[:2] / (key + '.pickle')
+
+
+def load(key: str) -> Optional[object]:
+    '''Returns a fresh copy of the block cached under key, or None.'''
+    data = _IN_MEMORY.get(key)
+    if data is None:
+        root = cache_dir()
+        if root is None:
+            return None
+        try:
+            data = _disk_path(root, key).read_bytes()
+        except OSError:
+            return None
+
+    try:
+        block = pickle.loads(data)
+    except Exception as err:
+        log.debug('Ignoring unreadable cached IP block %s: %s', key, err)
+        return None
+    _IN_MEMORY[key] = data
+    return block
+
+
+def store(key: str, block: object) -> None:
+    '''Caches block under key, ignoring any error writing it to disk.
+
+    The block is written to a temporary file which is then renamed into
+    place, so that concurrent processes never read a partially written
+    entry.
+    '''
+    data = pickle.dumps(block, pickle.HIGHEST_PROTOCOL)
+    _IN_MEMORY[key] = data
+
+    root = cache_dir()
+    if root is None:
+        return
+    path = _disk_path(root, key)
+    tmp = path.with_name('{}.tmp.{}'.format(path.name, os.getpid()))
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except OSError as err:
+        log.debug('Failed to cache IP block in %s: %s', path, err)
@@ -0,0 +1,186 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+'''Writing of generated files, only where their contents change
+
+The code generators write their outputs through write(), which leaves the
+files whose contents did not change untouched, so that a regeneration that
+changes nothing does not make fusesoc, the simulators or Bazel rebuild
+anything. The digests of the files generated are recorded, so that the
+entry scripts can write a manifest of them (see finish()).
+
+If check_only is set, no file is written: the files are compared with what
+would have been written, and finish() reports the ones that are out of
+date. Files in scratch directories (see add_scratch_dir()) are always
+written, as the generators read some of them back, and are not recorded.
+'''
+
+import hashlib
+import io
+import json
+import logging as log
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# If set, generated files are compared with the files already there rather
+# than being written. Set from the entry scripts (--check).
+check_only = False
+
+# Where to write the manifest of the files generated, if anywhere. Set from
+# the entry scripts (--manifest).
+manifest_path = None  # type: Optional[Path]
+
+# The directories holding files generated only to be read back.
+_SCRATCH_DIRS = []  # type: List[str]
+
+# The digest of each file generated, by absolute path, and whether the file
+# did not hold these contents.
+_FILES = {}  # type: Dict[str, Tuple[str, bool]]
+
+
+def add_scratch_dir(path: Path) -> None:
+    '''Marks path as a directory of files that are always written.'''
+    _SCRATCH_DIRS.append(os.path.abspath(str(path)))
+
+
+def _is_scratch(path: str) -> bool:
+    return any(path.startswith(scratch + os.sep) for scratch in _SCRATCH_DIRS)
+
+
+def update(path: Path, data: bytes) -> bool:
+    '''Writes data to the file at path, unless it already holds it.
+
+    Does not write anything if check_only is set (outside scratch
+    directories). Returns True if the file did not hold data.
+    '''
+    try:
+        with open(path, 'rb') as handle:
+            if handle.read() == data:
+                return False
+    except OSError:
+        pass
+
+    if check_only and not _is_scratch(os.path.abspath(str(path))):
+        return True
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as handle:
+        handle.write(data)
+    return True
+
+
+def record(path: Path, digest: str, changed: bool) -> None:
+    '''Records that the contents of path, with the given digest, were
+    generated. changed is the value returned by update().'''
+    abs_path = os.path.abspath(str(path))
+    if not _is_scratch(abs_path):
+        _FILES[abs_path] = (digest, changed)
+
+
+def write(path: Path, contents: Union[str, bytes]) -> bool:
+    '''Writes a generated file, returning True if its contents changed.'''
+    data = contents.encode('utf-8') if isinstance(contents, str) else contents
+    changed = update(path, data)
+    record(path, hashlib.sha256(data).hexdigest(), changed)
+    return changed
+
+
+class OutputFile(io.StringIO):
+    '''A text file whose contents are written by write() when it is closed.
+
+    This can be used as the type of an argparse argument, in place of
+    argparse.FileType('w'), which truncates the file as soon as the command
+    line is parsed.
+    '''
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = Path(path)
+        self.name = path
+
+    def close(self) -> None:
+        if not self.closed:
+            write(self.path, self.getvalue())
+        super().close()
+
+
+def sync_dir(src: Path, dst: Path) -> None:
+    '''Makes directory dst hold the same files as directory src.
+
+    Files are written with write() and the files of dst that are not in src
+    are removed (or reported as out of date if check_only is set).
+    '''
+    src_files = {p.relative_to(src) for p in src.rglob('*') if p.is_file()}
+    for rel_path in sorted(src_files):
+        dst_path = dst / rel_path
+        new_file = not dst_path.exists()
+        write(dst_path, (src / rel_path).read_bytes())
+        if new_file and dst_path.exists():
+            shutil.copymode(str(src / rel_path), str(dst_path))
+
+    if not dst.is_dir():
+        return
+    for dst_path in sorted(dst.rglob('*'), reverse=True):
+        if dst_path.is_dir():
+            if not check_only and not any(dst_path.iterdir()):
+                dst_path.rmdir()
+        elif dst_path.relative_to(dst) not in src_files:
+            if check_only:
+                _FILES[os.path.abspath(str(dst_path))] = ('', True)
+            else:
+                dst_path.unlink()
+
+
+def take_records() -> Dict[str, Tuple[str, bool]]:
+    '''Returns the files recorded so far and forgets them.
+
+    This is for worker processes, which pass the files they generated back to
+    the main process, where add_records() records them.
+    '''
+    global _FILES
+    records, _FILES = _FILES, {}
+    return records
+
+
+def add_records(records: Dict[str, Tuple[str, bool]]) -> None:
+    '''Records files generated elsewhere, as returned by take_records().'''
+    _FILES.update(records)
+
+
+def stale_files() -> List[str]:
+    '''Returns the files that did not hold their generated contents.'''
+    return sorted(path for path, (_, changed) in _FILES.items() if changed)
+
+
+def write_manifest(path: Path) -> None:
+    '''Writes a manifest of the files generated so far to path.
+
+    The manifest maps the path of each file, relative to the directory of
+    the manifest, to the SHA-256 digest of its contents.
+    '''
+    base = os.path.dirname(os.path.abspath(str(path)))
+    files = {
+        os.path.relpath(file_path, base): digest
+        for file_path, (digest, _) in _FILES.items() if digest
+    }
+    update(path, (json.dumps({'files': files}, indent=2, sort_keys=True) +
+                  '\n').encode('utf-8'))
+
+
+def finish() -> int:
+    '''Writes the manifest and reports stale files, as set up.
+
+    Returns the exit code of the entry script: 1 if check_only is set and
+    some files are out of date, 0 otherwise.
+    '''
+    if manifest_path is not None and not check_only:
+        write_manifest(manifest_path)
+
+    if not check_only:
+        return 0
+    stale = stale_files()
+    for path in stale:
+        log.error('%s is out of date', path)
+    return 1 if stale else 0
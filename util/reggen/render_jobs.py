@@ -0,0 +1,101 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+'''Rendering of independent Mako templates to files, in parallel'''
+
+import hashlib
+import logging as log
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from mako import exceptions  # type: ignore
+
+from reggen import output_writer
+from reggen.template_cache import get_template
+
+# The jobs being run by RenderJobs.run(). The worker processes are forked
+# once this is set, so they inherit the jobs rather than having all their
+# arguments pickled and sent to them.
+_RUNNING = []  # type: List[Tuple[str, Path, Dict[str, object]]]
+
+
+def _run_job(idx: int) -> Tuple[Optional[str], str, bool]:
+    '''Runs job idx of _RUNNING.
+
+    Returns a tuple (error, digest, changed). error is the error message if
+    the template could not be rendered. Otherwise, digest and changed are
+    to be passed to output_writer.record() (in the main process, as the job
+    may run in a worker).
+    '''
+    tpl_filename, out_path, kwargs = _RUNNING[idx]
+    try:
+        contents = get_template(tpl_filename).render(**kwargs)
+    except:  # noqa: E722 for template Exception handling
+        return exceptions.text_error_template().render(), '', False
+    data = contents.encode('utf-8')
+    return (None, hashlib.sha256(data).hexdigest(),
+            output_writer.update(out_path, data))
+
+
+class RenderJobs:
+    '''A list of templates to render to files, independent of each other.
+
+    The templates are rendered by run(), in a pool of processes if there is
+    more than one job and more than one CPU. The files are written with
+    reggen.output_writer.
+    '''
+
+    # The maximum number of processes rendering templates at once. None
+    # means one per CPU; 1 renders all templates in this process.
+    max_workers = None  # type: Optional[int]
+
+    def __init__(self) -> None:
+        self._jobs = []  # type: List[Tuple[str, Path, Dict[str, object]]]
+
+    def add(self, tpl_filename: str, out_path: Path, **kwargs: object) -> None:
+        '''Adds a job rendering tpl_filename with kwargs to out_path.
+
+        The arguments are only used by run(), so they must not be modified
+        until then.
+        '''
+        self._jobs.append((str(tpl_filename), Path(out_path), kwargs))
+
+    def run(self) -> int:
+        '''Runs all the jobs added, returning the number that failed.'''
+        global _RUNNING
+        _RUNNING, self._jobs = self._jobs, []
+
+        workers = min(len(_RUNNING), self.max_workers or os.cpu_count() or 1)
+        try:
+            if workers < 2 or \
+                    'fork' not in multiprocessing.get_all_start_methods():
+                results = [_run_job(idx) for idx in range(len(_RUNNING))]
+            else:
+                # Compile each template before the workers are forked, so
+                # that they do not all compile it again. Errors are reported
+                # by the jobs.
+                for tpl_filename in {job[0] for job in _RUNNING}:
+                    try:
+                        get_template(tpl_filename)
+                    except Exception:
+                        pass
+                with ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('fork')) \
+                        as pool:
+                    results = list(pool.map(_run_job, range(len(_RUNNING))))
+
+            failed = 0
+            for (_, out_path, _), (error, digest, changed) in zip(_RUNNING,
+                                                                  results):
+                if error is None:
+                    output_writer.record(out_path, digest, changed)
+                else:
+                    log.error(error)
+                    failed += 1
+        finally:
+            _RUNNING = []
+        return failed
@@ -0,0 +1,114 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+'''Compiled Mako templates, cached in memory and on disk
+
+Compiling a Mako template to Python is often slower than rendering it, and
+the code generators render the same templates many times over: once per
+block, interface or output path. The templates returned here are compiled
+once per process. Templates read from files are also compiled to modules
+kept in the reggen cache directory (see reggen.ip_block_cache), named after
+a digest of the template, so that a template is compiled again whenever it
+changes. Mako itself only compares the modification times of the template
+and of its module to the second, and so would keep using the module of a
+template changed in the same second as the module was written.
+
+Modules compiled with different options, or for templates looked up in
+different directories, are kept in different subdirectories, so that they
+never overwrite each other.
+'''
+
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+from mako.lookup import TemplateLookup  # type: ignore
+from mako.template import Template  # type: ignore
+
+from reggen import ip_block_cache
+
+_TEMPLATES = {}  # type: Dict[Tuple, Template]
+_LOOKUPS = {}  # type: Dict[Tuple, TemplateLookup]
+
+
+def _module_directory(key: Tuple) -> Optional[str]:
+    '''Returns the directory for modules compiled for key, or None.
+
+    None means that modules should not be written to disk, because the
+    cache is disabled or the directory is not writable.
+    '''
+    root = ip_block_cache.cache_dir()
+    if root is None:
+        return None
+    digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+    path = root / 'mako' / digest[:16]
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return str(path) if os.access(str(path), os.W_OK) else None
+
+
+def _module_filename(directory: Optional[str],
+                     filename: str) -> Optional[str]:
+    '''Returns the path in directory of the module compiled from filename.
+
+    The name of the module depends on the path and the contents of the
+    template. None means that the module should not be written to disk.
+    '''
+    if directory is None:
+        return None
+    h = hashlib.sha256(filename.encode('utf-8'))
+    try:
+        with open(filename, 'rb') as f:
+            h.update(f.read())
+    except OSError:
+        return None
+    return os.path.join(directory, '{}.{}.py'.format(
+        os.path.basename(filename), h.hexdigest()[:16]))
+
+
+def get_template(filename: str, **kwargs: object) -> Template:
+    '''Returns the template in filename, compiled with the given options.'''
+    filename = os.path.abspath(filename)
+    key = (filename, tuple(sorted(kwargs.items())))
+    template = _TEMPLATES.get(key)
+    if template is None:
+        template = Template(filename=filename,
+                            module_filename=_module_filename(
+                                _module_directory(key[1:]), filename),
+                            **kwargs)
+        _TEMPLATES[key] = template
+    return template
+
+
+def get_text_template(text: str, **kwargs: object) -> Template:
+    '''Returns a template compiled from text with the given options.
+
+    These templates are only cached in memory.
+    '''
+    key = (None, text, tuple(sorted(kwargs.items())))
+    template = _TEMPLATES.get(key)
+    if template is None:
+        template = Template(text, **kwargs)
+        _TEMPLATES[key] = template
+    return template
+
+
+def get_lookup(directories: List[str], **kwargs: object) -> TemplateLookup:
+    '''Returns a lookup of the templates in directories.
+
+    The lookup compiles each of its templates once, with the given options.
+    '''
+    directories = [os.path.abspath(d) for d in directories]
+    key = (tuple(directories), tuple(sorted(kwargs.items())))
+    lookup = _LOOKUPS.get(key)
+    if lookup is None:
+        directory = _module_directory(key)
+        lookup = TemplateLookup(
+            directories=directories,
+            modulename_callable=lambda filename, uri: _module_filename(
+                directory, os.path.abspath(filename)),
+            **kwargs)
+        _LOOKUPS[key] = lookup
+    return lookup
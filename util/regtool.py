@@ -6,14 +6,20 @@ r"""Command-line tool to validate and convert register hjson
 
 """
 import argparse
+import json
 import logging as log
+import multiprocessing
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 from reggen import (
     gen_cfg_md, gen_cheader, gen_dv, gen_fpv, gen_md, gen_html, gen_json, gen_rtl,
-    gen_rust, gen_sec_cm_testplan, gen_selfdoc, gen_tock, version,
+    gen_rust, gen_sec_cm_testplan, gen_selfdoc, gen_tock, output_writer,
+    version,
 )
 from reggen.countermeasure import CounterMeasure
 from reggen.ip_block import IpBlock
@@ -23,10 +29,20 @@ DESC = """regtool, generate register info from Hjson source"""
 USAGE = '''
   regtool [options]
   regtool [options] <input>
+  regtool --batch <batch_file> [--workers N]
   regtool (-h | --help)
   regtool (-V | --version)
 '''
 
+# The jobs being run by run_batch(): for each input file, the arguments of
+# the jobs generating outputs from it. The worker processes are forked once
+# this is set, so they inherit the jobs (see reggen.render_jobs).
+_BATCH = []  # type: List[Tuple[str, List[List[str]]]]
+_BATCH_PARSER = None  # type: Optional[argparse.ArgumentParser]
+
+# The countermeasure annotations found in each RTL directory.
+_RTL_CM_NAMES = {}  # type: Dict[str, Dict[str, List[Tuple[str, int]]]]
+
 
 def main():
     verbose = 0
@@ -102,9 +118,25 @@ def main():
         'the register models are derived.')
     parser.add_argument('--outfile',
                         '-o',
-                        type=argparse.FileType('w'),
+                        type=output_writer.OutputFile,
                         default=sys.stdout,
                         help='Target filename for json, html, gfm.')
+    parser.add_argument('--check',
+                        action='store_true',
+                        help='Check that the generated files are up to date '
+                        'rather than writing them.')
+    parser.add_argument('--manifest',
+                        type=Path,
+                        help='Write a manifest of the generated files, with '
+                        'their SHA-256 digests, to this file.')
+    parser.add_argument('--batch',
+                        type=Path,
+                        help='Run the jobs listed in this JSON file, rather '
+                        'than generating from a single input.')
+    parser.add_argument('--workers',
+                        type=int,
+                        help='The number of processes running the jobs of '
+                        '--batch (default: one per CPU).')
     parser.add_argument('--verbose',
                         '-v',
                         action='store_true',
@@ -149,6 +181,9 @@ def main():
     if args.version:
         version.show_and_exit(__file__, ["Hjson", "Mako"])
 
+    output_writer.check_only = args.check
+    output_writer.manifest_path = args.manifest
+
     verbose = args.verbose
     if verbose:
         log.basicConfig(format="%(levelname)s: %(message)s", level=log.DEBUG)
@@ -157,6 +192,14 @@ def main():
     else:
         log.basicConfig(format="%(levelname)s: %(message)s")
 
+    if args.batch is not None:
+        return run_batch(parser, args.batch, args.workers)
+    return run(args)
+
+
+def run(args: argparse.Namespace) -> Optional[int]:
+    '''Generates the output selected by args, returning non-zero on error'''
+
     # Entries are triples of the form (arg, (fmt, dirspec)).
     #
     # arg is the name of the argument that selects the format. fmt is the
@@ -205,10 +248,13 @@ def main():
             log.error('The {} format expects an output file, '
                       'not an output directory.'.format(fmt))
             sys.exit(1)
+        if args.outfile is None:
+            log.error('The {} format expects an output file.'.format(fmt))
+            sys.exit(1)
 
         outfile = args.outfile
     else:
-        if args.outfile is not sys.stdout:
+        if args.outfile is not None and args.outfile is not sys.stdout:
             log.error('The {} format expects an output directory, '
                       'not an output file.'.format(fmt))
             sys.exit(1)
@@ -265,9 +311,12 @@ def main():
     # defined inside the Hjson.
     # Skip this check when generating DV code - its not needed.
     if fmt != 'dv':
-        sv_files = Path(
-            infile.name).parent.joinpath('..').joinpath('rtl').glob('*.sv')
-        rtl_names = CounterMeasure.search_rtl_files(sv_files)
+        rtl_dir = str(Path(infile.name).parent.joinpath('..').joinpath('rtl'))
+        rtl_names = _RTL_CM_NAMES.get(rtl_dir)
+        if rtl_names is None:
+            sv_files = Path(rtl_dir).glob('*.sv')
+            rtl_names = CounterMeasure.search_rtl_files(sv_files)
+            _RTL_CM_NAMES[rtl_dir] = rtl_names
         obj.check_cm_annotations(rtl_names, infile.name)
 
     if args.novalidate:
@@ -329,5 +378,111 @@ def main():
             outfile.write('\n')
 
 
+def read_batch(path: Path) -> List[Tuple[str, List[List[str]]]]:
+    '''Reads the jobs of a batch file.
+
+    The batch file is a JSON list with an entry for each input file, of the
+    form {"input": <path>, "outputs": [<args>, ...]}. Each <args> is the
+    list of regtool arguments generating one output from the input, without
+    the input itself. For example:
+
+      [{"input": "hw/ip/uart/data/uart.hjson",
+        "outputs": [["-D", "-o", "uart_regs.h"],
+                    ["-R", "-o", "uart_regs.rs"],
+                    ["-r", "-t", "uart/rtl"]]}]
+
+    Paths are relative to the current directory, as on the command line.
+    '''
+    with open(path, 'r', encoding='utf-8') as handle:
+        raw = json.load(handle)
+
+    if not isinstance(raw, list):
+        raise ValueError('{} is not a list of inputs.'.format(path))
+    jobs = []
+    for idx, entry in enumerate(raw):
+        what = 'entry {} of {}'.format(idx + 1, path)
+        if not isinstance(entry, dict) or \
+                not isinstance(entry.get('input'), str) or \
+                not isinstance(entry.get('outputs'), list):
+            raise ValueError('{} does not have an input path and a list of '
+                             'outputs.'.format(what))
+        for args in entry['outputs']:
+            if not isinstance(args, list) or \
+                    not all(isinstance(arg, str) for arg in args):
+                raise ValueError('The outputs of {} should be lists of '
+                                 'arguments.'.format(what))
+        jobs.append((entry['input'], entry['outputs']))
+    return jobs
+
+
+def _run_batch_input(idx: int) -> Tuple[int, Dict[str, Tuple[str, bool]]]:
+    '''Runs the jobs for input idx of _BATCH.
+
+    The input is only parsed once (see reggen.ip_block_cache). Returns the
+    number of jobs that failed and the files generated, which are to be
+    passed to output_writer.add_records() (in the main process, as this may
+    run in a worker).
+    '''
+    input_path, outputs = _BATCH[idx]
+    failed = 0
+    for job in outputs:
+        argv = job + [input_path]
+        try:
+            args = _BATCH_PARSER.parse_args(argv)
+            if args.batch is not None or args.workers is not None or \
+                    args.check or args.manifest is not None or args.version:
+                log.error('Job {!r} of a batch cannot use --batch, '
+                          '--workers, --check, --manifest or --version.'
+                          .format(' '.join(argv)))
+                failed += 1
+                continue
+            if run(args):
+                failed += 1
+        except SystemExit as err:
+            if err.code:
+                failed += 1
+        except Exception as err:
+            log.error('Job {!r} failed: {}'.format(' '.join(argv), err))
+            failed += 1
+    return failed, output_writer.take_records()
+
+
+def run_batch(parser: argparse.ArgumentParser, path: Path,
+              workers: Optional[int]) -> int:
+    '''Runs the jobs of the batch file at path (see read_batch()).
+
+    The jobs for each input run in turn, in a pool of processes if there is
+    more than one input and more than one worker. Returns 1 if any job
+    failed.
+    '''
+    global _BATCH, _BATCH_PARSER
+    try:
+        jobs = read_batch(path)
+    except (OSError, ValueError) as err:
+        log.error('Cannot read batch file: {}'.format(err))
+        return 1
+
+    # The outputs of a batch go to files, never to stdout.
+    parser.set_defaults(outfile=None)
+    _BATCH, _BATCH_PARSER = jobs, parser
+
+    workers = min(len(jobs), workers or os.cpu_count() or 1)
+    if workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        results = [_run_batch_input(idx) for idx in range(len(jobs))]
+    else:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(_run_batch_input, range(len(jobs))))
+
+    failed = 0
+    for job_failed, records in results:
+        failed += job_failed
+        output_writer.add_records(records)
+    if failed:
+        log.error('{} of the jobs of {} failed.'.format(failed, path))
+    return 1 if failed else 0
+
+
 if __name__ == '__main__':
-    sys.exit(main())
+    sys.exit(main() or output_writer.finish())
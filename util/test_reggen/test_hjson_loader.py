@@ -0,0 +1,135 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+
+import hjson
+from reggen import hjson_loader
+
+
+def typed(obj):
+    '''Returns obj with the type of each value next to it, for comparisons
+    that tell 1 from 1.0 and dict from OrderedDict.'''
+    if isinstance(obj, dict):
+        return (type(obj), [(k, typed(v)) for k, v in obj.items()])
+    if isinstance(obj, list):
+        return (list, [typed(v) for v in obj])
+    if isinstance(obj, Decimal):
+        return (Decimal, str(obj))
+    return (type(obj), obj)
+
+
+# Documents that are valid JSON, parsed by the fast path.
+JSON_DOCS = [
+    '{}',
+    '[]',
+    '{"a": 1, "b": [true, false, null], "c": "x"}',
+    '{"b": 1, "a": {"d": 2, "c": 3}}',
+    '[1.0, 2.5, -3.0, 0.0, -0.0, 1e3, 1E-3, 2.5e2]',
+    # Around the bound below which hjson turns integral numbers into ints.
+    '[9999999999.0, 1e10, -9999999999.0, -1e10, 1e9, 12345678901.0]',
+    '[1.5e300, 123456789012345678901234567890]',
+    '{"s": "\\u00e9\\n\\"", "u": "é"}',
+    '{"dup": 1, "dup": 2}',
+    '  {"ws": 1}  \n',
+]
+
+# Documents that are not JSON, left to hjson.
+HJSON_DOCS = [
+    '{\n  // comment\n  a: 1\n  b: quoteless string\n}\n',
+    '{\n  a: 1.0\n  b: 2.5\n}\n',
+    '[1, 2,]',
+    "{'a': 1}",
+    '# comment\n{"a": 1}',
+    '',
+]
+
+# Documents that hjson rejects.
+BAD_DOCS = ['{', '{"a": }', '{"a": NaN}', '{"a": Infinity}', '[1] [2]']
+
+
+class TestLoads(unittest.TestCase):
+    def check(self, text, **kwargs):
+        expected = hjson.loads(text, **kwargs)
+        self.assertEqual(typed(hjson_loader.loads(text, **kwargs)),
+                         typed(expected), text)
+
+    def test_same_as_hjson(self):
+        for text in JSON_DOCS + HJSON_DOCS:
+            self.check(text)
+            self.check(text, use_decimal=True)
+            self.check(text, object_pairs_hook=OrderedDict)
+            self.check(text, object_pairs_hook=dict)
+            self.check(text, use_decimal=True, object_pairs_hook=OrderedDict)
+
+    def test_fast_path(self):
+        with mock.patch.object(hjson_loader.hjson, 'loads',
+                               side_effect=AssertionError('not JSON')):
+            for text in JSON_DOCS:
+                hjson_loader.loads(text)
+                hjson_loader.loads(text, use_decimal=True)
+
+    def test_types(self):
+        # These are what hjson does, and what the fast path has to mirror.
+        self.assertIs(type(hjson_loader.loads('{"a": 1}')), OrderedDict)
+        self.assertIs(type(hjson_loader.loads('{"a": 1}', use_decimal=True)),
+                      dict)
+        self.assertEqual(typed(hjson_loader.loads('[2.0, 1e10, 2.5]')),
+                         typed([2, 1e10, 2.5]))
+        self.assertEqual(
+            typed(hjson_loader.loads('[2.0, 1e10, 2.5]', use_decimal=True)),
+            typed([2, Decimal('1E+10'), Decimal('2.5')]))
+
+    def test_errors(self):
+        for text in BAD_DOCS:
+            with self.assertRaises(hjson.HjsonDecodeError, msg=text):
+                hjson.loads(text)
+            with self.assertRaises(hjson.HjsonDecodeError, msg=text):
+                hjson_loader.loads(text)
+
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.hjson')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+    def test_copies(self):
+        self.write('{"a": [1]}')
+        obj = hjson_loader.load(self.path)
+        obj['a'].append(2)
+        self.assertEqual(hjson_loader.load(self.path), {'a': [1]})
+
+    def test_changes(self):
+        self.write('{"a": 1}')
+        self.assertEqual(hjson_loader.load(self.path), {'a': 1})
+
+        # A change in size.
+        self.write('{"a": 12}')
+        self.assertEqual(hjson_loader.load(self.path), {'a': 12})
+
+        # A change in mtime only (same size).
+        self.write('{"a": 34}')
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(hjson_loader.load(self.path), {'a': 34})
+
+    def test_arguments(self):
+        self.write('{\n  a: 1.5\n}\n')
+        self.assertEqual(typed(hjson_loader.load(self.path)),
+                         typed(OrderedDict(a=1.5)))
+        self.assertEqual(typed(hjson_loader.load(self.path,
+                                                 use_decimal=True)),
+                         typed({'a': Decimal('1.5')}))
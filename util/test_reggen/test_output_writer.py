@@ -0,0 +1,181 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from reggen import output_writer
+
+
+class OutputWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self._reset()
+
+    def tearDown(self):
+        self._reset()
+        self.tmp.cleanup()
+
+    @staticmethod
+    def _reset():
+        output_writer.check_only = False
+        output_writer.manifest_path = None
+        output_writer._SCRATCH_DIRS.clear()
+        output_writer.take_records()
+
+
+class TestWrite(OutputWriterTest):
+    def test_write(self):
+        path = self.root / 'sub' / 'out.txt'
+        self.assertTrue(output_writer.write(path, 'hello\n'))
+        self.assertEqual(path.read_text(), 'hello\n')
+
+        # Unchanged contents leave the file untouched.
+        os.utime(path, ns=(0, 0))
+        self.assertFalse(output_writer.write(path, b'hello\n'))
+        self.assertEqual(path.stat().st_mtime_ns, 0)
+
+        self.assertTrue(output_writer.write(path, 'bye\n'))
+        self.assertEqual(path.read_text(), 'bye\n')
+        self.assertEqual(output_writer.stale_files(), [str(path)])
+
+    def test_output_file(self):
+        path = self.root / 'out.txt'
+        f = output_writer.OutputFile(str(path))
+        f.write('text')
+        self.assertFalse(path.exists())
+        f.close()
+        f.close()
+        self.assertEqual(path.read_text(), 'text')
+
+    def test_records(self):
+        path = self.root / 'out.txt'
+        output_writer.write(path, 'x')
+        records = output_writer.take_records()
+        self.assertEqual(list(records), [str(path)])
+        self.assertEqual(output_writer.stale_files(), [])
+        output_writer.add_records(records)
+        self.assertEqual(output_writer.stale_files(), [str(path)])
+
+
+class TestCheck(OutputWriterTest):
+    def test_check_only(self):
+        same = self.root / 'same.txt'
+        differs = self.root / 'differs.txt'
+        missing = self.root / 'missing.txt'
+        same.write_text('a')
+        differs.write_text('a')
+        output_writer.check_only = True
+
+        self.assertFalse(output_writer.write(same, 'a'))
+        self.assertTrue(output_writer.write(differs, 'b'))
+        self.assertTrue(output_writer.write(missing, 'c'))
+
+        # Nothing was written, and the files out of date are reported.
+        self.assertEqual(differs.read_text(), 'a')
+        self.assertFalse(missing.exists())
+        self.assertEqual(output_writer.stale_files(),
+                         sorted([str(differs), str(missing)]))
+        with self.assertLogs(level='ERROR') as logs:
+            self.assertEqual(output_writer.finish(), 1)
+        self.assertEqual(len(logs.output), 2)
+
+    def test_check_up_to_date(self):
+        path = self.root / 'same.txt'
+        path.write_text('a')
+        output_writer.check_only = True
+        output_writer.write(path, 'a')
+        self.assertEqual(output_writer.finish(), 0)
+
+    def test_scratch(self):
+        scratch = self.root / 'scratch'
+        output_writer.add_scratch_dir(scratch)
+        output_writer.check_only = True
+
+        # Files in scratch directories are written, and not recorded.
+        path = scratch / 'tmp.hjson'
+        self.assertTrue(output_writer.write(path, 'x'))
+        self.assertEqual(path.read_text(), 'x')
+        self.assertEqual(output_writer.stale_files(), [])
+
+        # Other files are, even if their name starts with that of a scratch
+        # directory.
+        output_writer.write(self.root / 'scratch2', 'x')
+        self.assertEqual(output_writer.stale_files(),
+                         [str(self.root / 'scratch2')])
+
+
+class TestSyncDir(OutputWriterTest):
+    def setUp(self):
+        super().setUp()
+        self.src = self.root / 'src'
+        self.dst = self.root / 'dst'
+        (self.src / 'a').mkdir(parents=True)
+        (self.src / 'a' / 'f.txt').write_text('f')
+        (self.src / 'g.sh').write_text('g')
+        (self.src / 'g.sh').chmod(0o755)
+        (self.dst / 'old').mkdir(parents=True)
+        (self.dst / 'old' / 'h.txt').write_text('h')
+        (self.dst / 'i.txt').write_text('i')
+
+    def test_sync(self):
+        output_writer.sync_dir(self.src, self.dst)
+
+        files = sorted(str(p.relative_to(self.dst))
+                       for p in self.dst.rglob('*'))
+        self.assertEqual(files, ['a', 'a/f.txt', 'g.sh'])
+        self.assertEqual((self.dst / 'a' / 'f.txt').read_text(), 'f')
+        self.assertTrue(os.access(self.dst / 'g.sh', os.X_OK))
+
+        # Syncing again changes nothing.
+        output_writer.take_records()
+        output_writer.sync_dir(self.src, self.dst)
+        self.assertEqual(output_writer.stale_files(), [])
+
+    def test_sync_check_only(self):
+        output_writer.check_only = True
+        output_writer.sync_dir(self.src, self.dst)
+
+        # The files to write and to delete are reported, not acted upon.
+        self.assertEqual(output_writer.stale_files(), sorted([
+            str(self.dst / 'a' / 'f.txt'),
+            str(self.dst / 'g.sh'),
+            str(self.dst / 'old' / 'h.txt'),
+            str(self.dst / 'i.txt'),
+        ]))
+        self.assertTrue((self.dst / 'old' / 'h.txt').exists())
+        self.assertFalse((self.dst / 'a').exists())
+
+    def test_sync_missing_dst(self):
+        self.dst = self.root / 'new'
+        output_writer.sync_dir(self.src, self.dst)
+        self.assertEqual((self.dst / 'g.sh').read_text(), 'g')
+
+
+class TestManifest(OutputWriterTest):
+    def test_manifest(self):
+        output_writer.write(self.root / 'out' / 'a.txt', 'a')
+        output_writer.write(self.root / 'b.txt', b'b')
+        manifest = self.root / 'manifest.json'
+        output_writer.manifest_path = manifest
+        self.assertEqual(output_writer.finish(), 0)
+
+        self.assertEqual(json.loads(manifest.read_text()), {
+            'files': {
+                os.path.join('out', 'a.txt'): hashlib.sha256(b'a').hexdigest(),
+                'b.txt': hashlib.sha256(b'b').hexdigest(),
+            }
+        })
+
+    def test_no_manifest_when_checking(self):
+        manifest = self.root / 'manifest.json'
+        output_writer.manifest_path = manifest
+        output_writer.check_only = True
+        output_writer.finish()
+        self.assertFalse(manifest.exists())
@@ -0,0 +1,94 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from reggen import template_cache
+
+
+class TemplateCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.cache = self.root / 'cache'
+        self.env = mock.patch.dict(os.environ,
+                                   {'REGGEN_CACHE_DIR': str(self.cache)})
+        self.env.start()
+        self._forget()
+
+    def tearDown(self):
+        self._forget()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    @staticmethod
+    def _forget():
+        '''Drops the templates compiled in this process, as if it was a new
+        one.'''
+        template_cache._TEMPLATES.clear()
+        template_cache._LOOKUPS.clear()
+
+    def write(self, name, text, mtime):
+        path = self.root / name
+        path.write_text(text)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def modules(self):
+        return sorted(p.name for p in self.cache.rglob('*.py'))
+
+
+class TestGetTemplate(TemplateCacheTest):
+    def test_on_disk(self):
+        path = self.write('a.tpl', '${x}', 1000)
+        self.assertEqual(
+            template_cache.get_template(str(path)).render(x=1), '1')
+        self.assertEqual(len(self.modules()), 1)
+
+        # A new process uses the module compiled before.
+        self._forget()
+        self.assertEqual(
+            template_cache.get_template(str(path)).render(x=2), '2')
+        self.assertEqual(len(self.modules()), 1)
+
+    def test_changed_in_same_second(self):
+        # The template changes, but its mtime stays older than the module.
+        path = self.write('a.tpl', 'old ${x}', 1000)
+        self.assertEqual(
+            template_cache.get_template(str(path)).render(x=1), 'old 1')
+        self._forget()
+        self.write('a.tpl', 'new ${x}', 1000)
+        self.assertEqual(
+            template_cache.get_template(str(path)).render(x=1), 'new 1')
+
+    def test_options(self):
+        path = self.write('a.tpl', '${x}', 1000)
+        template_cache.get_template(str(path))
+        template_cache.get_template(str(path), strict_undefined=True)
+        self.assertEqual(len(self.modules()), 2)
+
+    def test_no_cache_dir(self):
+        os.environ['REGGEN_CACHE_DIR'] = ''
+        path = self.write('a.tpl', '${x}', 1000)
+        self.assertEqual(
+            template_cache.get_template(str(path)).render(x=1), '1')
+        self.assertFalse(self.cache.exists())
+
+
+class TestGetLookup(TemplateCacheTest):
+    def test_changed_in_same_second(self):
+        self.write('inc.tpl', 'old', 1000)
+        self.write('top.tpl', '<%include file="inc.tpl"/>', 1000)
+        lookup = template_cache.get_lookup([str(self.root)])
+        self.assertEqual(lookup.get_template('top.tpl').render(), 'old')
+        self.assertEqual(len(self.modules()), 2)
+
+        self._forget()
+        self.write('inc.tpl', 'new', 1000)
+        lookup = template_cache.get_lookup([str(self.root)])
+        self.assertEqual(lookup.get_template('top.tpl').render(), 'new')
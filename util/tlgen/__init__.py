@@ -6,8 +6,8 @@
 
 from .doc import selfdoc  # noqa: F401
 from .elaborate import elaborate  # noqa: F401
-from .generate import generate  # noqa: F401
-from .generate_tb import generate_tb  # noqa: F401
+from .generate import add_generate_jobs, generate  # noqa: F401
+from .generate_tb import add_tb_jobs, generate_tb  # noqa: F401
 from .item import Edge, Node  # noqa: F401
 from .validate import validate  # noqa: F401
 from .xbar import Xbar  # noqa: F401
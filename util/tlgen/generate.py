@@ -5,14 +5,26 @@
 """Code to generate crossbar RTL."""
 
 import logging as log
+from pathlib import Path
 from typing import Any, List, Tuple
 
 from mako import exceptions  # type: ignore
-from mako.template import Template  # type: ignore
 from pkg_resources import resource_filename
+from reggen.render_jobs import RenderJobs
+from reggen.template_cache import get_template
 
 from .xbar import Xbar
 
+# The templates of the crossbar module and the path of the file each one is
+# rendered to, relative to the directory of the crossbar, as a format string
+# taking the name of the crossbar.
+XBAR_TEMPLATES = [
+    ("xbar.rtl.sv.tpl", "rtl/autogen/xbar_{}.sv"),
+    ("xbar.pkg.sv.tpl", "rtl/autogen/tl_{}_pkg.sv"),
+    ("xbar.core.tpl", "xbar_{}.core"),
+    ("xbar.hjson.tpl", "data/autogen/xbar_{}.hjson"),
+]
+
 
 def generate(xbar: Xbar, library_name: str = "ip") -> List[Tuple[str, Any]]:
     """Create top-level crossbar module.
@@ -20,27 +32,26 @@ def generate(xbar: Xbar, library_name: str = "ip") -> List[Tuple[str, Any]]:
     This assumes that the model has been elaborated already. Returns a list of
     pairs of files to write, each in the form (path, contents).
     """
-    xbar_rtl_tpl = Template(
-        filename=resource_filename('tlgen', 'xbar.rtl.sv.tpl'))
-    xbar_pkg_tpl = Template(
-        filename=resource_filename('tlgen', 'xbar.pkg.sv.tpl'))
-    xbar_core_tpl = Template(
-        filename=resource_filename('tlgen', 'xbar.core.tpl'))
-    xbar_hjson_tpl = Template(
-        filename=resource_filename('tlgen', 'xbar.hjson.tpl'))
+    results = []
     try:
-        out_rtl = xbar_rtl_tpl.render(xbar=xbar)
-        out_pkg = xbar_pkg_tpl.render(xbar=xbar)
-        out_core = xbar_core_tpl.render(xbar=xbar,
-                                        library_name=library_name)
-        out_hjson = xbar_hjson_tpl.render(xbar=xbar)
+        for tpl_name, path_fmt in XBAR_TEMPLATES:
+            tpl = get_template(resource_filename('tlgen', tpl_name))
+            results.append((path_fmt.format(xbar.name),
+                            tpl.render(xbar=xbar, library_name=library_name)))
     except:  # noqa: E722
         log.error(exceptions.text_error_template().render())
 
-    results = []
-    results.append(("rtl/autogen/xbar_%s.sv" % (xbar.name), out_rtl))
-    results.append(("rtl/autogen/tl_%s_pkg.sv" % (xbar.name), out_pkg))
-    results.append(("xbar_%s.core" % (xbar.name), out_core))
-    results.append(("data/autogen/xbar_%s.hjson" % (xbar.name), out_hjson))
-
     return results
+
+
+def add_generate_jobs(jobs: RenderJobs, xbar: Xbar, ip_path: Path,
+                      library_name: str = "ip") -> None:
+    """Add jobs rendering the crossbar module into directory ip_path.
+
+    This is generate() for several crossbars at once: the files are rendered
+    and written by jobs.run(), together with those of the other jobs.
+    """
+    for tpl_name, path_fmt in XBAR_TEMPLATES:
+        jobs.add(resource_filename('tlgen', tpl_name),
+                 ip_path / path_fmt.format(xbar.name),
+                 xbar=xbar, library_name=library_name)
@@ -4,20 +4,23 @@
 
 """Code to generate crossbar testbench."""
 
-import logging as log
 from pathlib import Path
 
-from mako import exceptions  # type: ignore
-from mako.template import Template  # type: ignore
 from pkg_resources import resource_filename
+from reggen.render_jobs import RenderJobs
 
 from .xbar import Xbar
 
 
-def generate_tb(xbar: Xbar,
+def add_tb_jobs(jobs: RenderJobs,
+                xbar: Xbar,
                 dv_path: Path,
                 library_name: str = "ip") -> None:
-    """Generate the testbench RTL."""
+    """Add jobs rendering the testbench RTL into directory dv_path.
+
+    The files are rendered and written by jobs.run(), together with those of
+    the other jobs.
+    """
     tb_files = [
         "xbar_env_pkg__params.sv", "tb__xbar_connect.sv", "xbar.sim.core",
         "xbar.bind.core", "xbar.bind.sv", "xbar.sim_cfg.hjson",
@@ -25,7 +28,7 @@ def generate_tb(xbar: Xbar,
     ]
 
     for fname in tb_files:
-        tpl = Template(filename=resource_filename('tlgen', fname + '.tpl'))
+        tpl_filename = resource_filename('tlgen', fname + '.tpl')
 
         # some files need to be renamed
         if fname == "xbar.sim.core":
@@ -45,8 +48,17 @@ def generate_tb(xbar: Xbar,
         else:
             dv_filepath = dv_path / fname
 
-        with dv_filepath.open(mode='w', encoding='UTF-8') as fout:
-            try:
-                fout.write(tpl.render(xbar=xbar, library_name=library_name))
-            except:  # noqa: E722 for general exception handling
-                log.error(exceptions.text_error_template().render())
+        jobs.add(tpl_filename, dv_filepath,
+                 xbar=xbar, library_name=library_name)
+
+
+def generate_tb(xbar: Xbar,
+                dv_path: Path,
+                library_name: str = "ip") -> int:
+    """Generate the testbench RTL.
+
+    Returns the number of files that could not be rendered.
+    """
+    jobs = RenderJobs()
+    add_tb_jobs(jobs, xbar, dv_path, library_name)
+    return jobs.run()
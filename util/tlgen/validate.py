@@ -2,6 +2,8 @@
 # Licensed under the Apache License, Version 2.0, see LICENSE for details.
 # SPDX-License-Identifier: Apache-2.0
 import logging as log
+import math
+from bisect import bisect_right, insort
 from functools import partial
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -223,7 +225,7 @@ def mk_node(typ: str, name: str, clock: str, reset: str) -> Node:
 
 
 def checkNameExist(name: str, xbar: Xbar) -> bool:
-    return name.lower() in [x.name for x in xbar.nodes]
+    return xbar.find_node(name.lower()) is not None
 
 
 def isOverlap(range1: Tuple[int, int], range2: Tuple[int, int]) -> bool:
@@ -241,14 +243,23 @@ def isNotAligned(base: int) -> bool:
 
 def checkAddressOverlap(addr: Tuple[int, int],
                         ranges: List[Tuple[int, int]]) -> bool:
-    result = [x for x in ranges if isOverlap(x, addr)]
-    return len(result) != 0
+    """Check whether addr overlaps any of ranges.
+
+    ranges must be sorted and must not overlap each other, so only the range
+    with the highest base not above the end of addr can overlap it.
+    """
+    idx = bisect_right(ranges, (addr[1], math.inf)) - 1
+    return idx >= 0 and isOverlap(ranges[idx], addr)
 
 
 def checkAddressSpacing(addr: Tuple[int, int],
                         ranges: List[Tuple[int, int]]) -> bool:
-    result = [x for x in ranges if isNotMinSpacing(x, addr)]
-    return len(result) != 0
+    """Check whether the base of addr is too close to that of any of ranges.
+
+    ranges must be sorted.
+    """
+    idx = bisect_right(ranges, (addr[0] + MIN_DEVICE_SPACING, math.inf)) - 1
+    return idx >= 0 and isNotMinSpacing(ranges[idx], addr)
 
 
 # this returns 1 if the size mask overlapps with the address base
@@ -261,6 +272,7 @@ def validate(obj: Dict[Any, Any]) -> Optional[Xbar]:
     xbar.name = obj["name"].lower()
     xbar.clock = obj["clock"].lower()
     xbar.reset = obj["reset"].lower()
+    # The address ranges of all the devices, kept sorted by base.
     addr_ranges: List[Tuple[int, int]] = []
 
     # validate Hjson format first
@@ -345,7 +357,7 @@ def validate(obj: Dict[Any, Any]) -> Optional[Xbar]:
                         % (MIN_DEVICE_SPACING, addr_entry[0], addr_entry[1]))
                     raise SystemExit("Address overlapping error occurred")
 
-                addr_ranges.append(addr_entry)
+                insort(addr_ranges, addr_entry)
                 node.addr_range.append(addr_entry)
 
         node.pipeline = False
@@ -357,7 +369,7 @@ def validate(obj: Dict[Any, Any]) -> Optional[Xbar]:
             node.req_fifo_pass = nodeobj.get("req_fifo_pass", False)
             node.rsp_fifo_pass = nodeobj.get("rsp_fifo_pass", False)
 
-        xbar.nodes.append(node)
+        xbar.add_node(node)
 
     # Edge
     for host in obj["connections"].keys():
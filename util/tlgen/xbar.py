@@ -3,7 +3,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging as log
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from .item import Edge, Node, Host, Device, AsyncFifo, Socket1N, SocketM1
 
@@ -22,12 +22,29 @@ class Xbar:
         self.clocks: List[Any] = []
         self.resets: List[Any] = []
 
+        # The nodes by name, the names of the nodes at both ends of each
+        # edge and the device found downstream of each node by
+        # get_downstream_device(). The last two are computed again when
+        # needed after nodes are added, which rewires the edges.
+        self._nodes_by_name: Dict[str, Node] = {}
+        self._edge_names: Optional[Set[Tuple[str, str]]] = set()
+        self._downstream_devices: Dict[str, Device] = {}
+
+    def add_node(self, node: Node) -> None:
+        self.nodes.append(node)
+        self._nodes_by_name[node.name] = node
+        self._edge_names = None
+        self._downstream_devices = {}
+
+    def find_node(self, node: str) -> Optional[Node]:
+        return self._nodes_by_name.get(node)
+
     def get_node(self, node: str) -> Node:
-        result = [x for x in self.nodes if x.name == node]
-        if len(result) != 1:
+        result = self.find_node(node)
+        if result is None:
             raise  # Exception
 
-        return result[0]
+        return result
 
     @property
     def hosts(self) -> List[Host]:
@@ -45,12 +62,18 @@ class Xbar:
         if isinstance(node, Device):
             return node
 
+        device = self._downstream_devices.get(node.name)
+        if device is not None:
+            return device
+
         if len(node.ds) == 0:
             log.error(
                 "Node (%s) doesn't have downstream Node: US(%s), DS(%s)" %
                 (node.name, ' '.join(map(repr, node.us)), ' '.join(
                     map(repr, node.ds))))
-        return self.get_downstream_device(node.ds[0].ds)
+        device = self.get_downstream_device(node.ds[0].ds)
+        self._downstream_devices[node.name] = device
+        return device
 
     def get_downstream_device_from_edge(self, edge: Edge) -> Device:
         return self.get_downstream_device(edge.ds)
@@ -102,18 +125,18 @@ class Xbar:
         upNode = self.get_node(u_node)
         dnNode = self.get_node(d_node)
 
-        edge = Edge(upNode, dnNode)
-
-        if any([
-                e.us.name == edge.us.name and e.ds.name == edge.ds.name
-                for e in self.edges
-        ]):
+        if self._edge_names is None:
+            self._edge_names = {(e.us.name, e.ds.name) for e in self.edges}
+        if (upNode.name, dnNode.name) in self._edge_names:
             return False
 
+        edge = Edge(upNode, dnNode)
         self.edges.append(edge)
+        self._edge_names.add((upNode.name, dnNode.name))
 
         upNode.ds.append(edge)
         dnNode.us.append(edge)
+        self._downstream_devices = {}
 
         return True
 
@@ -125,7 +148,7 @@ class Xbar:
                 new_node.ds = node.ds
                 node.ds = [edge]
                 new_node.us = [edge]
-                self.nodes.append(new_node)
+                self.add_node(new_node)
                 self.edges.append(edge)
                 for e in new_node.ds:
                     # replace us to new_node
@@ -137,7 +160,7 @@ class Xbar:
                 new_node.ds = node.ds
                 node.us = [edge]
                 new_node.ds = [edge]
-                self.nodes.append(new_node)
+                self.add_node(new_node)
                 self.edges.append(edge)
                 for e in new_node.us:
                     # replace us to new_node
@@ -150,7 +173,7 @@ class Xbar:
             new_node.us = node.us
             node.us = [edge]
             new_node.ds = [edge]
-            self.nodes.append(new_node)
+            self.add_node(new_node)
             self.edges.append(edge)
             for e in new_node.us:
                 e.ds = new_node
@@ -162,7 +185,7 @@ class Xbar:
             node.ds = [edge]
             new_node.us = [edge]
             # TODO: add new_node.us logic
-            self.nodes.append(new_node)
+            self.add_node(new_node)
             self.edges.append(edge)
             for e in new_node.ds:
                 e.us = new_node
@@ -10,7 +10,7 @@ import shutil
 import sys
 import tempfile
 from collections import OrderedDict
-from copy import deepcopy
+from copy import copy, deepcopy
 from io import StringIO
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -21,12 +21,14 @@ import tlgen
 from ipgen import (IpBlockRenderer, IpConfig, IpDescriptionOnlyRenderer,
                    IpTemplate, TemplateRenderError)
 from mako import exceptions
-from mako.template import Template
-from reggen import access, gen_rtl, gen_sec_cm_testplan, window
+from reggen import (access, gen_rtl, gen_sec_cm_testplan, hjson_loader,
+                    output_writer, window)
 from reggen.inter_signal import InterSignal
 from reggen.ip_block import IpBlock
 from reggen.countermeasure import CounterMeasure
 from reggen.lib import check_list
+from reggen.render_jobs import RenderJobs
+from reggen.template_cache import get_template
 from topgen import get_hjsonobj_xbars
 from topgen import intermodule as im
 from topgen import lib as lib
@@ -36,8 +38,11 @@ from topgen.rust import TopGenRust
 from topgen.clocks import Clocks
 from topgen.gen_dv import gen_dv
 from topgen.gen_top_docs import gen_top_docs
-from topgen.merge import connect_clocks, create_alert_lpgs, extract_clocks
+from topgen.merge import (connect_clocks, create_alert_lpgs, extract_clocks,
+                          update_xbar_addr_ranges)
+from topgen.passes import GenerationPasses
 from topgen.resets import Resets
+from topgen.snapshot import TopSnapshot, block_interface, snapshot_path
 from topgen.top import Top
 
 # Common header for generated files
@@ -59,15 +64,19 @@ TOPGEN_TEMPLATE_PATH = Path(__file__).parent / "topgen/templates"
 
 
 def ipgen_render(template_name: str, topname: str, params: Dict,
-                 out_path: Path):
+                 out_path: Path, passes: GenerationPasses, desc_only: bool):
     """ Render an IP template for a specific toplevel using ipgen.
 
     The generated IP block is placed in the "ip_autogen" directory of the
-    toplevel.
+    toplevel. If desc_only is set, only the IP description is rendered, into
+    the data directory of the IP block.
 
     Aborts the program execution in case of an error.
     """
     module_name = params.get("module_instance_name", template_name)
+    if not passes.needs_run(module_name, not desc_only, params):
+        return
+
     instance_name = f"top_{topname}_{module_name}"
     ip_template = IpTemplate.from_template_path(
         SRCTREE_TOP / "hw/ip_templates" / template_name)
@@ -79,16 +88,22 @@ def ipgen_render(template_name: str, topname: str, params: Dict,
         sys.exit(1)
 
     try:
-        renderer = IpBlockRenderer(ip_template, ip_config)
-        renderer.render(out_path / "ip_autogen" / module_name,
-                        overwrite_output_dir=True)
+        if desc_only:
+            ip_desc = IpDescriptionOnlyRenderer(ip_template,
+                                                ip_config).render()
+            data_path = out_path / "ip_autogen" / module_name / "data"
+            output_writer.write(data_path / f"{module_name}.hjson", ip_desc)
+        else:
+            renderer = IpBlockRenderer(ip_template, ip_config)
+            renderer.render(out_path / "ip_autogen" / module_name,
+                            overwrite_output_dir=True)
     except TemplateRenderError as e:
         log.error(e.verbose_str())
         sys.exit(1)
 
 
 def generate_top(top, name_to_block, tpl_filename, **kwargs):
-    top_tpl = Template(filename=tpl_filename)
+    top_tpl = get_template(tpl_filename)
 
     try:
         return top_tpl.render(top=top, name_to_block=name_to_block, **kwargs)
@@ -102,6 +117,9 @@ def generate_xbars(top, out_path):
     gencmd = ("// util/topgen.py -t hw/top_{topname}/data/top_{topname}.hjson "
               "-o hw/top_{topname}/\n\n".format(topname=topname))
 
+    # The crossbars do not depend on each other, so the files of all of them
+    # are rendered together, once they have all been elaborated.
+    jobs = RenderJobs()
     for obj in top["xbar"]:
         xbar_path = out_path / "ip/xbar_{}/data/autogen".format(obj["name"])
         xbar_path.mkdir(parents=True, exist_ok=True)
@@ -110,49 +128,43 @@ def generate_xbars(top, out_path):
 
         # Generate output of crossbar with complete fields
         xbar_hjson_path = xbar_path / "xbar_{}.gen.hjson".format(xbar.name)
-        xbar_hjson_path.write_text(genhdr + gencmd +
-                                   hjson.dumps(obj, for_json=True) + '\n')
+        output_writer.write(xbar_hjson_path,
+                            genhdr + gencmd +
+                            hjson.dumps(obj, for_json=True) + '\n')
 
         if not tlgen.elaborate(xbar):
             log.error("Elaboration failed." + repr(xbar))
 
-        try:
-            results = tlgen.generate(xbar, "top_" + top["name"])
-        except:  # noqa: E722
-            log.error(exceptions.text_error_template().render())
-
         ip_path = out_path / "ip/xbar_{}".format(obj["name"])
+        tlgen.add_generate_jobs(jobs, xbar, ip_path, "top_" + top["name"])
 
-        for filename, filecontent in results:
-            filepath = ip_path / filename
-            filepath.parent.mkdir(parents=True, exist_ok=True)
-            with filepath.open(mode="w", encoding="UTF-8") as fout:
-                fout.write(filecontent)
-
+        # generate testbench for xbar
         dv_path = out_path / "ip/xbar_{}/dv/autogen".format(obj["name"])
-        dv_path.mkdir(parents=True, exist_ok=True)
+        tlgen.add_tb_jobs(jobs, xbar, dv_path, "top_" + top["name"])
 
-        # generate testbench for xbar
-        tlgen.generate_tb(xbar, dv_path, "top_" + top["name"])
+    if jobs.run():
+        log.error("Unable to generate the crossbars.")
+        sys.exit(1)
 
+    for obj in top["xbar"]:
         # Read back the comportable IP and amend to Xbar
+        ip_path = out_path / "ip/xbar_{}".format(obj["name"])
         xbar_ipfile = ip_path / ("data/autogen/xbar_%s.hjson" % obj["name"])
-        with xbar_ipfile.open() as fxbar:
-            xbar_ipobj = hjson.load(fxbar,
-                                    use_decimal=True,
-                                    object_pairs_hook=OrderedDict)
-
-            r_inter_signal_list = check_list(
-                xbar_ipobj.get("inter_signal_list", []),
-                "inter_signal_list field")
-            obj["inter_signal_list"] = [
-                InterSignal.from_raw(
-                    "entry {} of the inter_signal_list field".format(idx + 1),
-                    entry) for idx, entry in enumerate(r_inter_signal_list)
-            ]
-
-
-def generate_alert_handler(top, out_path):
+        xbar_ipobj = hjson_loader.load(xbar_ipfile,
+                                       use_decimal=True,
+                                       object_pairs_hook=OrderedDict)
+
+        r_inter_signal_list = check_list(
+            xbar_ipobj.get("inter_signal_list", []),
+            "inter_signal_list field")
+        obj["inter_signal_list"] = [
+            InterSignal.from_raw(
+                "entry {} of the inter_signal_list field".format(idx + 1),
+                entry) for idx, entry in enumerate(r_inter_signal_list)
+        ]
+
+
+def generate_alert_handler(top, out_path, passes, desc_only):
     topname = top["name"]
 
     # default values
@@ -204,10 +216,11 @@ def generate_alert_handler(top, out_path):
         "lpg_map": lpg_map,
     }
 
-    ipgen_render("alert_handler", topname, params, out_path)
+    ipgen_render("alert_handler", topname, params, out_path, passes,
+                 desc_only)
 
 
-def generate_plic(top, out_path):
+def generate_plic(top, out_path, passes, desc_only):
     topname = top["name"]
     params = {}
 
@@ -221,7 +234,7 @@ def generate_plic(top, out_path):
     params["target"] = int(top["num_cores"], 0) if "num_cores" in top else 1
     params["prio"] = 3
 
-    ipgen_render("rv_plic", topname, params, out_path)
+    ipgen_render("rv_plic", topname, params, out_path, passes, desc_only)
 
 
 # TODO: For generated IPs that are generated legacy style (i.e., without IPgen)
@@ -247,7 +260,7 @@ def generate_regfile_from_path(hjson_path: Path,
         sys.exit(1)
 
 
-def generate_pinmux(top, out_path):
+def generate_pinmux(top, out_path, passes, desc_only):
 
     topname = top["name"]
     pinmux = top["pinmux"]
@@ -331,39 +344,44 @@ def generate_pinmux(top, out_path):
 
     hjson_gen_path = data_path / "pinmux.hjson"
 
+    params = dict(
+        n_mio_periph_in=n_mio_periph_in,
+        n_mio_periph_out=n_mio_periph_out,
+        n_mio_pads=n_mio_pads,
+        # each DIO has in, out and oe wires
+        # some of these have to be tied off in the
+        # top, depending on the type.
+        n_dio_periph_in=n_dio_pads,
+        n_dio_periph_out=n_dio_pads,
+        n_dio_pads=n_dio_pads,
+        attr_dw=attr_dw,
+        n_wkup_detect=num_wkup_detect,
+        wkup_cnt_width=wkup_cnt_width)
+    if not passes.needs_run("pinmux", not desc_only, params):
+        return
+
     out = StringIO()
-    with tpl_path.open(mode="r", encoding="UTF-8") as fin:
-        hjson_tpl = Template(fin.read())
-        try:
-            out = hjson_tpl.render(
-                n_mio_periph_in=n_mio_periph_in,
-                n_mio_periph_out=n_mio_periph_out,
-                n_mio_pads=n_mio_pads,
-                # each DIO has in, out and oe wires
-                # some of these have to be tied off in the
-                # top, depending on the type.
-                n_dio_periph_in=n_dio_pads,
-                n_dio_periph_out=n_dio_pads,
-                n_dio_pads=n_dio_pads,
-                attr_dw=attr_dw,
-                n_wkup_detect=num_wkup_detect,
-                wkup_cnt_width=wkup_cnt_width)
-        except:  # noqa: E722
-            log.error(exceptions.text_error_template().render())
-        log.info("PINMUX HJSON: %s" % out)
+    hjson_tpl = get_template(str(tpl_path))
+    try:
+        out = hjson_tpl.render(**params)
+    except:  # noqa: E722
+        log.error(exceptions.text_error_template().render())
+    log.info("PINMUX HJSON: %s" % out)
 
     if out == "":
         log.error("Cannot generate pinmux HJSON")
         return
 
-    with hjson_gen_path.open(mode="w", encoding="UTF-8") as fout:
-        fout.write(genhdr + gencmd + out)
+    output_writer.write(hjson_gen_path, genhdr + gencmd + out)
+
+    if desc_only:
+        return
 
     # Generate reg file
     generate_regfile_from_path(hjson_gen_path, rtl_path, original_rtl_path)
 
 
-def generate_clkmgr(top, cfg_path, out_path):
+def generate_clkmgr(top, cfg_path, out_path, passes, desc_only):
 
     # Target paths
     rtl_path = out_path / "ip/clkmgr/rtl/autogen"
@@ -388,34 +406,42 @@ def generate_clkmgr(top, cfg_path, out_path):
     clocks = top["clocks"]
     assert isinstance(clocks, Clocks)
 
+    if not passes.needs_run("clkmgr", not desc_only, top):
+        return
+
+    # The description comes first.
+    if desc_only:
+        tpls = tpls[:1]
+
     typed_clocks = clocks.typed_clocks()
     hint_names = typed_clocks.hint_names()
 
     for idx, tpl in enumerate(tpls):
         out = ""
-        with tpl.open(mode="r", encoding="UTF-8") as fin:
-            tpl = Template(fin.read())
-            try:
-                out = tpl.render(cfg=top,
-                                 clocks=clocks,
-                                 typed_clocks=typed_clocks,
-                                 hint_names=hint_names)
-            except:  # noqa: E722
-                log.error(exceptions.text_error_template().render())
+        tpl = get_template(str(tpl))
+        try:
+            out = tpl.render(cfg=top,
+                             clocks=clocks,
+                             typed_clocks=typed_clocks,
+                             hint_names=hint_names)
+        except:  # noqa: E722
+            log.error(exceptions.text_error_template().render())
 
         if out == "":
             log.error("Cannot generate {}".format(names[idx]))
             return
 
-        with outputs[idx].open(mode="w", encoding="UTF-8") as fout:
-            fout.write(genhdr + out)
+        output_writer.write(outputs[idx], genhdr + out)
+
+    if desc_only:
+        return
 
     # Generate reg files
     generate_regfile_from_path(hjson_out, rtl_path, original_rtl_path)
 
 
 # generate pwrmgr
-def generate_pwrmgr(top, out_path):
+def generate_pwrmgr(top, out_path, passes, desc_only):
     log.info("Generating pwrmgr")
 
     # Count number of wakeups
@@ -447,27 +473,32 @@ def generate_pwrmgr(top, out_path):
     hjson_tpl_path = tpl_path / "pwrmgr.hjson.tpl"
     original_rtl_path = Path(__file__).resolve().parent / "../hw/ip/pwrmgr/rtl"
 
+    params = dict(NumWkups=n_wkups,
+                  Wkups=top["wakeups"],
+                  rst_reqs=top["reset_requests"],
+                  NumRstReqs=n_rstreqs)
+    if not passes.needs_run("pwrmgr", not desc_only, params):
+        return
+
     # Render and write out hjson
     out = StringIO()
-    with hjson_tpl_path.open(mode="r", encoding="UTF-8") as fin:
-        hjson_tpl = Template(fin.read())
-        try:
-            out = hjson_tpl.render(NumWkups=n_wkups,
-                                   Wkups=top["wakeups"],
-                                   rst_reqs=top["reset_requests"],
-                                   NumRstReqs=n_rstreqs)
+    hjson_tpl = get_template(str(hjson_tpl_path))
+    try:
+        out = hjson_tpl.render(**params)
 
-        except:  # noqa: E722
-            log.error(exceptions.text_error_template().render())
-        log.info("pwrmgr hjson: %s" % out)
+    except:  # noqa: E722
+        log.error(exceptions.text_error_template().render())
+    log.info("pwrmgr hjson: %s" % out)
 
     if out == "":
         log.error("Cannot generate pwrmgr config file")
         return
 
     hjson_path = doc_path / "pwrmgr.hjson"
-    with hjson_path.open(mode="w", encoding="UTF-8") as fout:
-        fout.write(genhdr + out)
+    output_writer.write(hjson_path, genhdr + out)
+
+    if desc_only:
+        return
 
     # Generate reg files
     generate_regfile_from_path(hjson_path, rtl_path, original_rtl_path)
@@ -479,7 +510,7 @@ def get_rst_ni(top):
 
 
 # generate rstmgr
-def generate_rstmgr(topcfg, out_path):
+def generate_rstmgr(topcfg, out_path, passes, desc_only):
     log.info("Generating rstmgr")
 
     # Define target path
@@ -530,32 +561,41 @@ def generate_rstmgr(topcfg, out_path):
     # Number of reset requests
     n_rstreqs = len(topcfg["reset_requests"]["peripheral"])
 
+    params = dict(clks=clks,
+                  reqs=topcfg["reset_requests"],
+                  power_domains=topcfg["power"]["domains"],
+                  num_rstreqs=n_rstreqs,
+                  sw_rsts=sw_rsts,
+                  output_rsts=output_rsts,
+                  leaf_rsts=leaf_rsts,
+                  rst_ni = rst_ni['rst_ni']['name'],
+                  export_rsts=topcfg["exported_rsts"],
+                  reset_obj=topcfg["resets"])
+    if not passes.needs_run("rstmgr", not desc_only, params):
+        return
+
+    # The description comes first.
+    if desc_only:
+        tpls = tpls[:1]
+
     # Generate templated files
     for idx, t in enumerate(tpls):
         out = StringIO()
-        with t.open(mode="r", encoding="UTF-8") as fin:
-            tpl = Template(fin.read())
-            try:
-                out = tpl.render(clks=clks,
-                                 reqs=topcfg["reset_requests"],
-                                 power_domains=topcfg["power"]["domains"],
-                                 num_rstreqs=n_rstreqs,
-                                 sw_rsts=sw_rsts,
-                                 output_rsts=output_rsts,
-                                 leaf_rsts=leaf_rsts,
-                                 rst_ni = rst_ni['rst_ni']['name'],
-                                 export_rsts=topcfg["exported_rsts"],
-                                 reset_obj=topcfg["resets"])
-
-            except:  # noqa: E722
-                log.error(exceptions.text_error_template().render())
+        tpl = get_template(str(t))
+        try:
+            out = tpl.render(**params)
+
+        except:  # noqa: E722
+            log.error(exceptions.text_error_template().render())
 
         if out == "":
             log.error("Cannot generate {}".format(names[idx]))
             return
 
-        with outputs[idx].open(mode="w", encoding="UTF-8") as fout:
-            fout.write(genhdr + out)
+        output_writer.write(outputs[idx], genhdr + out)
+
+    if desc_only:
+        return
 
     # Generate reg files
     hjson_path = outputs[0]
@@ -563,7 +603,7 @@ def generate_rstmgr(topcfg, out_path):
 
 
 # generate flash
-def generate_flash(topcfg, out_path):
+def generate_flash(topcfg, out_path, passes, desc_only):
     log.info("Generating flash")
 
     # Define target path
@@ -599,24 +639,31 @@ def generate_flash(topcfg, out_path):
         return
 
     cfg = flash_mems[0]["memory"]["mem"]["config"]
+    if not passes.needs_run("flash_ctrl", not desc_only, cfg):
+        return
+
+    # The description comes first.
+    if desc_only:
+        tpls = tpls[:1]
 
     # Generate templated files
     for idx, t in enumerate(tpls):
         out = StringIO()
-        with t.open(mode="r", encoding="UTF-8") as fin:
-            tpl = Template(fin.read())
-            try:
-                out = tpl.render(cfg=cfg)
+        tpl = get_template(str(t))
+        try:
+            out = tpl.render(cfg=cfg)
 
-            except:  # noqa: E722
-                log.error(exceptions.text_error_template().render())
+        except:  # noqa: E722
+            log.error(exceptions.text_error_template().render())
 
         if out == "":
             log.error("Cannot generate {}".format(names[idx]))
             return
 
-        with outputs[idx].open(mode="w", encoding="UTF-8") as fout:
-            fout.write(genhdr + out)
+        output_writer.write(outputs[idx], genhdr + out)
+
+    if desc_only:
+        return
 
     # Generate reg files
     hjson_path = outputs[0]
@@ -750,10 +797,7 @@ def generete_rust(topname, completecfg, name_to_block, out_path, version_stamp,
                         **other_info):
         template_contents = generate_top(completecfg, name_to_block,
                                          str(template_path), **other_info)
-
-        rendered_path.parent.mkdir(exist_ok=True, parents=True)
-        with rendered_path.open(mode="w", encoding="UTF-8") as fout:
-            fout.write(template_contents)
+        output_writer.write(rendered_path, template_contents)
 
     # The Rust file needs some complex information, so we initialize this
     # object to store it.
@@ -780,7 +824,8 @@ def generete_rust(topname, completecfg, name_to_block, out_path, version_stamp,
                     helper=rs_helper)
 
 
-def _process_top(topcfg, args, cfg_path, out_path, pass_idx):
+def _process_top(topcfg, args, cfg_path, out_path, pass_idx, passes,
+                 desc_only):
     # Create generated list
     # These modules are generated through topgen
     templated_list = lib.get_templated_modules(topcfg)
@@ -816,7 +861,7 @@ def _process_top(topcfg, args, cfg_path, out_path, pass_idx):
     # the top hjson file
     topcfg["clocks"] = Clocks(topcfg["clocks"])
     extract_clocks(topcfg)
-    generate_clkmgr(topcfg, cfg_path, out_path)
+    generate_clkmgr(topcfg, cfg_path, out_path, passes, desc_only)
 
     # It may require two passes to check if the module is needed.
     # TODO: first run of topgen will fail due to the absent of rv_plic.
@@ -836,13 +881,15 @@ def _process_top(topcfg, args, cfg_path, out_path, pass_idx):
             ip_relpath = "ip"
             desc_file_relpath = "data/autogen"
 
+        gen_hjson = (Path(out_path) / ip_relpath / ip / desc_file_relpath /
+                     f"{ip}.hjson")
         if ip == "clkmgr" or (pass_idx > 0):
-            ip_hjson = (Path(out_path) / ip_relpath / ip / desc_file_relpath /
-                        f"{ip}.hjson")
+            ip_hjson = gen_hjson
         else:
             ip_hjson = (hjson_dir.parent / ip_relpath / ip /
                         desc_file_relpath / f"{ip}.hjson")
         ips.append(ip_hjson)
+        passes.record_read(ip_hjson, gen_hjson)
 
     for ip, reggen_only in top_only_dict.items():
         log.info("Appending {}".format(ip))
@@ -857,6 +904,7 @@ def _process_top(topcfg, args, cfg_path, out_path, pass_idx):
     # load Hjson and pass validate from reggen
     try:
         ip_objs = []
+        ip_paths = []
         for ip_desc_file in ips:
             ip_name = ip_desc_file.stem
             # Skip if it is not in the module list
@@ -906,31 +954,29 @@ def _process_top(topcfg, args, cfg_path, out_path, pass_idx):
                         IpBlock.from_path(str(template_hjson_file), []))
             else:
                 ip_objs.append(IpBlock.from_path(str(ip_desc_file), []))
+            ip_paths.append(ip_desc_file)
 
     except ValueError:
         raise SystemExit(sys.exc_info()[1])
 
     name_to_block = {}  # type: Dict[str, IpBlock]
-    for block in ip_objs:
+    block_paths = {}  # type: Dict[str, Path]
+    for block, ip_path in zip(ip_objs, ip_paths):
         lblock = block.name.lower()
         assert lblock not in name_to_block
         name_to_block[lblock] = block
+        block_paths[lblock] = ip_path
 
     # Read in alias files one-by-one, peek inside to figure out which IP block
     # they belong to and apply the alias file to that IP block.
     if args.alias_files:
         for alias in args.alias_files:
-            with open(alias, 'r', encoding='utf-8') as handle:
-                raw = hjson.loads(handle.read(), use_decimal=True)
-                if 'alias_target' not in raw:
-                    raise ValueError('Missing alias_target key '
-                                     'in alias file {}.'.format(alias))
-                alias_target = raw['alias_target'].lower()
-                if alias_target not in name_to_block:
-                    raise ValueError('Alias target {} is not defined.'
-                                     .format(alias_target))
-                where = 'alias file at {}'.format(alias)
-                name_to_block[alias_target].alias_from_raw(False, raw, where)
+            alias_target, raw = read_alias_file(alias)
+            if alias_target not in name_to_block:
+                raise ValueError('Alias target {} is not defined.'
+                                 .format(alias_target))
+            where = 'alias file at {}'.format(alias)
+            name_to_block[alias_target].alias_from_raw(False, raw, where)
 
     connect_clocks(topcfg, name_to_block)
 
@@ -947,14 +993,14 @@ def _process_top(topcfg, args, cfg_path, out_path, pass_idx):
     completecfg = merge_top(topcfg, name_to_block, xbar_objs)
 
     # Generate flash controller and flash memory
-    generate_flash(topcfg, out_path)
+    generate_flash(topcfg, out_path, passes, desc_only)
 
     # Generate PLIC
     if not args.no_plic and \
        not args.alert_handler_only and \
        not args.xbar_only:
-        generate_plic(completecfg, out_path)
-        if args.plic_only:
+        generate_plic(completecfg, out_path, passes, desc_only)
+        if args.plic_only and not desc_only:
             sys.exit()
 
     # Create Alert Handler LPGs before
@@ -963,24 +1009,96 @@ def _process_top(topcfg, args, cfg_path, out_path, pass_idx):
 
     # Generate Alert Handler
     if not args.xbar_only:
-        generate_alert_handler(completecfg, out_path)
-        if args.alert_handler_only:
+        generate_alert_handler(completecfg, out_path, passes, desc_only)
+        if args.alert_handler_only and not desc_only:
             sys.exit()
 
     # Generate Pinmux
-    generate_pinmux(completecfg, out_path)
+    generate_pinmux(completecfg, out_path, passes, desc_only)
 
     # Generate Pwrmgr
-    generate_pwrmgr(completecfg, out_path)
+    generate_pwrmgr(completecfg, out_path, passes, desc_only)
 
     # Generate rstmgr
-    generate_rstmgr(completecfg, out_path)
+    generate_rstmgr(completecfg, out_path, passes, desc_only)
 
     # Generate top only modules
     # These modules are not templated, but are not in hw/ip
-    generate_top_only(top_only_dict, out_path, topname, args.hjson_path)
+    if not desc_only:
+        generate_top_only(top_only_dict, out_path, topname, args.hjson_path)
+
+    return completecfg, name_to_block, block_paths
+
+
+def read_alias_file(alias: Path) -> Tuple[str, Dict]:
+    """Read an alias file, returning the IP block it targets and its contents
+    """
+    raw = hjson_loader.load(alias, use_decimal=True)
+    if 'alias_target' not in raw:
+        raise ValueError('Missing alias_target key '
+                         'in alias file {}.'.format(alias))
+    return raw['alias_target'].lower(), raw
+
+
+def load_only_ip(args, snapshot_file: Optional[Path],
+                 out_path: Path) -> Optional[Tuple[TopSnapshot, bool]]:
+    """Load the merged top for a change to the description of args.only_ip
+
+    The top is loaded from the snapshot saved by the last full run, with the
+    block replaced by the one in its description. Returns a pair (snapshot,
+    resized), where resized is True if the address ranges of the crossbars
+    changed, or None if the top has to be merged again.
+    """
+    name = args.only_ip.lower()
+    snapshot = TopSnapshot.load(snapshot_file)
+    if snapshot is None or (not args.top_ral and
+                            snapshot.out_path != out_path.resolve()):
+        log.warning("No merged top saved for this output directory, "
+                    "running a full generation.")
+        return None
+
+    topcfg = snapshot.completecfg
+    if name not in snapshot.name_to_block:
+        log.error("{} is not an IP block of top {}.".format(
+            args.only_ip, topcfg["name"]))
+        sys.exit(1)
+    if name in (lib.get_templated_modules(topcfg) +
+                lib.get_ipgen_modules(topcfg)):
+        log.error("The description of {} is generated by topgen. "
+                  "Run a full generation instead.".format(name))
+        sys.exit(1)
+
+    ip_path = snapshot.block_paths[name]
+    changed = snapshot.changed_inputs(ip_path)
+    if changed:
+        for path in changed:
+            log.info("%s changed", path)
+        log.warning("Inputs of the top other than %s changed, "
+                    "running a full generation.", ip_path)
+        return None
+
+    try:
+        block = IpBlock.from_path(str(ip_path), [])
+        for alias in args.alias_files or []:
+            alias_target, raw = read_alias_file(alias)
+            if alias_target == name:
+                where = 'alias file at {}'.format(alias)
+                block.alias_from_raw(False, raw, where)
+    except ValueError:
+        raise SystemExit(sys.exc_info()[1])
 
-    return completecfg, name_to_block
+    old_interface, old_sizes = block_interface(snapshot.name_to_block[name])
+    new_interface, new_sizes = block_interface(block)
+    if new_interface != old_interface:
+        log.warning("The interface of %s changed, running a full generation.",
+                    name)
+        return None
+
+    log.info("Regenerating the top for a change to %s only", name)
+    snapshot.replace_block(name, block)
+    resized = (new_sizes != old_sizes and
+               update_xbar_addr_ranges(topcfg, snapshot.name_to_block, name))
+    return snapshot, resized
 
 
 def main():
@@ -1084,8 +1202,29 @@ def main():
                         default=False,
                         action="store_true",
                         help="Only return the list of blocks and exit.")
+    # Miscellaneous: incremental generation for a change to one IP block.
+    parser.add_argument(
+        "--only-ip",
+        metavar="<name>",
+        help="""Regenerate the top for a change to the registers of IP block
+             <name> only, starting from the merged top saved by the last full
+             run rather than merging the top again. Falls back to a full run
+             if anything else changed.""")
+    # Miscellaneous: only check that the generated files are up to date.
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="""Check that the generated files are up to date rather than
+             writing them. Exits with an error if any of them is not.""")
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        help="""Write a manifest of the generated files, with their SHA-256
+             digests, to this file.""")
 
     args = parser.parse_args()
+    output_writer.check_only = args.check
+    output_writer.manifest_path = args.manifest
 
     # check combinations
     if args.top_ral:
@@ -1125,10 +1264,9 @@ def main():
     cfg_path = Path(args.topcfg).parents[1]
 
     try:
-        with open(args.topcfg, "r") as ftop:
-            topcfg = hjson.load(ftop,
-                                use_decimal=True,
-                                object_pairs_hook=OrderedDict)
+        topcfg = hjson_loader.load(args.topcfg,
+                                   use_decimal=True,
+                                   object_pairs_hook=OrderedDict)
     except ValueError:
         raise SystemExit(sys.exc_info()[1])
 
@@ -1157,62 +1295,103 @@ def main():
         exit(1)
     secure_prng.reseed(topcfg["rnd_cnst_seed"])
 
-    # TODO, long term, the levels of dependency should be automatically
-    # determined instead of hardcoded.  The following are a few examples:
+    # The IP blocks generated by topgen and the top configuration depend on
+    # each other: the generated IP descriptions are merged into the top
+    # configuration, from which the IP blocks are generated. The following
+    # are a few examples:
     # Example 1: pinmux depends on amending all modules before calculating the
     #            correct number of pins.
-    #            This would be 1 level of dependency and require 2 passes.
     # Example 2: pinmux depends on amending all modules, and pwrmgr depends on
-    #            pinmux generation to know correct number of wakeups.  This
-    #            would be 2 levels of dependency and require 3 passes.
+    #            pinmux generation to know correct number of wakeups.
     #
     # How does multi-pass work?
-    # In example 1, the first pass gathers all modules and merges them.
-    # However, the merge process uses a stale pinmux.  The correct pinmux is
-    # then generated using the merged configuration.  The second pass now merges
-    # all the correct modules (including the generated pinmux) and creates the
-    # final merged config.
+    # Each pass merges the top with the IP descriptions generated by the
+    # previous pass (or the ones already there, for the first pass) and
+    # generates the IP descriptions again, but nothing else. In example 1, the
+    # first pass merges a stale pinmux, from which the correct pinmux
+    # description is generated. In example 2, the second pass merges the
+    # correct pinmux, from which the correct pwrmgr description is generated.
+    # Passes are run until a fixed point, when the descriptions generated are
+    # those the pass was merged from. The final pass then merges the top once
+    # more and generates everything.
     #
-    # In example 2, the first pass gathers all modules and merges them.
-    # However, the merge process uses a stale pinmux and pwrmgr.  The correct
-    # pinmux is then generated using the merged configuration.  However, since
-    # pwrmgr is dependent on this new pinmux, it is still generated incorrectly.
-    # The second pass merge now has an updated pinmux but stale pwrmgr.  The
-    # correct pwrmgr can now be generated.  The final pass then merges all the
-    # correct modules and creates the final configuration.
+    # The random netlist constants are drawn when merging the top. The passes
+    # after the first one start from the state of the PRNG at the end of the
+    # first pass, so that the constants do not depend on the number of
+    # passes.
     #
     # This fix is related to #2083
-    process_dependencies = 1
-
-    # topgen generates IP blocks and associated Hjson configuration in multiple
-    # steps. After each step, the IP Hjson configuration is read back and then
-    # combined into the toplevel configuration. To generate the chip-level RAL,
-    # we need to run the full generation step, but ultimately only care about
-    # the toplevel configuration (a single Hjson file). Since we don't have a
-    # better way at the moment dump all output into a temporary directory, and
-    # delete it after the fact, retaining only the toplevel configuration.
-    if args.top_ral:
-        out_path_gen = Path(tempfile.mkdtemp())
-    else:
-        out_path_gen = out_path
-
-    for pass_idx in range(process_dependencies + 1):
-        log.debug("Generation pass {}".format(pass_idx))
-        if pass_idx < process_dependencies:
+    max_passes = 5
+
+    # The merged top is saved for runs with --only-ip. Runs generating the
+    # chip-level RAL use the top saved by a run for any output directory.
+    snapshot_file = snapshot_path(
+        Path(args.topcfg), topcfg["rnd_cnst_seed"], args.hjson_path,
+        [str(alias) for alias in args.alias_files or []])
+
+    completecfg = None
+    if args.only_ip:
+        loaded = load_only_ip(args, snapshot_file, out_path)
+        if loaded is not None:
+            snapshot, resized = loaded
+            completecfg = snapshot.completecfg
+            name_to_block = snapshot.name_to_block
+
+    if completecfg is None:
+        snapshot = None
+        resized = True
+
+        # topgen generates IP blocks and associated Hjson configuration in
+        # multiple steps. After each step, the IP Hjson configuration is read
+        # back and then combined into the toplevel configuration. To generate
+        # the chip-level RAL, we need to run the full generation step, but
+        # ultimately only care about the toplevel configuration (a single
+        # Hjson file). Since we don't have a better way at the moment dump all
+        # output into a temporary directory, and delete it after the fact,
+        # retaining only the toplevel configuration.
+        if args.top_ral:
+            out_path_gen = Path(tempfile.mkdtemp())
+            output_writer.add_scratch_dir(out_path_gen)
+        else:
+            out_path_gen = out_path
+
+        passes = GenerationPasses()
+        prng_state = None
+        for pass_idx in range(max_passes):
+            log.debug("Generation pass {}".format(pass_idx))
+            if prng_state is not None:
+                secure_prng.setstate(prng_state)
+            passes.start_pass()
             cfg_copy = deepcopy(topcfg)
-            _process_top(cfg_copy, args, cfg_path, out_path_gen, pass_idx)
+            _process_top(cfg_copy, args, cfg_path, out_path_gen, pass_idx,
+                         passes, True)
+            if prng_state is None:
+                prng_state = secure_prng.getstate()
+            if passes.converged():
+                break
+        else:
+            log.error("The generated IP descriptions did not settle after %d "
+                      "passes.", max_passes)
+            sys.exit(1)
+
+        log.debug("Final generation pass")
+        secure_prng.setstate(prng_state)
+        completecfg, name_to_block, block_paths = _process_top(
+            topcfg, args, cfg_path, out_path_gen, pass_idx + 1, passes, False)
+
+        if args.top_ral:
+            # See above: we only need `completecfg` and `name_to_block`, not
+            # all the other files (e.g. RTL files) generated through topgen.
+            shutil.rmtree(out_path_gen, ignore_errors=True)
         else:
-            completecfg, name_to_block = _process_top(topcfg, args, cfg_path,
-                                                      out_path_gen, pass_idx)
+            snapshot = TopSnapshot(completecfg, name_to_block, block_paths,
+                                   Path(args.topcfg).parent,
+                                   args.alias_files or [], out_path)
 
-    topname = topcfg["name"]
+    topname = completecfg["name"]
 
     # Create the chip-level RAL only
     if args.top_ral:
-        # See above: we only need `completecfg` and `name_to_block`, not all
-        # the other files (e.g. RTL files) generated through topgen.
-        shutil.rmtree(out_path_gen, ignore_errors=True)
-
         exit_code = generate_top_ral(completecfg, name_to_block,
                                      args.dv_base_names, out_path)
         sys.exit(exit_code)
@@ -1222,15 +1401,26 @@ def main():
         sys.exit(0)
 
     # Generate xbars
-    if not args.no_xbar or args.xbar_only:
+    if resized and (not args.no_xbar or args.xbar_only):
+        # The inter-module signals of the crossbars are read back from their
+        # generated descriptions (a merged top loaded for --only-ip already
+        # has them).
+        for xbar in completecfg["xbar"]:
+            xbar.pop("inter_signal_list", None)
         generate_xbars(completecfg, out_path)
 
+    # Save the merged top for the next runs with --only-ip, unless the files
+    # generated from it were only checked.
+    if snapshot is not None and snapshot_file is not None and \
+            not output_writer.check_only:
+        snapshot.save(snapshot_file)
+
     # All IPs are generated. Connect phase now
     # Find {memory, module} <-> {xbar} connections first.
     im.autoconnect(completecfg, name_to_block)
 
     # Generic Inter-module connection
-    im.elab_intermodule(completecfg)
+    otherside_index = im.elab_intermodule(completecfg)
 
     # Generate top.gen.hjson right before rendering
     genhjson_dir = out_path / "data/autogen"
@@ -1244,8 +1434,9 @@ def main():
 //                --rnd_cnst_seed {seed}
 """.format(topname=topname, seed=completecfg["rnd_cnst_seed"])
 
-    genhjson_path.write_text(genhdr + gencmd +
-                             hjson.dumps(completecfg, for_json=True) + '\n')
+    output_writer.write(genhjson_path,
+                        genhdr + gencmd +
+                        hjson.dumps(completecfg, for_json=True) + '\n')
 
     # Generate Rust toplevel definitions
     if not args.no_rust:
@@ -1255,15 +1446,18 @@ def main():
             sys.exit(0)
 
     if not args.no_top or args.top_only:
+        # The top-level files do not depend on each other, so they are
+        # rendered together at the end.
+        jobs = RenderJobs()
 
         def render_template(template_path: str, rendered_path: Path,
                             **other_info):
-            template_contents = generate_top(completecfg, name_to_block,
-                                             str(template_path), **other_info)
-
-            rendered_path.parent.mkdir(exist_ok=True, parents=True)
-            with rendered_path.open(mode="w", encoding="UTF-8") as fout:
-                fout.write(template_contents)
+            # The helper is modified between the calls to this function, so
+            # each template gets a copy of it as it is now.
+            if "helper" in other_info:
+                other_info["helper"] = copy(other_info["helper"])
+            jobs.add(str(template_path), rendered_path, top=completecfg,
+                     name_to_block=name_to_block, **other_info)
 
         # Header for SV files
         gencmd = warnhdr + """//
@@ -1280,7 +1474,7 @@ def main():
                         gencmd=gencmd)
 
         # Multiple chip-levels (ASIC, FPGA, Verilator, etc)
-        for target in topcfg["targets"]:
+        for target in completecfg["targets"]:
             target_name = target["name"]
             render_template(TOPGEN_TEMPLATE_PATH / "chiplevel.sv.tpl",
                             out_path /
@@ -1322,7 +1516,7 @@ def main():
             cformat_dir = path / "sw/autogen"
             cformat_dir.mkdir(parents=True, exist_ok=True)
             cformat_path = cformat_dir / ".clang-format"
-            cformat_path.write_text(cformat_tplpath.read_text())
+            output_writer.write(cformat_path, cformat_tplpath.read_text())
 
             # Save the header macro prefix into `c_helper`
             rel_header_dir = cformat_dir.relative_to(root_paths[idx])
@@ -1363,28 +1557,16 @@ def main():
         for fname in tb_files:
             tpl_fname = "%s.tpl" % (fname)
             xbar_chip_data_path = TOPGEN_TEMPLATE_PATH / tpl_fname
-            template_contents = generate_top(completecfg, name_to_block,
-                                             str(xbar_chip_data_path), gencmd=gencmd)
-
-            rendered_dir = out_path / "dv/autogen"
-            rendered_dir.mkdir(parents=True, exist_ok=True)
-            rendered_path = rendered_dir / fname
-
-            with rendered_path.open(mode="w", encoding="UTF-8") as fout:
-                fout.write(template_contents)
+            render_template(xbar_chip_data_path,
+                            out_path / "dv/autogen" / fname,
+                            gencmd=gencmd,
+                            otherside_index=otherside_index)
 
         # generate parameters for chip-level environment package
         tpl_fname = "chip_env_pkg__params.sv.tpl"
         alert_handler_chip_data_path = TOPGEN_TEMPLATE_PATH / tpl_fname
-        template_contents = generate_top(completecfg, name_to_block,
-                                         str(alert_handler_chip_data_path))
-
-        rendered_dir = out_path / "dv/env/autogen"
-        rendered_dir.mkdir(parents=True, exist_ok=True)
-        rendered_path = rendered_dir / "chip_env_pkg__params.sv"
-
-        with rendered_path.open(mode="w", encoding="UTF-8") as fout:
-            fout.write(template_contents)
+        render_template(alert_handler_chip_data_path,
+                        out_path / "dv/env/autogen/chip_env_pkg__params.sv")
 
         # generate documentation for toplevel
         gen_top_docs(completecfg, c_helper, out_path)
@@ -1398,6 +1580,15 @@ def main():
                             helper=c_helper,
                             gencmd=gencmd)
 
+        if jobs.run():
+            log.error("Unable to generate the top-level files.")
+            sys.exit(1)
+
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except SystemExit as err:
+        if err.code:
+            raise
+    sys.exit(output_writer.finish())
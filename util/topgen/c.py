@@ -7,8 +7,8 @@
 from collections import OrderedDict, defaultdict
 from typing import Dict, List, Optional, Tuple
 
-from mako.template import Template
 from reggen.ip_block import IpBlock
+from reggen.template_cache import get_text_template
 
 from .lib import Name, get_base_and_size
 
@@ -72,7 +72,7 @@ class CEnum(object):
                     "  ${name.as_c_enum()} = ${value}, /**< ${docstring} */\n"
                     "% endfor\n"
                     "} ${enum.name.as_c_type()};")
-        return Template(template).render(enum=self)
+        return get_text_template(template).render(enum=self)
 
 
 class CArrayMapping(object):
@@ -89,7 +89,7 @@ class CArrayMapping(object):
         template = (
             "extern const ${mapping.output_type_name.as_c_type()}\n"
             "    ${mapping.name.as_snake_case()}[${len(mapping.mapping)}];")
-        return Template(template).render(mapping=self)
+        return get_text_template(template).render(mapping=self)
 
     def render_definition(self):
         template = (
@@ -99,7 +99,7 @@ class CArrayMapping(object):
             "  [${in_name.as_c_enum()}] = ${out_name.as_c_enum()},\n"
             "% endfor\n"
             "};\n")
-        return Template(template).render(mapping=self)
+        return get_text_template(template).render(mapping=self)
 
 
 class TopGenC:
@@ -3,13 +3,15 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging as log
+from pathlib import Path
 from typing import List, Optional, Tuple
 
 from mako import exceptions  # type: ignore
-from mako.lookup import TemplateLookup  # type: ignore
 from pkg_resources import resource_filename
 
+from reggen import output_writer
 from reggen.gen_dv import gen_core_file
+from reggen.template_cache import get_lookup
 
 from .top import Top
 
@@ -24,8 +26,8 @@ def gen_dv(top: Top,
            outdir: str) -> int:
     '''Generate DV RAL model for a Top'''
     # Read template
-    lookup = TemplateLookup(directories=[resource_filename('topgen', '.'),
-                                         resource_filename('reggen', '.')])
+    lookup = get_lookup([resource_filename('topgen', '.'),
+                         resource_filename('reggen', '.')])
     uvm_reg_tpl = lookup.get_template('top_uvm_reg.sv.tpl')
 
     # Expand template
@@ -37,9 +39,8 @@ def gen_dv(top: Top,
         return 1
 
     # Dump to output file
-    dest_path = '{}/chip_ral_pkg.sv'.format(outdir)
-    with open(dest_path, 'w') as fout:
-        fout.write(to_write)
+    dest_path = Path(outdir) / 'chip_ral_pkg.sv'
+    output_writer.write(dest_path, to_write)
 
     gen_core_file(outdir, 'chip', dv_base_names, ['chip_ral_pkg.sv'])
 
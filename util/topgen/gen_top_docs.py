@@ -7,6 +7,8 @@ r"""Top Module Documentation Generator
 import os
 from tabulate import tabulate
 
+from reggen import output_writer
+
 TABLE_HEADER = '''<!--
 DO NOT EDIT THIS FILE DIRECTLY.
 It has been generated with the following command:
@@ -177,8 +179,7 @@ def gen_pinmux_docs(top, c_helper, out_path):
         pinout_table += "\n"
 
         pinout_table_path = doc_path / ("pinout_" + target['name'] + ".md")
-        with open(pinout_table_path, 'w') as outfile:
-            outfile.write(pinout_table)
+        output_writer.write(pinout_table_path, pinout_table)
 
         # gather some statistics
         num_banks = len(top['pinout']['banks'])
@@ -202,8 +203,7 @@ def gen_pinmux_docs(top, c_helper, out_path):
     summary_table = TABLE_HEADER + gencmd + "-->\n\n" + summary_table + "\n"
 
     target_table_path = doc_path / "targets.md"
-    with open(target_table_path, 'w') as target_outfile:
-        target_outfile.write(summary_table)
+    output_writer.write(target_table_path, summary_table)
 
 
 def gen_top_docs(top, c_helper, out_path):
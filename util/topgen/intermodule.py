@@ -6,7 +6,7 @@ import logging as log
 import re
 from collections import OrderedDict
 from enum import Enum
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from reggen.ip_block import IpBlock
 from reggen.inter_signal import InterSignal
@@ -263,16 +263,19 @@ def _get_default_name(sig, suffix):
         return "'0"
 
 
-def elab_intermodule(topcfg: OrderedDict):
+def elab_intermodule(topcfg: OrderedDict) -> Dict[str, Tuple[int, List]]:
     """Check the connection of inter-module and categorize them
 
     In the top template, it uses updated inter_module fields to create
     connections between the modules (incl. memories). This function is to
     create and check the validity of the connections `inter_module` using IPs'
     `inter_signal_list`.
+
+    Returns the index of the connections for find_otherside_modules().
     """
 
     list_of_intersignals = []
+    sig_index = {}  # type: Dict[Tuple[str, str], List[Dict]]
 
     if "inter_signal" not in topcfg:
         topcfg["inter_signal"] = OrderedDict()
@@ -296,6 +299,7 @@ def elab_intermodule(topcfg: OrderedDict):
             # Add instance name to the entry and add to list_of_intersignals
             sig["inst_name"] = x["name"]
             list_of_intersignals.append(sig)
+            sig_index.setdefault((x["name"], sig["name"]), []).append(sig)
             new_isl.append(sig)
 
         x['inter_signal_list'] = new_isl
@@ -305,9 +309,12 @@ def elab_intermodule(topcfg: OrderedDict):
 
     # TODO: Cross check Can be done here not in validate as ipobj is not
     # available in validate
-    error = check_intermodule(topcfg, "Inter-module Check")
+    error = check_intermodule(topcfg, "Inter-module Check", sig_index)
     assert error == 0, "Inter-module validation is failed cannot move forward."
 
+    otherside_index = index_otherside_modules(
+        topcfg["inter_module"]["connect"])
+
     # intermodule
     definitions = []
 
@@ -337,7 +344,7 @@ def elab_intermodule(topcfg: OrderedDict):
         req_module, req_signal, req_index = filter_index(req)
 
         # get the module signal
-        req_struct = find_intermodule_signal(list_of_intersignals, req_module,
+        req_struct = find_intermodule_signal(sig_index, req_module,
                                              req_signal)
 
         # decide signal format based on the `key`
@@ -350,7 +357,7 @@ def elab_intermodule(topcfg: OrderedDict):
         else:
             for rsp in rsps:
                 rsp_module, rsp_signal, rsp_index = filter_index(rsp)
-                rsp_struct = find_intermodule_signal(list_of_intersignals,
+                rsp_struct = find_intermodule_signal(sig_index,
                                                      rsp_module, rsp_signal)
                 if "package" in rsp_struct:
                     package = rsp_struct["package"]
@@ -412,7 +419,7 @@ def elab_intermodule(topcfg: OrderedDict):
             # Split index
             rsp_module, rsp_signal, rsp_index = filter_index(rsp)
 
-            rsp_struct = find_intermodule_signal(list_of_intersignals,
+            rsp_struct = find_intermodule_signal(sig_index,
                                                  rsp_module, rsp_signal)
 
             # determine the signal name
@@ -442,7 +449,7 @@ def elab_intermodule(topcfg: OrderedDict):
     for s in topcfg["inter_module"]["top"]:
         sig_m, sig_s, sig_i = filter_index(s)
         assert sig_i == -1, 'top net connection should not use bit index'
-        sig = find_intermodule_signal(list_of_intersignals, sig_m, sig_s)
+        sig = find_intermodule_signal(sig_index, sig_m, sig_s)
         sig_name = intersignal_format(sig)
         sig["top_signame"] = sig_name
         if "index" not in sig:
@@ -479,7 +486,7 @@ def elab_intermodule(topcfg: OrderedDict):
     for s, port in topcfg["inter_module"]["external"].items():
         sig_m, sig_s, sig_i = filter_index(s)
         assert sig_i == -1, 'top net connection should not use bit index'
-        sig = find_intermodule_signal(list_of_intersignals, sig_m, sig_s)
+        sig = find_intermodule_signal(sig_index, sig_m, sig_s)
 
         # To make netname `_o` or `_i`
         sig['external'] = True
@@ -574,6 +581,8 @@ def elab_intermodule(topcfg: OrderedDict):
     if "definitions" not in topcfg["inter_signal"]:
         topcfg["inter_signal"]["definitions"] = definitions
 
+    return otherside_index
+
 
 def filter_index(signame: str) -> Tuple[str, str, int]:
     """If the signal has array indicator `[N]` then split and return name and
@@ -596,13 +605,27 @@ def filter_index(signame: str) -> Tuple[str, str, int]:
     return m.group(1), m.group(2), -1
 
 
-def find_intermodule_signal(sig_list, m_name, s_name) -> Dict:
+def index_intermodule_signals(
+        sig_list: List[Dict]) -> Dict[Tuple[str, str], List[Dict]]:
+    """Return the intermodule signals of sig_list by instance and signal name
+
+    The index is what find_intermodule_signal() takes, so that each lookup
+    does not have to scan all the signals of the top.
+    """
+    sig_index = {}  # type: Dict[Tuple[str, str], List[Dict]]
+    for sig in sig_list:
+        sig_index.setdefault((sig["inst_name"], sig["name"]), []).append(sig)
+    return sig_index
+
+
+def find_intermodule_signal(sig_index: Dict[Tuple[str, str], List[Dict]],
+                            m_name, s_name) -> Dict:
     """Return the intermodule signal structure
+
+    sig_index is an index of the signals, from index_intermodule_signals().
     """
 
-    filtered = [
-        x for x in sig_list if x["name"] == s_name and x["inst_name"] == m_name
-    ]
+    filtered = sig_index.get((m_name, s_name), [])
 
     if len(filtered) == 1:
         return filtered[0]
@@ -669,9 +692,52 @@ def check_intermodule_field(sig: OrderedDict,
     return error, sig
 
 
-def find_otherside_modules(topcfg: OrderedDict, m,
-                           s) -> List[Tuple[str, str, str]]:
+def index_otherside_modules(
+        connect: Dict[str, List[str]]) -> Dict[str, Tuple[int, List]]:
+    """Return the far-end ports of each signal in connect
+
+    The result maps "module.signal" to a tuple (pos, result): pos is the
+    position in connect of the first connection of the signal, which decides
+    between a match as requester and a match as responder. The index is what
+    find_otherside_modules() takes.
+    """
+    req_index = {}  # type: Dict[str, Tuple[int, List]]
+    rsp_index = {}  # type: Dict[str, Tuple[int, List]]
+    for pos, (req, rsps) in enumerate(connect.items()):
+        req_m, req_s, req_i = filter_index(req)
+        if (req_m, req_s) not in req_index:
+            # return rsps after splitting module instance name and the port
+            result = []
+            for rsp in rsps:
+                rsp_m, rsp_s, rsp_i = filter_index(rsp)
+                result.append(('connect', rsp_m, rsp_s))
+            req_index[(req_m, req_s)] = (pos, result)
+
+        for rsp in rsps:
+            if rsp not in rsp_index:
+                rsp_index[rsp] = (pos, [('connect', req_m, req_s)])
+
+    index = {}
+    for (req_m, req_s), entry in req_index.items():
+        index["{}.{}".format(req_m, req_s)] = entry
+    for rsp, entry in rsp_index.items():
+        if rsp not in index or entry[0] < index[rsp][0]:
+            index[rsp] = entry
+
+    return index
+
+
+def find_otherside_modules(
+        topcfg: OrderedDict,
+        m,
+        s,
+        otherside_index: Optional[Dict[str, Tuple[int, List]]] = None
+) -> List[Tuple[str, str, str]]:
     """Find far-end port based on given module and signal name
+
+    otherside_index is the index of topcfg["inter_module"]["connect"] from
+    index_otherside_modules(), as returned by elab_intermodule(). It is built
+    here if not given.
     """
     # TODO: handle special cases
     special_inst_names = {
@@ -681,20 +747,14 @@ def find_otherside_modules(topcfg: OrderedDict, m,
     if special_result is not None:
         return [('top', special_result[0], special_result[1])]
 
-    signame = "{}.{}".format(m, s)
-    for req, rsps in topcfg["inter_module"]["connect"].items():
-        if req.startswith(signame):
-            # return rsps after splitting module instance name and the port
-            result = []
-            for rsp in rsps:
-                rsp_m, rsp_s, rsp_i = filter_index(rsp)
-                result.append(('connect', rsp_m, rsp_s))
-            return result
+    if otherside_index is None:
+        otherside_index = index_otherside_modules(
+            topcfg["inter_module"]["connect"])
 
-        for rsp in rsps:
-            if signame == rsp:
-                req_m, req_s, req_i = filter_index(req)
-                return [('connect', req_m, req_s)]
+    signame = "{}.{}".format(m, s)
+    entry = otherside_index.get(signame)
+    if entry is not None:
+        return list(entry[1])
 
     # if reaches here, it means either the format is wrong, or floating port.
     log.error("`find_otherside_modules()`: "
@@ -702,10 +762,22 @@ def find_otherside_modules(topcfg: OrderedDict, m,
     return []
 
 
-def check_intermodule(topcfg: Dict, prefix: str) -> int:
+def check_intermodule(
+        topcfg: Dict,
+        prefix: str,
+        sig_index: Optional[Dict[Tuple[str, str], List[Dict]]] = None) -> int:
+    """Check the inter-module connections of topcfg
+
+    sig_index is the index of topcfg["inter_signal"]["signals"] from
+    index_intermodule_signals(), which is built here if not given.
+    """
     if "inter_module" not in topcfg:
         return 0
 
+    if sig_index is None:
+        sig_index = index_intermodule_signals(
+            topcfg["inter_signal"]["signals"])
+
     total_error = 0
 
     for req, rsps in topcfg["inter_module"]["connect"].items():
@@ -744,8 +816,7 @@ def check_intermodule(topcfg: Dict, prefix: str) -> int:
             error += 1
             continue
 
-        req_struct = find_intermodule_signal(topcfg["inter_signal"]["signals"],
-                                             req_m, req_s)
+        req_struct = find_intermodule_signal(sig_index, req_m, req_s)
 
         err, req_struct = check_intermodule_field(req_struct)
         error += err
@@ -769,8 +840,7 @@ def check_intermodule(topcfg: Dict, prefix: str) -> int:
                     format(req=req, rsp=rsp))
                 error += 1
 
-            rsp_struct = find_intermodule_signal(
-                topcfg["inter_signal"]["signals"], rsp_m, rsp_s)
+            rsp_struct = find_intermodule_signal(sig_index, rsp_m, rsp_s)
 
             err, rsp_struct = check_intermodule_field(rsp_struct)
             error += err
@@ -863,8 +933,7 @@ def check_intermodule(topcfg: Dict, prefix: str) -> int:
             log.error("{item} cannot have index".format(item=item))
             total_error += 1
 
-        sig_struct = find_intermodule_signal(topcfg["inter_signal"]["signals"],
-                                             sig_m, sig_s)
+        sig_struct = find_intermodule_signal(sig_index, sig_m, sig_s)
         err, sig_struct = check_intermodule_field(sig_struct)
         total_error += err
 
@@ -1040,11 +1109,15 @@ def get_dangling_im_def(objs: OrderedDict) -> str:
     unused.
 
     """
-    unused_def = [obj for obj in objs if obj['end_idx'] > 0 and
-                  obj['act'] == obj['suffix']]
-
-    undriven_def = [obj for obj in objs if obj['end_idx'] > 0 and
-                    (obj['act'] == 'req' and obj['suffix'] == 'rsp' or
-                     obj['act'] == 'rsp' and obj['suffix'] == 'req')]
+    unused_def = []
+    undriven_def = []
+    for obj in objs:
+        if obj['end_idx'] <= 0:
+            continue
+        if obj['act'] == obj['suffix']:
+            unused_def.append(obj)
+        elif (obj['act'] == 'req' and obj['suffix'] == 'rsp' or
+              obj['act'] == 'rsp' and obj['suffix'] == 'req'):
+            undriven_def.append(obj)
 
     return unused_def, undriven_def
@@ -10,7 +10,7 @@ from copy import deepcopy
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
-import hjson
+from reggen import hjson_loader
 from reggen.ip_block import IpBlock
 
 # Ignore flake8 warning as the function is used in the template
@@ -125,9 +125,9 @@ def get_hjsonobj_xbars(xbar_path):
     p = xbar_path.glob('*.hjson')
     try:
         xbar_objs = [
-            hjson.load(x.open('r'),
-                       use_decimal=True,
-                       object_pairs_hook=OrderedDict) for x in p
+            hjson_loader.load(x,
+                              use_decimal=True,
+                              object_pairs_hook=OrderedDict) for x in p
         ]
     except ValueError:
         raise SystemExit(sys.exc_info()[1])
@@ -7,7 +7,7 @@ import re
 from collections import OrderedDict
 from copy import deepcopy
 from math import ceil, log2
-from typing import Dict, List, Union, Tuple
+from typing import Dict, List, Set, Union, Tuple
 
 from topgen import c, lib, secure_prng
 from .clocks import Clocks
@@ -302,7 +302,9 @@ def xbar_adddevice(top: Dict[str, object],
                    name_to_block: Dict[str, IpBlock],
                    xbar: Dict[str, object],
                    other_xbars: List[str],
-                   device: str) -> None:
+                   device: str,
+                   name_to_insts: Dict[str, List[Dict]],
+                   name_to_nodes: Dict[str, List[Dict]]) -> None:
     """Add or amend an entry in xbar['nodes'] to represent the device interface
 
     - clock: comes from module if exist, use xbar default otherwise
@@ -313,6 +315,9 @@ def xbar_adddevice(top: Dict[str, object],
     - xbar: bool, true if the device port is another xbar
     - stub: There is no backing module / memory, instead a tlul port
             is created and forwarded above the current hierarchy
+
+    name_to_insts and name_to_nodes index the modules and memories of the top
+    and the nodes of the crossbar by name.
     """
     device_parts = device.split('.', 1)
     device_base = device_parts[0]
@@ -320,19 +325,13 @@ def xbar_adddevice(top: Dict[str, object],
 
     # Try to find a block or memory instance with name device_base. Object
     # names should be unique, so there should never be more than one hit.
-    instances = [
-        node for node in top["module"] + top["memory"]
-        if node['name'] == device_base
-    ]
+    instances = name_to_insts.get(device_base, [])
     assert len(instances) <= 1
     inst = instances[0] if instances else None
 
     # Try to find a node in the crossbar called device. Node names should be
     # unique, so there should never be more than one hit.
-    nodes = [
-        node for node in xbar['nodes']
-        if node['name'] == device
-    ]
+    nodes = name_to_nodes.get(device, [])
     assert len(nodes) <= 1
     node = nodes[0] if nodes else None
 
@@ -440,21 +439,27 @@ def amend_xbar(top: Dict[str, object],
                    for x in top["xbar"]
                    if x["name"] != xbar["name"]]
 
+    # Index the instances and the crossbar nodes that the devices can match
+    name_to_insts = {}
+    for inst in top["module"] + top["memory"]:
+        name_to_insts.setdefault(inst["name"], []).append(inst)
+    name_to_nodes = {}
+    for node in topxbar["nodes"]:
+        name_to_nodes.setdefault(node["name"], []).append(node)
+
     log.info(device_nodes)
     for device in device_nodes:
-        xbar_adddevice(top, name_to_block, topxbar, other_xbars, device)
+        xbar_adddevice(top, name_to_block, topxbar, other_xbars, device,
+                       name_to_insts, name_to_nodes)
 
 
-def xbar_cross(xbar, xbars):
+def xbar_cross(xbar, name_to_xbar):
     """Check if cyclic dependency among xbars
 
     And gather the address range for device port (to another Xbar)
 
-    @param node_name if not "", the function only search downstream
-                     devices starting from the node_name
-    @param visited   The nodes it visited to reach this port. If any
-                     downstream port from node_name in visited, it means
-                     circular path exists. It should be fatal error.
+    @param xbar         The crossbar whose device ports are visited
+    @param name_to_xbar All the crossbars of the top, by name
     """
     # Step 1: Visit devices (gather the address range)
     log.info("Processing circular path check for {}".format(xbar["name"]))
@@ -479,23 +484,34 @@ def xbar_cross(xbar, xbars):
     # device_xbar is the crossbar has a device port with name as node["name"].
     # host_xbar is the crossbar has a host port with name as node["name"].
     for node in xbar_nodes:
-        xbar_addr = xbar_cross_node(node["name"], xbar, xbars, visited=[])
+        xbar_addr = xbar_cross_node(node["name"], xbar, name_to_xbar,
+                                    visited={xbar["name"]})
         node["addr_range"] = xbar_addr
 
 
-def xbar_cross_node(node_name, device_xbar, xbars, visited=[]):
+def xbar_cross_node(node_name, device_xbar, name_to_xbar,
+                    visited: Set[str]):
+    """Gather the address range behind device port node_name of device_xbar
+
+    @param visited The crossbars visited to reach this port. If the port
+                   leads back to one of them, there is a circular path, which
+                   is a fatal error.
+    """
     # 1. Get the connected xbar
-    host_xbars = [x for x in xbars if x["name"] == node_name]
-    assert len(host_xbars) == 1
-    host_xbar = host_xbars[0]
+    assert node_name in name_to_xbar
+    host_xbar = name_to_xbar[node_name]
+    if host_xbar["name"] in visited:
+        log.error("Crossbars have a circular path through {}".format(
+            host_xbar["name"]))
+        raise SystemExit()
 
     log.info("Processing node {} in Xbar {}.".format(node_name,
                                                      device_xbar["name"]))
     result = []  # [(base_addr, size), .. ]
     # Sweep the devices using connections and gather the address.
     # If the device is another xbar, call recursive
-    visited.append(host_xbar["name"])
-    devices = host_xbar["connections"][device_xbar["name"]]
+    visited.add(host_xbar["name"])
+    devices = set(host_xbar["connections"][device_xbar["name"]])
 
     for node in host_xbar["nodes"]:
         if not node["name"] in devices:
@@ -503,17 +519,61 @@ def xbar_cross_node(node_name, device_xbar, xbars, visited=[]):
         if "xbar" in node and node["xbar"] is True:
             if "addr_range" not in node:
                 # Deeper dive into another crossbar
-                xbar_addr = xbar_cross_node(node["name"], host_xbar, xbars,
-                                            visited)
+                xbar_addr = xbar_cross_node(node["name"], host_xbar,
+                                            name_to_xbar, visited)
                 node["addr_range"] = xbar_addr
 
         result.extend(deepcopy(node["addr_range"]))
 
-    visited.pop()
+    visited.remove(host_xbar["name"])
 
     return result
 
 
+def update_xbar_addr_ranges(top: Dict[str, object],
+                            name_to_block: Dict[str, IpBlock],
+                            block_name: str) -> bool:
+    """Update the address ranges of the devices instantiating block_name
+
+    This is for a top that was merged when the register blocks of
+    block_name had other sizes. Returns True if any address range changed,
+    in which case the address ranges of the device ports to other crossbars
+    are gathered again.
+    """
+    name_to_inst = {
+        inst["name"]: inst
+        for inst in top["module"] if inst["type"] == block_name
+    }
+    changed = False
+    for xbar in top["xbar"]:
+        for node in xbar["nodes"]:
+            if node["type"] != "device" or node.get("xbar", False):
+                continue
+            device_parts = node["name"].split('.', 1)
+            inst = name_to_inst.get(device_parts[0])
+            if inst is None:
+                continue
+            device_ifname = device_parts[1] if len(device_parts) > 1 else None
+            base_addr, size_byte = lib.get_base_and_size(name_to_block,
+                                                         inst, device_ifname)
+            addr_range = [{"base_addr": hex(base_addr),
+                           "size_byte": hex(size_byte)}]
+            if node.get("addr_range") != addr_range:
+                node["addr_range"] = addr_range
+                changed = True
+
+    if changed:
+        for xbar in top["xbar"]:
+            for node in xbar["nodes"]:
+                if node["type"] == "device" and node.get("xbar", False):
+                    node.pop("addr_range", None)
+        name_to_xbar = {xbar["name"]: xbar for xbar in top["xbar"]}
+        for xbar in top["xbar"]:
+            xbar_cross(xbar, name_to_xbar)
+
+    return changed
+
+
 # find the first instance name of a given type
 def _find_module_name(modules, module_type):
     for m in modules:
@@ -1084,10 +1144,16 @@ def amend_pinmux_io(top: Dict, name_to_block: Dict[str, IpBlock]):
     temp['inputs'] = []
     temp['outputs'] = []
 
+    # Index the modules by name, keeping the first of any duplicates as
+    # lib.get_module_by_name() does.
+    name_to_module = {}
+    for m in top['module']:
+        name_to_module.setdefault(m['name'], m)
+
     for sig in pinmux['signals']:
         # Get the signal information from the IP block type of this instance/
         mod_name = sig['instance']
-        m = lib.get_module_by_name(top, mod_name)
+        m = name_to_module.get(mod_name)
 
         if m is None:
             raise SystemExit("Module {} is not searchable.".format(mod_name))
@@ -1244,8 +1310,9 @@ def merge_top(topcfg: OrderedDict,
         amend_xbar(topcfg, name_to_block, xbar)
 
     # 2nd phase of xbar (gathering the devices address range)
+    name_to_xbar = {xbar["name"]: xbar for xbar in topcfg["xbar"]}
     for xbar in topcfg["xbar"]:
-        xbar_cross(xbar, topcfg["xbar"])
+        xbar_cross(xbar, name_to_xbar)
 
     # Add path names to declared resets.
     # Declare structure for exported resets.
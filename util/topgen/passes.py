@@ -0,0 +1,86 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+"""Tracking of the generation passes of topgen."""
+
+import hashlib
+import logging as log
+import pickle
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """Returns a digest of the contents of a file, or None if it is absent."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+class GenerationPasses:
+    """Drives the generation passes of topgen to a fixed point.
+
+    The IP blocks generated by topgen (clkmgr, pinmux, rv_plic, ...) and the
+    top configuration depend on each other: each generator renders the Hjson
+    description of its IP block from the merged top configuration, and the
+    top configuration is merged from the descriptions of all the IP blocks.
+    topgen resolves this by running in passes, each one merging the top with
+    the descriptions written by the previous one (or the ones already there,
+    for the first pass) and running the generators again.
+
+    This tracks both edges of that dependency graph. For each generator, it
+    keeps a hash of the inputs it last ran with, so that generators whose
+    inputs did not change are not run again. For the merge, it keeps the
+    digests of the generated descriptions it read, so that topgen can stop
+    at a fixed point: once the generators write back the very descriptions
+    the pass was merged from, another pass would not change anything.
+    """
+
+    def __init__(self) -> None:
+        # The hash of the inputs of each generator when it last ran, and
+        # whether it generated all its outputs rather than only the
+        # description of its IP block.
+        self._inputs = {}  # type: Dict[str, Tuple[str, bool]]
+
+        # The digests of the generated descriptions read in the current pass,
+        # by the path they are read from in the next pass.
+        self._read = {}  # type: Dict[Path, Optional[str]]
+
+    def start_pass(self) -> None:
+        self._read = {}
+
+    def record_read(self, path: Path, next_path: Path) -> None:
+        """Records that the merge read the generated description at path.
+
+        next_path is where the generator writes the description, which is
+        where the next pass reads it from.
+        """
+        self._read[next_path] = file_digest(path)
+
+    def converged(self) -> bool:
+        """Returns True if the generated descriptions read did not change."""
+        changed = [
+            path for path, digest in self._read.items()
+            if file_digest(path) != digest
+        ]
+        for path in changed:
+            log.info("%s changed, running another pass", path)
+        return not changed
+
+    def needs_run(self, name: str, full: bool, *inputs) -> bool:
+        """Returns True if generator name has to run with the given inputs.
+
+        If full is set, the generator is to generate all its outputs,
+        otherwise only the description of its IP block. A generator is run
+        if it did not run with the same inputs before, or if it only
+        generated the description then and all its outputs are needed now.
+        """
+        digest = hashlib.sha256(pickle.dumps(inputs)).hexdigest()
+        last = self._inputs.get(name)
+        if last is not None and last[0] == digest and (last[1] or not full):
+            log.info("Inputs of %s did not change, not generating it again",
+                     name)
+            return False
+        self._inputs[name] = (digest, full)
+        return True
@@ -6,8 +6,8 @@ from collections import OrderedDict, defaultdict
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
-from mako.template import Template
 from reggen.ip_block import IpBlock
+from reggen.template_cache import get_text_template
 
 from .lib import Name, get_base_and_size
 
@@ -109,7 +109,7 @@ class RustEnum(object):
                 "% endfor\n"
                 "        End = ${enum.last_value + 1},\n"
                 "    }")
-        return Template(body).render(enum=self)
+        return get_text_template(body).render(enum=self)
 
     def render(self, gen_range=False, gen_cast=False, derive_list=None):
         if derive_list is not None:
@@ -160,7 +160,7 @@ class RustEnum(object):
             body += impl
         if gen_cast:
             body += cast
-        return Template(body).render(enum=self)
+        return get_text_template(body).render(enum=self)
 
 
 class RustArrayMapping(object):
@@ -183,7 +183,7 @@ class RustArrayMapping(object):
                     "    ${mapping.output_type_name.as_rust_type()}::${out_name.as_rust_enum()},\n"
                     "% endfor\n"
                     "];")
-        return Template(template).render(mapping=self)
+        return get_text_template(template).render(mapping=self)
 
 
 class RustFileHeader(object):
@@ -208,14 +208,14 @@ class RustFileHeader(object):
 
     def render(self):
         if self.skip:
-            return Template(("")).render(header=self)
+            return get_text_template(("")).render(header=self)
         else:
             template = ("\n"
                         "// Built for ${header.build()}\n"
                         "// https://github.com/lowRISC/opentitan/tree/${header.scm_sha()}\n"
                         "// Tree status: ${header.scm_status()}\n"
                         "// Build date: ${header.time_stamp()}\n")
-            return Template(template).render(header=self)
+            return get_text_template(template).render(header=self)
 
 
 class TopGenRust:
@@ -270,6 +270,23 @@ class secure_prng():
         i = self.randbelow(len(x))
         return (x[i])
 
+    def getstate(self):
+        """Returns the internal state of the PRNG.
+
+        The state can be restored with setstate(), to replay the same sequence
+        of random numbers.
+        """
+        return (self.V, self.Key, self.reseed_counter,
+                list(self.returned_bits))
+
+    def setstate(self, state):
+        """Restores an internal state returned by getstate()."""
+        V, Key, reseed_counter, returned_bits = state
+        self.V = V
+        self.Key = Key
+        self.reseed_counter = reseed_counter
+        self.returned_bits = list(returned_bits)
+
     def padded_hex(self, c, length):
         """Convert integer to a hexadecimal string with leading zeros."""
         payload = hex(c)[2:]
@@ -320,3 +337,5 @@ randbelow = _inst.randbelow
 shuffle = _inst.shuffle
 choice = _inst.choice
 test_point_gen = _inst.test_point_gen
+getstate = _inst.getstate
+setstate = _inst.setstate
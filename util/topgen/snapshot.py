@@ -0,0 +1,174 @@
+# Copyright lowRISC contributors.
+# Licensed under the Apache License, Version 2.0, see LICENSE for details.
+# SPDX-License-Identifier: Apache-2.0
+"""Snapshots of the merged top configuration, for incremental runs of topgen.
+
+Merging the top takes several passes, each of which loads every IP block of
+the top and runs the generators of the IP blocks generated by topgen. When
+only the registers of one IP block change, none of this has to be done again:
+the merged top configuration is the same, except for the address ranges of
+the crossbar devices if the size of a register block changed.
+
+A full run of topgen saves the merged top configuration and the IP blocks
+it was merged with, together with the digests of all the files they were
+read from, in the reggen cache directory (see reggen.ip_block_cache). A run
+with --only-ip loads the snapshot, checks that no file other than the
+description of that IP block changed and swaps in the new block.
+"""
+
+import hashlib
+import logging as log
+import os
+import pickle
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import hjson  # type: ignore
+from reggen import ip_block_cache
+from reggen.ip_block import IpBlock
+
+from .passes import file_digest
+
+# The version of the snapshot format, bumped when it changes.
+_VERSION = 1
+
+
+def _source_digest() -> str:
+    """Returns a digest of the code that merges the top and loads blocks.
+
+    This is the topgen script itself, which drives the merge and runs the
+    generators, and the packages it merges and generates IP blocks with.
+    """
+    h = hashlib.sha256()
+    h.update(str(_VERSION).encode('utf-8'))
+    util_dir = Path(__file__).parents[1]
+    for path in sorted(chain(util_dir.glob('topgen.py'),
+                             util_dir.glob('topgen/*.py'),
+                             util_dir.glob('reggen/*.py'),
+                             util_dir.glob('ipgen/*.py'))):
+        h.update(str(path.relative_to(util_dir)).encode('utf-8'))
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def snapshot_path(topcfg_path: Path, *options: object) -> Optional[Path]:
+    """Returns the path of the snapshot of the top at topcfg_path.
+
+    options are the command-line options that change the merged top. The
+    result is None if the cache directory is disabled.
+    """
+    root = ip_block_cache.cache_dir()
+    if root is None:
+        return None
+    h = hashlib.sha256()
+    h.update(repr((os.path.abspath(str(topcfg_path)),) + options)
+             .encode('utf-8'))
+    return root / 'topgen' / (h.hexdigest() + '.pickle')
+
+
+def _hjson_listing(hjson_dir: Path) -> List[str]:
+    return sorted(str(p) for p in hjson_dir.glob('*.hjson'))
+
+
+class TopSnapshot:
+    """A merged top configuration and what it was merged from.
+
+    completecfg and name_to_block are the results of the final merge of the
+    top. block_paths maps the name of each IP block to the path of the
+    description it was loaded from. hjson_dir is the directory of the top
+    configuration, all of whose Hjson files (the top and its crossbars) are
+    inputs of the merge, as are the files in extra_inputs. out_path is the
+    directory the IP blocks generated by topgen were generated in.
+    """
+
+    def __init__(self,
+                 completecfg: Dict[str, object],
+                 name_to_block: Dict[str, IpBlock],
+                 block_paths: Dict[str, Path],
+                 hjson_dir: Path,
+                 extra_inputs: List[Path],
+                 out_path: Path) -> None:
+        self.completecfg = completecfg
+        self.name_to_block = name_to_block
+        self.block_paths = {
+            name: Path(os.path.abspath(str(path)))
+            for name, path in block_paths.items()
+        }
+        self.hjson_dir = Path(os.path.abspath(str(hjson_dir)))
+        self.hjson_listing = _hjson_listing(self.hjson_dir)
+
+        inputs = ([Path(p) for p in self.hjson_listing] +
+                  [Path(os.path.abspath(str(p))) for p in extra_inputs] +
+                  list(self.block_paths.values()))
+        self.digests = {str(p): file_digest(p) for p in inputs}
+        self.out_path = out_path.resolve()
+        self.source_digest = _source_digest()
+
+    def save(self, path: Path) -> None:
+        """Saves the snapshot to path, ignoring any error writing it.
+
+        The snapshot is written to a temporary file which is then renamed
+        into place, so that concurrent runs never read a partial snapshot.
+        """
+        tmp = path.with_name('{}.tmp.{}'.format(path.name, os.getpid()))
+        try:
+            data = pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError) as err:
+            log.debug('Failed to save the top snapshot to %s: %s', path, err)
+
+    @staticmethod
+    def load(path: Optional[Path]) -> Optional['TopSnapshot']:
+        """Loads the snapshot at path, or returns None if there is none."""
+        if path is None:
+            return None
+        try:
+            snapshot = pickle.loads(path.read_bytes())
+        except Exception as err:
+            log.debug('Cannot load the top snapshot at %s: %s', path, err)
+            return None
+        if not isinstance(snapshot, TopSnapshot) or \
+                snapshot.source_digest != _source_digest():
+            return None
+        return snapshot
+
+    def changed_inputs(self, ignore: Path) -> List[str]:
+        """Returns the inputs of the merge that changed, other than ignore."""
+        ignore = Path(os.path.abspath(str(ignore)))
+        changed = [
+            path for path, digest in self.digests.items()
+            if Path(path) != ignore and file_digest(Path(path)) != digest
+        ]
+        listing = _hjson_listing(self.hjson_dir)
+        changed += sorted(set(listing) ^ set(self.hjson_listing))
+        return changed
+
+    def replace_block(self, name: str, block: IpBlock) -> None:
+        """Replaces IP block name, whose description changed."""
+        self.name_to_block[name] = block
+        path = self.block_paths[name]
+        self.digests[str(path)] = file_digest(path)
+
+
+def block_interface(block: IpBlock) -> Tuple[str, Dict[Optional[str], int]]:
+    """Returns what the merge of the top uses of block, but its sizes.
+
+    The result is a pair (interface, sizes): interface is a description of
+    everything about the block but its registers, and sizes maps the name
+    of each of its device interfaces to the address width of its registers.
+    """
+    desc = block._asdict()
+    del desc['registers']
+    desc['has_shadowed_reg'] = block.has_shadowed_reg()
+    desc['reg_blocks'] = sorted(str(name) for name in block.reg_blocks)
+
+    interface = hjson.dumpsJSON(desc, for_json=True, use_decimal=True,
+                                sort_keys=True)
+    sizes = {
+        name: rb.get_addr_width()
+        for name, rb in block.reg_blocks.items()
+    }
+    return interface, sizes
@@ -102,7 +102,8 @@ initial begin
 <%
 clk = 'clk_' + clk_src[node["clock"]]
 esc_name = node['name'].replace('.', '__')
-inst_sig_list = lib.find_otherside_modules(top, xbar["name"], 'tl_' + esc_name)
+inst_sig_list = lib.find_otherside_modules(top, xbar["name"], 'tl_' + esc_name,
+                                           otherside_index)
 inst_name = inst_sig_list[0][1]
 sig_name = inst_sig_list[0][2]
 %>\
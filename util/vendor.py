@@ -26,6 +26,7 @@ import textwrap
 from pathlib import Path
 
 import hjson
+from reggen import hjson_loader
 
 EXCLUDE_ALWAYS = ['.git']
 
@@ -358,7 +359,7 @@ class Mapping:
 class LockDesc:
     '''A class representing the contents of a lock file'''
     def __init__(self, handle):
-        data = hjson.loads(handle.read(), use_decimal=True)
+        data = hjson_loader.loads(handle.read(), use_decimal=True)
         self.upstream = get_field(handle.name, 'at top-level', data, 'upstream',
                                   constructor=lambda data: Upstream(handle.name, data))
 
@@ -374,7 +375,7 @@ class Desc:
         if not re.match(r'.+\.vendor\.hjson', handle.name):
             raise ValueError("Description file names must have a .vendor.hjson suffix.")
 
-        data = hjson.loads(handle.read(), use_decimal=True)
+        data = hjson_loader.loads(handle.read(), use_decimal=True)
         where = 'at top-level'
 
         self.apply_overrides(data, desc_overrides)